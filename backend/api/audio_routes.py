@@ -1,5 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 import os
 import logging
 import sys
@@ -11,12 +12,15 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")
 
 # Import ML model for audio processing if available
 try:
-    from ml_models.audio_cognition import analyze_audio
-    from ml_models.audio_transcription import transcribe_audio
-    ML_AVAILABLE = True
+    from ml_models.audio_cognition import transcribe_and_analyze
+    from ml_models.whisper_service import WHISPER_AVAILABLE
+    ML_AVAILABLE = WHISPER_AVAILABLE
 except ImportError:
-    logging.warning("Audio ML models not available. Audio analysis will be limited.")
     ML_AVAILABLE = False
+if not ML_AVAILABLE:
+    logging.warning("Audio ML models not available. Audio analysis will be limited.")
+
+from backend.utils.job_queue import media_jobs, JobQueueFullError
 
 router = APIRouter()
 
@@ -33,14 +37,28 @@ class AudioAnalysisResponse(BaseModel):
     duration: Optional[float] = None
     transcription: Optional[str] = None
     analysis: Optional[dict] = None
+    job_id: Optional[str] = None
     status: str = "success"
     message: str = ""
 
+def save_upload(file: UploadFile, file_path: str):
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+
+def submit_analysis(file_path: str) -> str:
+    """Queue transcription and analysis of a file in the media worker pool."""
+    try:
+        return media_jobs.submit(transcribe_and_analyze, file_path)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+
 @router.post("/upload", response_model=AudioAnalysisResponse)
-async def upload_audio(file: UploadFile = File(...)):
+async def upload_audio(file: UploadFile = File(...), background: bool = False):
     """
     Upload and analyze an audio file.
     Supports wav, mp3, ogg, m4a formats.
+    Analysis runs in the media worker pool. With background=true the response returns
+    immediately with a job_id to poll at /jobs/{job_id}; otherwise it waits for the result.
     """
     try:
         # Validate file
@@ -59,8 +77,7 @@ async def upload_audio(file: UploadFile = File(...)):
         
         # Save the uploaded file
         file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+        await run_in_threadpool(save_upload, file, file_path)
         
         # Get file size
         file_size = os.path.getsize(file_path)
@@ -73,24 +90,27 @@ async def upload_audio(file: UploadFile = File(...)):
         
         # Perform audio analysis if ML models are available
         if ML_AVAILABLE:
-            try:
-                # Audio transcription
-                transcription = transcribe_audio(file_path)
-                response.transcription = transcription
-                
-                # Audio analysis for speech characteristics and quality
-                analysis_results = analyze_audio(file_path)
-                response.analysis = analysis_results
-                
+            response.job_id = submit_analysis(file_path)
+            if background:
+                response.status = "queued"
+                response.message = f"Audio uploaded. Analysis queued, poll /jobs/{response.job_id} for the result."
+                return response
+
+            job = await media_jobs.wait(response.job_id)
+            if job["status"] == "succeeded":
+                response.transcription = job["result"]["transcription"]
+                response.analysis = job["result"]["analysis"]
                 response.message = "Audio successfully uploaded and analyzed"
-            except Exception as ml_error:
-                logging.error(f"Error in audio ML processing: {str(ml_error)}")
+            else:
+                logging.error(f"Error in audio ML processing: {job['error']}")
                 response.message = "Audio uploaded, but analysis failed. Basic information only."
         else:
             response.message = "Audio uploaded successfully. Analysis not available."
         
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error processing audio upload: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing audio upload: {str(e)}")
@@ -98,7 +118,8 @@ async def upload_audio(file: UploadFile = File(...)):
 @router.post("/analyze")
 async def analyze_audio_data(request: Request):
     """
-    Analyze previously uploaded audio file or audio data from request
+    Analyze previously uploaded audio file or audio data from request.
+    Set "background": true in the body to get a job_id back instead of waiting.
     """
     try:
         data = await request.json()
@@ -113,17 +134,20 @@ async def analyze_audio_data(request: Request):
             raise HTTPException(status_code=404, detail=f"File {filename} not found")
             
         if ML_AVAILABLE:
-            # Audio transcription
-            transcription = transcribe_audio(file_path)
-            
-            # Audio analysis
-            analysis_results = analyze_audio(file_path)
+            job_id = submit_analysis(file_path)
+            if data.get("background"):
+                return {"status": "queued", "filename": filename, "job_id": job_id}
+
+            job = await media_jobs.wait(job_id)
+            if job["status"] != "succeeded":
+                raise RuntimeError(job["error"])
             
             return {
                 "status": "success",
                 "filename": filename,
-                "transcription": transcription,
-                "analysis": analysis_results
+                "job_id": job_id,
+                "transcription": job["result"]["transcription"],
+                "analysis": job["result"]["analysis"]
             }
         else:
             return {
@@ -131,6 +155,8 @@ async def analyze_audio_data(request: Request):
                 "message": "Audio analysis is not available"
             }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in audio analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error in audio analysis: {str(e)}")
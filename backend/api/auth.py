@@ -91,6 +91,15 @@ def get_current_user(
         )
     return user
 
+def get_current_admin(current_user: User = Depends(get_current_user)) -> User:
+    """Authenticated user with the admin role, for operator-only endpoints."""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Access forbidden: Only administrators can perform this action.",
+        )
+    return current_user
+
 def create_user_profile(db: Session, user_id: int) -> UserProfile:
     """Create an empty user profile."""
     profile = UserProfile(user_id=user_id)
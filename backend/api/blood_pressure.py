@@ -1,6 +1,5 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-import openai
 import logging
 import sys
 import os
@@ -8,16 +7,15 @@ import os
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from ml_models.blood_pressure_analysis import analyze_blood_pressure
+from backend.utils.openai_helper import create_chat_completion
+from backend.utils.llm_cache import llm_cache
+from backend.utils.bulkhead import recommendations_bulkhead
+from backend.utils.job_queue import recommendation_jobs, JobQueueFullError, RECOMMENDATIONS_PENDING
 
 router = APIRouter()
 
-# Set OpenAI API key from environment variable
-from dotenv import load_dotenv
-load_dotenv()
-openai_api_key = os.getenv("OPENAI_API_KEY")
-if not openai_api_key:
-    logging.warning("OPENAI_API_KEY is not set in environment variables. API calls may fail.")
-openai.api_key = openai_api_key
+# Seconds to wait for the OpenAI recommendations before answering with a fallback message
+LLM_TIMEOUT = float(os.getenv("BP_LLM_TIMEOUT", "10"))
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -28,7 +26,11 @@ class BloodPressureRequest(BaseModel):
     correct_position: bool = True  # Making this optional with a default value
 
 @router.post("/bp/analyze")
-def analyze_bp(data: BloodPressureRequest):
+def analyze_bp(data: BloodPressureRequest, defer_recommendations: bool = False):
+    """
+    Categorize a blood pressure reading. With defer_recommendations=true the category is
+    returned right away and the AI recommendations follow at /jobs/{recommendations_id}.
+    """
     try:
         category = analyze_blood_pressure(data.systolic, data.diastolic, data.correct_position)
         logging.info(f"Generated category: {category}")
@@ -47,22 +49,17 @@ def analyze_bp(data: BloodPressureRequest):
             message = "Your blood pressure is normal. Maintain a healthy lifestyle."
             
         # Try to get AI recommendations if possible
-        ai_recommendations = ""
-        try:
-            prompt = f"Based on the blood pressure category '{category}' (systolic: {data.systolic}, diastolic: {data.diastolic}), provide concise recommendations."
-            openai_response = openai.ChatCompletion.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": "You are a medical assistant providing concise, evidence-based recommendations for blood pressure management."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=150,
-                temperature=0.7
-            )
-            ai_recommendations = openai_response.choices[0].message['content'].strip()
-        except Exception as e:
-            logging.error(f"Error generating AI recommendations: {e}")
-            ai_recommendations = "Unable to generate AI recommendations at this time."
+        recommendations_id = None
+        if defer_recommendations:
+            # The category goes out now; the AI text follows at /jobs/{recommendations_id}
+            try:
+                recommendations_id = recommendation_jobs.submit_from_thread(
+                    generate_ai_recommendations, category, data.systolic, data.diastolic)
+                ai_recommendations = RECOMMENDATIONS_PENDING
+            except JobQueueFullError:
+                ai_recommendations = "Unable to generate AI recommendations at this time."
+        else:
+            ai_recommendations = generate_ai_recommendations(category, data.systolic, data.diastolic)
             
         # Format the complete message
         formatted_message = f"""Category: {category}\nBasic Advice: {message}"""
@@ -77,7 +74,8 @@ def analyze_bp(data: BloodPressureRequest):
             "message": formatted_message,
             "status": "success",
             "systolic": data.systolic,
-            "diastolic": data.diastolic
+            "diastolic": data.diastolic,
+            "recommendations_id": recommendations_id
         }
 
     except Exception as e:
@@ -86,3 +84,25 @@ def analyze_bp(data: BloodPressureRequest):
             "status": "error", 
             "message": f"Error analyzing blood pressure: {str(e)}"
         }
+
+def generate_ai_recommendations(category: str, systolic: int, diastolic: int) -> str:
+    try:
+        prompt = f"Based on the blood pressure category '{category}' (systolic: {systolic}, diastolic: {diastolic}), provide concise recommendations."
+        # Bounded separately from chat; when full only the basic advice is returned
+        with recommendations_bulkhead.acquire_sync():
+            return create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a medical assistant providing concise, evidence-based recommendations for blood pressure management."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=150,
+                temperature=0.7,
+                fallback="Unable to generate AI recommendations at this time.",
+                # The prompt depends only on the category and the two readings
+                cache=llm_cache,
+                timeout=LLM_TIMEOUT
+            ).strip()
+    except Exception as e:
+        logging.error(f"Error generating AI recommendations: {e}")
+        return "Unable to generate AI recommendations at this time."
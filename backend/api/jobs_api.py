@@ -0,0 +1,29 @@
+from fastapi import APIRouter, HTTPException, Query
+from backend.utils.job_queue import queues, find_job
+
+router = APIRouter()
+
+# Longest time a poll request is held open waiting for a job to finish
+MAX_WAIT_SECONDS = 30
+
+@router.get("/")
+def get_job_queues():
+    """
+    Report the state of every background job queue.
+    """
+    return {name: queue.stats() for name, queue in queues.items()}
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS)):
+    """
+    Get the status and, when finished, the result of a background job.
+    With wait > 0 the request is held open until the job finishes or wait seconds pass,
+    so clients are notified as soon as the result is ready without polling in a tight loop.
+    """
+    queue = find_job(job_id)
+    if queue is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    if wait > 0:
+        return await queue.wait(job_id, timeout=wait)
+    return queue.get(job_id)
@@ -0,0 +1,116 @@
+from fastapi import APIRouter, Depends
+from backend.api.auth import get_current_admin
+from backend.utils.llm_cache import llm_cache
+from backend.utils.single_flight import llm_flights
+from backend.utils.circuit_breaker import openai_breaker
+from backend.utils.bulkhead import bulkheads
+from backend.utils.chat_history import chat_history
+from backend.utils.llm_telemetry import llm_telemetry
+from backend.utils.prompt_builder import prompt_builders
+from backend.utils.faq_index import faq_index
+from backend.utils.token_quota import token_quota
+
+router = APIRouter()
+
+@router.get("/cache")
+def get_llm_cache_stats():
+    """
+    Report hits, misses and size of the LLM response cache, per tier.
+    """
+    return llm_cache.stats()
+
+@router.delete("/cache", dependencies=[Depends(get_current_admin)])
+def clear_llm_cache():
+    """
+    Drop every cached LLM response, e.g. after changing prompt wording or models. Admins only.
+    """
+    llm_cache.clear()
+    return {"status": "success", "cache": llm_cache.stats()}
+
+@router.post("/cache/purge", dependencies=[Depends(get_current_admin)])
+def purge_expired_llm_cache():
+    """
+    Delete expired entries from the on-disk tier. Admins only.
+    """
+    return {"status": "success", "removed": llm_cache.purge_expired()}
+
+@router.get("/single-flight")
+def get_single_flight_stats():
+    """
+    Report how many identical concurrent LLM requests were merged into one upstream call.
+    """
+    return llm_flights.stats()
+
+@router.get("/breaker")
+def get_breaker_state():
+    """
+    Report the OpenAI circuit breaker: state, consecutive failures and when a trial call is next allowed.
+    """
+    return openai_breaker.stats()
+
+@router.post("/breaker/reset", dependencies=[Depends(get_current_admin)])
+def reset_breaker():
+    """
+    Close the OpenAI circuit breaker, e.g. right after an outage is resolved. Admins only.
+    """
+    openai_breaker.reset()
+    return {"status": "success", "breaker": openai_breaker.stats()}
+
+@router.get("/bulkheads")
+def get_bulkheads():
+    """
+    Report running, queued and rejected LLM calls for each route group.
+    """
+    return {name: bulkhead.stats() for name, bulkhead in bulkheads.items()}
+
+@router.get("/chat-history")
+def get_chat_history_stats():
+    """
+    Report how much patient chat history was folded into summaries and the prompt tokens saved.
+    """
+    return chat_history.stats()
+
+@router.get("/telemetry")
+def get_llm_telemetry():
+    """
+    Report LLM calls per route and model: latency, time to first token and token histograms,
+    cache outcomes, retries, fallbacks and errors.
+    """
+    return llm_telemetry.stats()
+
+@router.delete("/telemetry", dependencies=[Depends(get_current_admin)])
+def reset_llm_telemetry():
+    """
+    Start the LLM telemetry aggregates afresh, e.g. before a load test. Admins only.
+    """
+    llm_telemetry.reset()
+    return {"status": "success"}
+
+@router.get("/prompts")
+def get_prompt_prefix_stats():
+    """
+    Report, per prompt, how much of each prompt repeats a recently sent prefix byte for byte
+    and the expected hit ratio of the provider's prompt cache.
+    """
+    return {name: builder.stats() for name, builder in prompt_builders.items()}
+
+@router.get("/faq")
+def get_faq_stats():
+    """
+    Report how many patient chat questions were answered from the local FAQ corpus.
+    """
+    return faq_index.stats()
+
+@router.get("/faq/search")
+def search_faq(q: str, k: int = 3):
+    """
+    Closest FAQ entries to a question with their similarity scores, for curating the corpus and threshold.
+    """
+    return {"threshold": faq_index.threshold, "matches": faq_index.search(q, k=k)}
+
+@router.get("/quotas")
+def get_token_quotas():
+    """
+    Report the per-client token quota settings, clients tracked and calls refused for lack of quota.
+    """
+    return token_quota.stats()
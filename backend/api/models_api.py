@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends, HTTPException
+import logging
+import sys
+import os
+
+# Add project root to Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from ml_models.model_registry import registry
+from backend.utils.micro_batcher import batchers
+from backend.api.auth import get_current_admin
+
+router = APIRouter()
+
+@router.get("/status")
+def get_models_status():
+    """
+    Report load time, version and memory usage of every registered model artifact.
+    """
+    return registry.status()
+
+@router.get("/metrics")
+def get_inference_metrics():
+    """
+    Report batch sizes, queue wait and predict latency of every inference micro-batcher.
+    """
+    return {name: batcher.metrics() for name, batcher in batchers.items()}
+
+@router.post("/{name}/reload", dependencies=[Depends(get_current_admin)])
+def reload_model(name: str):
+    """
+    Reload a model artifact from its registered path and swap it in without restarting the worker.
+    Admins only: every reload reads the artifact from disk and rebuilds what depends on it.
+    """
+    try:
+        registry.reload(name)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Artifact for model '{name}' not found")
+    except Exception as e:
+        logging.error(f"Error reloading model '{name}': {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error reloading model: {str(e)}")
+
+    return {"status": "success", "model": registry.status()["models"][name]}
@@ -1,11 +1,18 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import List
-import openai
+from typing import List, Optional
 import logging
+import os
+from backend.utils.openai_helper import create_chat_completion
+from backend.utils.llm_cache import llm_cache
+from backend.utils.bulkhead import recommendations_bulkhead
+from backend.utils.job_queue import recommendation_jobs, JobQueueFullError, RECOMMENDATIONS_PENDING
 
 router = APIRouter()
 
+# Seconds to wait for the OpenAI recommendations before answering with a fallback message
+LLM_TIMEOUT = float(os.getenv("MOVEMENT_LLM_TIMEOUT", "15"))
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -30,14 +37,20 @@ class MovementResponse(BaseModel):
     balance_level: str
     overall_level: str
     recommendations: str
+    # Set when the recommendations are generated in the background; fetch them from /jobs/{recommendations_id}
+    recommendations_id: Optional[str] = None
     
 @router.post("/movement", response_model=MovementResponse)
-def analyze_movement_alt(data: MovementRequest):
+def analyze_movement_alt(data: MovementRequest, defer_recommendations: bool = False):
     """Alternative endpoint for movement assessment that matches frontend path"""
-    return analyze_movement(data)
+    return analyze_movement(data, defer_recommendations)
 
 @router.post("/assessment/movement", response_model=MovementResponse)
-def analyze_movement(data: MovementRequest):
+def analyze_movement(data: MovementRequest, defer_recommendations: bool = False):
+    """
+    Score a movement assessment. With defer_recommendations=true the scores are returned
+    right away and the AI recommendations follow at /jobs/{recommendations_id}.
+    """
     try:
         # Calculate scores
         questions = data.questions
@@ -63,11 +76,20 @@ def analyze_movement(data: MovementRequest):
         overall_level = get_level(total_score, 39)
         
         # Generate AI recommendations
-        recommendations = generate_ai_recommendations(
+        recommendation_args = (
             upper_limb_score, lower_limb_score, balance_score, total_score,
             upper_limb_level, lower_limb_level, balance_level, overall_level,
             data.language, data.patient_age
         )
+        recommendations_id = None
+        if defer_recommendations:
+            try:
+                recommendations_id = recommendation_jobs.submit_from_thread(generate_ai_recommendations, *recommendation_args)
+                recommendations = RECOMMENDATIONS_PENDING
+            except JobQueueFullError:
+                recommendations = "Unable to generate AI recommendations at this time."
+        else:
+            recommendations = generate_ai_recommendations(*recommendation_args)
         
         logging.info(f"Analyzed movement assessment: Upper Limb={upper_limb_score}, Lower Limb={lower_limb_score}, " +
                      f"Balance={balance_score}, Total={total_score}")
@@ -81,7 +103,8 @@ def analyze_movement(data: MovementRequest):
             lower_limb_level=lower_limb_level,
             balance_level=balance_level,
             overall_level=overall_level,
-            recommendations=recommendations
+            recommendations=recommendations,
+            recommendations_id=recommendations_id
         )
         
     except Exception as e:
@@ -153,17 +176,21 @@ def generate_ai_recommendations(upper_limb_score: int, lower_limb_score: int,
             movement abilities based on the above scores. Include specific exercises, 
             physical therapies, and available resources. Be specific for each area (upper limbs, lower limbs, and balance).
             """        # Call OpenAI API
-        openai_response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a physical therapy and rehabilitation specialist providing professional medical recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=400,
-            temperature=0.7
-        )
-        
-        recommendations = openai_response.choices[0].message['content'].strip()
+        # Bounded separately from chat traffic; when full the scores come with the fallback text
+        with recommendations_bulkhead.acquire_sync():
+            recommendations = create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a physical therapy and rehabilitation specialist providing professional medical recommendations."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=400,
+                temperature=0.7,
+                fallback="Unable to generate AI recommendations at this time.",
+                # The prompt depends only on scores, levels, age and language
+                cache=llm_cache,
+                timeout=LLM_TIMEOUT
+            ).strip()
         return recommendations
         
     except Exception as e:
@@ -1,13 +1,16 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from typing import List
+import numpy as np
 import sys
 import os
 import logging
 
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+from backend.utils.batch_inputs import BatchValidationError, stack_columns, check_range
 try:
-    from ml_models.nihss_model import predict_nihss_severity
+    from ml_models.nihss_model import predict_nihss_severity, predict_nihss_severity_batch
 except ImportError:
     logging.warning("Could not import nihss_model, using direct severity calculation")
 
@@ -26,6 +29,29 @@ class NIHSSInput(BaseModel):
     nihs_10: int
     nihs_11: int
 
+class NIHSSBatchInput(BaseModel):
+    """Columnar NIHSS item scores: entry i of every list belongs to patient i."""
+    nihs_1: List[int]
+    nihs_2: List[int]
+    nihs_3: List[int]
+    nihs_4: List[int]
+    nihs_5: List[int]
+    nihs_6: List[int]
+    nihs_7: List[int]
+    nihs_8: List[int]
+    nihs_9: List[int]
+    nihs_10: List[int]
+    nihs_11: List[int]
+
+NIHSS_COLUMNS = [f"nihs_{i}" for i in range(1, 12)]
+
+# Upper-exclusive bands used by calculate_nihss_severity (totals <= 0 count as no symptoms)
+SEVERITY_CUT_POINTS = np.array([1, 5, 16, 21, 43])
+SEVERITY_LABELS = np.array([
+    "No stroke symptoms", "Minor Stroke", "Moderate Stroke",
+    "Moderate to Severe Stroke", "Severe Stroke", "Invalid Score"
+])
+
 def calculate_nihss_severity(total_score: int) -> str:
     """
     Calculate NIHSS severity based on total score
@@ -50,6 +76,12 @@ def calculate_nihss_severity(total_score: int) -> str:
     else:
         return "Invalid Score"
 
+def calculate_nihss_severity_batch(total_scores: np.ndarray) -> np.ndarray:
+    """
+    Vectorized calculate_nihss_severity for an array of total scores
+    """
+    return SEVERITY_LABELS[np.digitize(total_scores, SEVERITY_CUT_POINTS)]
+
 @router.post("/nihss/analyze")
 async def analyze_nihss(input_data: NIHSSInput):
     try:
@@ -88,6 +120,35 @@ async def analyze_nihss(input_data: NIHSSInput):
             "recommendations": ["Please consult with your healthcare provider for a proper assessment."]
         }
 
+@router.post("/nihss/analyze-batch")
+async def analyze_nihss_batch(input_data: NIHSSBatchInput):
+    """
+    Analyze NIHSS scores for a whole cohort in one call.
+    Totals and severities are computed for all rows at once; recommendations are
+    returned once per severity level instead of once per patient.
+    """
+    try:
+        item_scores = stack_columns(input_data, NIHSS_COLUMNS)
+        check_range(item_scores, 0)
+    except BatchValidationError as e:
+        raise HTTPException(status_code=422, detail=e.to_detail())
+
+    try:
+        total_scores, severities = predict_nihss_severity_batch(item_scores)
+    except Exception as model_error:
+        # Fall back to direct calculation if the model module is unavailable
+        logging.warning(f"ML model error: {str(model_error)}. Using direct calculation.")
+        total_scores = item_scores.sum(axis=1)
+        severities = calculate_nihss_severity_batch(total_scores)
+
+    logging.info(f"NIHSS batch analysis completed successfully: {len(total_scores)} rows")
+    return {
+        "count": len(total_scores),
+        "total_score": total_scores.tolist(),
+        "severity": severities.tolist(),
+        "recommendations": {severity: get_recommendations(severity) for severity in np.unique(severities).tolist()}
+    }
+
 def get_recommendations(severity: str) -> list:
     """
     Get recommendations based on stroke severity
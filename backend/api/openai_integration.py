@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Body, Depends
+from fastapi import APIRouter, HTTPException, Body, Depends, Request
 from pydantic import BaseModel
 import os
 import logging
@@ -12,71 +12,21 @@ load_dotenv()
 # Initialize router
 router = APIRouter()
 
-# Get OpenAI API key from environment variables
-try:
-    from backend.utils.openai_helper import get_openai_key
-    OPENAI_API_KEY = get_openai_key()
-    logging.info("Using OpenAI API key from helper")
-except (ImportError, ValueError) as e:
-    logging.warning(f"OpenAI API key loading error: {str(e)}")
-    
-    # Try to load directly from .env file if the helper failed
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-    if not OPENAI_API_KEY:
-        # Try to read directly from .env files
-        backend_env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
-        root_env_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), ".env")
-        
-        # Check backend/.env
-        if os.path.exists(backend_env_path):
-            with open(backend_env_path, 'r') as f:
-                for line in f:
-                    if line.strip().startswith('OPENAI_API_KEY='):
-                        OPENAI_API_KEY = line.strip().split('=', 1)[1].strip()
-                        if OPENAI_API_KEY.startswith('"') and OPENAI_API_KEY.endswith('"'):
-                            OPENAI_API_KEY = OPENAI_API_KEY[1:-1]
-                        logging.info(f"Loaded OpenAI API key from {backend_env_path}")
-                        break
-        
-        # Check project root .env if still not found
-        if not OPENAI_API_KEY and os.path.exists(root_env_path):
-            with open(root_env_path, 'r') as f:
-                for line in f:
-                    if line.strip().startswith('OPENAI_API_KEY='):
-                        OPENAI_API_KEY = line.strip().split('=', 1)[1].strip()
-                        if OPENAI_API_KEY.startswith('"') and OPENAI_API_KEY.endswith('"'):
-                            OPENAI_API_KEY = OPENAI_API_KEY[1:-1]
-                        logging.info(f"Loaded OpenAI API key from {root_env_path}")
-                        break
-    
-    if not OPENAI_API_KEY:
-        logging.warning("OPENAI_API_KEY not found. Using placeholder for development.")
-        OPENAI_API_KEY = "sk-placeholder-key-for-development"
-
-# Debugging output - mask the key for security
-if OPENAI_API_KEY:
-    masked_key = f"{OPENAI_API_KEY[:8]}...{OPENAI_API_KEY[-4:]}" if len(OPENAI_API_KEY) > 12 else "***masked***"
-    logging.info(f"OpenAI API key loaded: {masked_key}")
-
-# Use the new OpenAI client consistently
-try:
-    from openai import OpenAI
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    logging.info("Using new OpenAI client (>= 1.0.0)")
-except ImportError:
-    logging.warning("Failed to import new OpenAI client, falling back to legacy client")
-    try:
-        import openai
-        openai.api_key = OPENAI_API_KEY
-        logging.info("Using legacy OpenAI client (< 1.0.0)")
-    except ImportError:
-        logging.error("Could not import any OpenAI client. AI features will be disabled.")
-        # Create a mock client for development that will return dummy responses
-        class MockOpenAIClient:
-            def chat_completions_create(self, *args, **kwargs):
-                return {"choices": [{"message": {"content": "This is a development mock response."}}]}
-        client = MockOpenAIClient()
-    openai.api_key = OPENAI_API_KEY
+# All OpenAI calls go through the shared gateway, which resolves the API key
+# once and keeps a pooled client for the process
+from backend.utils.openai_helper import acreate_chat_completion, astream_chat_completion
+from backend.utils.disconnect import cancel_on_disconnect
+from backend.utils.sse import sse_event, sse_response
+from backend.utils.recommendations import extract_recommendations
+from backend.utils.bulkhead import analysis_bulkhead, chat_bulkhead, BulkheadFullError
+from backend.utils.prompt_builder import message, register_prompt
+from backend.utils.token_quota import QuotaExceededError, check_quota
+
+analysis_prompt = register_prompt("rehabilitation-analysis")
+completion_prompt = register_prompt("chat-completion")
+
+# Seconds to wait for each OpenAI call before answering with a fallback message
+LLM_TIMEOUT = float(os.getenv("OPENAI_ROUTES_LLM_TIMEOUT", "45"))
 
 # Models for request and response
 class RehabilitationAnalysisRequest(BaseModel):
@@ -141,84 +91,142 @@ def get_system_prompt(assessment_type: str, language: str) -> str:
     
     return prompt
 
+def get_analysis_messages(request: RehabilitationAnalysisRequest) -> List[Dict[str, str]]:
+    system_prompt = get_system_prompt(request.assessment_type, request.language)
+    # Sorted keys: the same data always gives the same prompt bytes
+    data = json.dumps(request.assessment_data, sort_keys=True)
+    return analysis_prompt.build(
+        static=[message("system", system_prompt)],
+        history=[message("user", f"Please analyze this {request.assessment_type} assessment data and provide recommendations: {data}")]
+    )
+
+def get_chat_messages(request: ChatCompletionRequest) -> List[Dict[str, str]]:
+    # Leading system messages are the static prefix; the rest is the conversation
+    messages = request.messages
+    static_count = 0
+    while static_count < len(messages) and messages[static_count].get("role") == "system":
+        static_count += 1
+    static, history = messages[:static_count], messages[static_count:]
+
+    # Add system message if not present
+    if not any(msg.get("role") == "system" for msg in messages):
+        system_content = {
+            "en": "You are a helpful stroke rehabilitation assistant. Provide clear, compassionate guidance for stroke survivors and caregivers.",
+            "ru": "Вы - полезный помощник по реабилитации после инсульта. Предоставляйте понятные, сострадательные рекомендации для людей, перенесших инсульт, и их опекунов.",
+            "uz": "Siz insult reabilitatsiyasi bo'yicha foydali yordamchisiz. Insultdan keyin tirilgan bemorlar va ularning parvarishlovchilari uchun aniq, hamdard ko'rsatmalar bering."
+        }
+        static = [message("system", system_content.get(request.language, system_content["en"]))]
+    # Add context if provided, right before the last message so it does not break the shared prefix
+    context = []
+    if request.context:
+        context_msg = f"Context information: {json.dumps(request.context, sort_keys=True)}"
+        context.append(message("system", context_msg))
+    return completion_prompt.build(static, context, history)
+
+async def stream_answer(messages: List[Dict[str, str]], bulkhead):
+    """
+    SSE events for a streamed completion: a "token" event per chunk, then a "done"
+    event with the full text and its extracted recommendations. A bulkhead slot is
+    held until the stream ends; if none frees up, a single "error" event is sent.
+    """
+    try:
+        async with bulkhead.acquire():
+            chunks = []
+            async for text in astream_chat_completion(
+                messages=messages,
+                model="gpt-4o",
+                temperature=0.7,
+                max_tokens=1000,
+                timeout=LLM_TIMEOUT
+            ):
+                chunks.append(text)
+                yield sse_event("token", {"text": text})
+            response_text = "".join(chunks)
+            yield sse_event("done", {
+                "response": response_text,
+                "recommendations": extract_recommendations(response_text)
+            })
+    except BulkheadFullError as e:
+        yield sse_event("error", {"detail": str(e)})
+
+def stream_response(messages: List[Dict[str, str]], bulkhead):
+    # Refuse up front while saturated or out of quota, so the client gets an error status instead of an empty stream
+    if bulkhead.saturated():
+        raise HTTPException(status_code=503, detail=f"Too many concurrent '{bulkhead.name}' requests. Please try again shortly.",
+                            headers={"Retry-After": "5"})
+    try:
+        check_quota(messages, 1000)
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    return sse_response(stream_answer(messages, bulkhead))
+
 @router.post("/rehabilitation/analysis", response_model=AIResponse)
-async def analyze_rehabilitation_data(request: RehabilitationAnalysisRequest):
+async def analyze_rehabilitation_data(request: RehabilitationAnalysisRequest, http_request: Request = None):
     """
     Analyze rehabilitation assessment data and provide recommendations
     """
     try:
         # Prepare the messages for OpenAI
-        system_prompt = get_system_prompt(request.assessment_type, request.language)
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"Please analyze this {request.assessment_type} assessment data and provide recommendations: {json.dumps(request.assessment_data)}"}
-        ]    # Call OpenAI API
+        messages = get_analysis_messages(request)
+        # Call OpenAI API
         ai_text = ""  # Initialize ai_text to avoid UnboundLocalError
         try:
             # Use our helper module to handle API version differences
-            from backend.utils.openai_helper import create_chat_completion
-            ai_text = create_chat_completion(
-                messages=messages,
-                model="gpt-4o",
-                temperature=0.7,
-                max_tokens=1000
-            )
+            async with analysis_bulkhead.acquire():
+                ai_text = await cancel_on_disconnect(http_request, acreate_chat_completion(
+                    messages=messages,
+                    model="gpt-4o",
+                    temperature=0.7,
+                    max_tokens=1000,
+                    timeout=LLM_TIMEOUT
+                ))
+        except (HTTPException, BulkheadFullError, QuotaExceededError):
+            raise
         except Exception as api_error:
             logging.error(f"OpenAI API error: {str(api_error)}")
             ai_text = "Sorry, I couldn't process your request. Please try again later."
         
-        # Extract recommendations (assuming the AI formats recommendations with bullet points)
-        recommendations = []
-        for line in ai_text.split('\n'):
-            if line.strip().startswith('- ') or line.strip().startswith('• '):
-                recommendations.append(line.strip()[2:])
+        recommendations = extract_recommendations(ai_text)
         
         return AIResponse(
             response=ai_text,
-            recommendations=recommendations if recommendations else None
+            recommendations=recommendations
         )
+    except BulkheadFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing rehabilitation data: {str(e)}")
 
 @router.post("/chat/completion", response_model=AIResponse)
-async def chat_completion(request: ChatCompletionRequest):
+async def chat_completion(request: ChatCompletionRequest, http_request: Request = None):
     """
     General purpose chat completion endpoint for the rehabilitation assistant
     """
     try:
-        # Add system message if not present
-        messages = request.messages
-        if not any(msg.get("role") == "system" for msg in messages):
-            system_content = {
-                "en": "You are a helpful stroke rehabilitation assistant. Provide clear, compassionate guidance for stroke survivors and caregivers.",
-                "ru": "Вы - полезный помощник по реабилитации после инсульта. Предоставляйте понятные, сострадательные рекомендации для людей, перенесших инсульт, и их опекунов.",
-                "uz": "Siz insult reabilitatsiyasi bo'yicha foydali yordamchisiz. Insultdan keyin tirilgan bemorlar va ularning parvarishlovchilari uchun aniq, hamdard ko'rsatmalar bering."
-            }
-            messages.insert(0, {
-                "role": "system", 
-                "content": system_content.get(request.language, system_content["en"])
-            })        # Add context if provided
-        if request.context:
-            context_msg = f"Context information: {json.dumps(request.context)}"
-            messages.insert(1, {"role": "system", "content": context_msg})
-          # Call OpenAI API
+        messages = get_chat_messages(request)
+        # Call OpenAI API
         try:
             # Use our helper module to handle API version differences
-            from backend.utils.openai_helper import create_chat_completion
-            
-            response_text = create_chat_completion(
-                messages=messages,
-                model="gpt-4o",
-                temperature=0.7,
-                max_tokens=1000
-            )
+            async with chat_bulkhead.acquire():
+                response_text = await cancel_on_disconnect(http_request, acreate_chat_completion(
+                    messages=messages,
+                    model="gpt-4o",
+                    temperature=0.7,
+                    max_tokens=1000,
+                    timeout=LLM_TIMEOUT
+                ))
             
             # Return the response
             return AIResponse(
                 response=response_text,
                 recommendations=None
             )
+        except (HTTPException, BulkheadFullError, QuotaExceededError):
+            raise
         except Exception as api_error:
             logging.error(f"OpenAI API error in chat completion: {str(api_error)}")
             # Return a friendly error message instead of raising an exception
@@ -226,5 +234,26 @@ async def chat_completion(request: ChatCompletionRequest):
                 response="Sorry, I encountered an issue processing your request. Please try again later.",
                 recommendations=None
             )
+    except BulkheadFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error in chat completion: {str(e)}")
+
+@router.post("/rehabilitation/analysis/stream")
+async def stream_rehabilitation_analysis(request: RehabilitationAnalysisRequest):
+    """
+    Streaming version of /rehabilitation/analysis: tokens are sent as server-sent
+    events as they arrive, followed by a "done" event with the recommendations
+    """
+    return stream_response(get_analysis_messages(request), analysis_bulkhead)
+
+@router.post("/chat/completion/stream")
+async def stream_chat_completion(request: ChatCompletionRequest):
+    """
+    Streaming version of /chat/completion, sent as server-sent events
+    """
+    return stream_response(get_chat_messages(request), chat_bulkhead)
@@ -1,14 +1,30 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Request, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
+import asyncio
 import logging
 import json
+import os
+import re
 
 # Import our custom OpenAI helper for version compatibility
-from backend.utils.openai_helper import create_chat_completion
+from backend.utils.openai_helper import acreate_chat_completion, astream_chat_completion
+from backend.utils.llm_cache import llm_cache
+from backend.utils.disconnect import cancel_on_disconnect
+from backend.utils.server_timing import ServerTiming
+from backend.utils.sse import sse_event, sse_response
+from backend.utils.bulkhead import chat_bulkhead, BulkheadFullError
+from backend.utils.chat_history import chat_history, compact_context
+from backend.utils.prompt_builder import message, register_prompt
+from backend.utils.faq_index import faq_index, normalize, FAQ_PERSONAL_THRESHOLD
+from backend.utils.token_quota import QuotaExceededError, check_quota
+from backend.utils.recommendations import extract_recommendations
 
 router = APIRouter()
 
+# Seconds to wait for each OpenAI call before answering with a fallback message
+LLM_TIMEOUT = float(os.getenv("PATIENT_CHAT_LLM_TIMEOUT", "30"))
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -25,8 +41,172 @@ class ChatResponse(BaseModel):
     response: str
     advice: Optional[str] = None
 
+SYSTEM_MESSAGE = (
+    "You are a helpful medical assistant specializing in stroke rehabilitation. "
+    "Provide accurate, clear, and compassionate responses to patients and their relatives. "
+    "Focus on evidence-based advice but explain it in simple terms. "
+    "Do not provide specific medical diagnoses or prescribe medication. "
+    "For serious concerns, always recommend consulting with healthcare professionals."
+)
+
+# Static prefix of every chat prompt; per-request context goes after the conversation
+CHAT_STATIC_MESSAGES = [message("system", SYSTEM_MESSAGE)]
+
+ADVICE_REQUEST = (
+    "Based on the patient's assessment results, provide 3-5 specific and personalized recommendations "
+    "for stroke rehabilitation. Include specific exercises, lifestyle changes, and monitoring advice."
+)
+
+ADVICE_SYSTEM_MESSAGE = "You are a medical specialist providing comprehensive rehabilitation advice for stroke patients."
+
+# Static instructions per assessment type; None is used for any other type
+ADVICE_INSTRUCTIONS = {
+    "speech_hearing": """Provide comprehensive rehabilitation advice, including:
+1. Specific exercises the patient should practice daily
+2. Technology tools or apps that might help
+3. When they should see a specialist
+4. Signs of improvement to look for
+5. How family members can assist in the rehabilitation process""",
+    "movement": """Provide comprehensive rehabilitation advice, including:
+1. Specific exercises for each area (upper limbs, lower limbs, balance)
+2. Safety precautions to prevent falls
+3. Adaptive equipment recommendations
+4. Goal setting for recovery milestones
+5. How to track progress effectively""",
+    "phq9": """Provide comprehensive psychological support advice, including:
+1. Self-care strategies for mental health
+2. When to seek professional help
+3. How family members can provide emotional support
+4. Daily activities to improve mood
+5. How mental health connects with overall recovery""",
+    "blood_pressure": """Provide comprehensive health management advice, including:
+1. Diet recommendations specific to this blood pressure level
+2. Exercise guidelines appropriate for stroke rehabilitation patients
+3. Stress management techniques
+4. Monitoring schedule recommendations
+5. Warning signs that require immediate medical attention""",
+    None: "Provide general rehabilitation advice for a stroke patient based on their assessment results.",
+}
+
+# "My pressure", "мой результат", "bosimim", "mi puntuación": the patient's own readings, matched
+# on normalized text (lowercase, accents stripped, so "мой" is "мои")
+OWN_READINGS = re.compile(
+    r"\b(my|mi|mis|mening|мо(и|я|е|его|еи|их|ем)|у меня)\b(\W+\w+){0,3}?\W+"
+    r"(results?|scores?|pressure|levels?|readings?|numbers?|tests?|resultados?|puntuacion\w*|presion|nivel\w*|"
+    r"natija\w*|ball\w*|bosim\w*|daraja\w*|результат\w*|балл\w*|давлени\w*|уров\w*|показател\w*|оценк\w*)\b"
+    r"|\b(natijam|natijalarim|ballim|ballarim|bosimim|darajam)\b"
+)
+
+chat_prompt = register_prompt("patient-chat")
+chat_advice_prompt = register_prompt("patient-chat-advice")
+advice_prompt = register_prompt("assessment-advice")
+
+def build_chat_messages(request: ChatRequest):
+    """
+    Build the OpenAI messages for a chat request, compacted to the chat token budget.
+
+    Returns:
+        tuple: (messages, language_instruction); the instruction is "" when no language was selected or detected.
+    """
+    # Select appropriate language instruction
+    language_instruction = ""
+    if request.language == "es":
+        language_instruction = "Please respond in Spanish."
+    elif request.language == "ru":
+        language_instruction = "Please respond in Russian."
+    elif request.language == "uz":
+        language_instruction = "Please respond in Uzbek."
+    
+    # Auto-detect language from the last user message if no language specified
+    if not language_instruction:
+        last_user_message = ""
+        for msg in reversed(request.messages):
+            if msg.role == "user":
+                last_user_message = msg.content
+                break
+        
+        # Simple language detection based on common words
+        # This is a simplified approach - in production you might want to use a proper language detection library
+        if any(word in last_user_message.lower() for word in ["qanday", "nima", "qachon", "qayerda", "nega"]):
+            language_instruction = "Please respond in Uzbek."
+        elif any(word in last_user_message.lower() for word in ["как", "что", "когда", "где", "почему"]):
+            language_instruction = "Please respond in Russian."
+        elif any(word in last_user_message.lower() for word in ["cómo", "qué", "cuándo", "dónde", "por qué"]):
+            language_instruction = "Please respond in Spanish."
+    
+    # Per-request context goes right before the question, after the conversation, so the
+    # prefix shared with other patients and with this patient's previous turn stays intact
+    context_messages = []
+    if language_instruction:
+        context_messages.append(message("system", language_instruction))
+    
+    # Add patient context if available, as one compact line
+    context_message = compact_context(request.patient_context)
+    if context_message:
+        context_messages.append(message("system", context_message))
+    
+    # Recent turns verbatim, older ones folded into a summary
+    history = [message(m.role, m.content) for m in request.messages]
+    messages = chat_history.build(CHAT_STATIC_MESSAGES, history, context_messages)
+    return chat_prompt.observe(messages, len(CHAT_STATIC_MESSAGES)), language_instruction
+
+def asks_about_results(request: ChatRequest) -> bool:
+    """Whether the last message asks about assessment results."""
+    return any(keyword in str(request.messages[-1].content).lower() for keyword in 
+               ["result", "score", "assessment", "test", "evaluation", "natija", "baho", "результат", "оценка"])
+
+def asks_about_own_readings(request: ChatRequest) -> bool:
+    """Whether the last message asks about the patient's own results, scores or readings."""
+    return OWN_READINGS.search(normalize(str(request.messages[-1].content))) is not None
+
+def faq_answer(request: ChatRequest) -> Optional[dict]:
+    """
+    Curated answer to the last message if it is a common question, else None.
+    """
+    if not request.messages or request.messages[-1].role != "user":
+        return None
+    # Questions about the patient's own results need the model and the patient context
+    if request.patient_context and asks_about_results(request):
+        return None
+    # "What is my blood pressure?" resembles a general FAQ but needs the patient's own data;
+    # only near-verbatim FAQ phrasings ("How often should I check my blood pressure?") pass
+    threshold = FAQ_PERSONAL_THRESHOLD if asks_about_own_readings(request) else None
+    # A selected language wins; otherwise the answer follows the language of the question
+    language = request.language if request.language != "en" else None
+    return faq_index.answer(request.messages[-1].content, language, threshold)
+
+def advice_completion(request: ChatRequest, language_instruction: str):
+    """
+    Completion of extra health advice when the last message asks about assessment results, else None.
+    """
+    # Generate additional health advice if this is a question about assessment results
+    if not asks_about_results(request):
+        return None
+        
+    context_info = ""
+    if request.patient_context:
+        # Extract specific assessment context
+        assessment_type = request.patient_context.get("assessmentType", "")
+        assessment_data = request.patient_context.get("assessmentResults", {})
+        
+        if assessment_type and assessment_data:
+            context_info = f"Assessment type: {assessment_type}. Assessment data: {json.dumps(assessment_data)}. "
+    
+    # The fixed request leads the message; the patient's data and language follow it
+    advice_request = f"{ADVICE_REQUEST} {context_info}{language_instruction}".strip()
+    
+    # An empty fallback drops the advice if it fails or times out, keeping the reply
+    return acreate_chat_completion(
+        messages=chat_advice_prompt.build(CHAT_STATIC_MESSAGES, history=[message("user", advice_request)]),
+        model="gpt-3.5-turbo",
+        max_tokens=400,
+        temperature=0.7,
+        fallback="",
+        timeout=LLM_TIMEOUT
+    )
+
 @router.post("/patient-chat", response_model=ChatResponse)
-async def get_chat_response(request: ChatRequest):
+async def get_chat_response(request: ChatRequest, http_request: Request = None, http_response: Response = None):
     """
     Get AI response for patient chat interactions.
     This can be used either for:
@@ -34,104 +214,126 @@ async def get_chat_response(request: ChatRequest):
     2. General medical questions related to stroke rehabilitation
     """
     try:
-        # Convert messages to OpenAI format
-        openai_messages = []
-        
-        # Add system message with medical context
-        system_message = "You are a helpful medical assistant specializing in stroke rehabilitation. "
-        system_message += "Provide accurate, clear, and compassionate responses to patients and their relatives. "
-        system_message += "Focus on evidence-based advice but explain it in simple terms. "
-        system_message += "Do not provide specific medical diagnoses or prescribe medication. "
-        system_message += "For serious concerns, always recommend consulting with healthcare professionals."
-        
-        openai_messages.append({"role": "system", "content": system_message})
-        
-        # Add patient context if available
-        if request.patient_context:
-            context_message = "Patient information: "
-            for key, value in request.patient_context.items():
-                context_message += f"{key}: {value}, "
-            openai_messages.append({"role": "system", "content": context_message})
-            
-        # Add conversation history
-        for message in request.messages:
-            openai_messages.append({"role": message.role, "content": message.content})
-        
-        # Select appropriate language instruction
-        language_instruction = ""
-        if request.language == "es":
-            language_instruction = "Please respond in Spanish."
-        elif request.language == "ru":
-            language_instruction = "Please respond in Russian."
-        elif request.language == "uz":
-            language_instruction = "Please respond in Uzbek."
-        
-        # Auto-detect language from the last user message if no language specified
-        if not language_instruction:
-            last_user_message = ""
-            for msg in reversed(openai_messages):
-                if msg["role"] == "user":
-                    last_user_message = msg["content"]
-                    break
-            
-            # Simple language detection based on common words
-            # This is a simplified approach - in production you might want to use a proper language detection library
-            if any(word in last_user_message.lower() for word in ["qanday", "nima", "qachon", "qayerda", "nega"]):
-                language_instruction = "Please respond in Uzbek."
-            elif any(word in last_user_message.lower() for word in ["как", "что", "когда", "где", "почему"]):
-                language_instruction = "Please respond in Russian."
-            elif any(word in last_user_message.lower() for word in ["cómo", "qué", "cuándo", "dónde", "por qué"]):
-                language_instruction = "Please respond in Spanish."
-        
-        if language_instruction:
-            # Add language instruction to system message for better results
-            openai_messages.insert(1, {"role": "system", "content": language_instruction})
+        # Common questions are answered from the local corpus in about a millisecond
+        faq = faq_answer(request)
+        if faq is not None:
+            if http_response is not None:
+                http_response.headers["X-Answer-Source"] = "faq"
+            return ChatResponse(response=faq["answer"])
+
+        openai_messages, language_instruction = build_chat_messages(request)
+        # Refused before any call starts once the client's token quota is spent
+        check_quota(openai_messages, 500)
         
         logging.info(f"Sending chat request to OpenAI with {len(openai_messages)} messages")
         
-        # Call OpenAI API using our helper function
-        chat_response = create_chat_completion(
-            messages=openai_messages,
-            model="gpt-3.5-turbo",
-            max_tokens=500,
-            temperature=0.7
-        )
-        
-        # Generate additional health advice if this is a question about assessment results
-        advice = None
-        if any(keyword in str(request.messages[-1].content).lower() for keyword in 
-               ["result", "score", "assessment", "test", "evaluation", "natija", "baho", "результат", "оценка"]):
-            
-            context_info = ""
-            if request.patient_context:
-                # Extract specific assessment context
-                assessment_type = request.patient_context.get("assessmentType", "")
-                assessment_data = request.patient_context.get("assessmentResults", {})
-                
-                if assessment_type and assessment_data:
-                    context_info = f"Assessment type: {assessment_type}. Assessment data: {json.dumps(assessment_data)}. "
-            
-            advice_prompt = f"{context_info}Based on the patient's assessment results, provide 3-5 specific and personalized recommendations for stroke rehabilitation. Include specific exercises, lifestyle changes, and monitoring advice. {language_instruction}"
-            
-            # Use our helper for the advice response too
-            advice = create_chat_completion(
-                messages=[
-                    {"role": "system", "content": system_message}, 
-                    {"role": "user", "content": advice_prompt}
-                ],
+        # Chat has its own concurrency limit so a burst cannot starve the assessment routes
+        async with chat_bulkhead.acquire():
+            # Call OpenAI API using our helper function; awaiting keeps the event loop free
+            timing = ServerTiming()
+            calls = [timing.measure("llm-reply", acreate_chat_completion(
+                messages=openai_messages,
                 model="gpt-3.5-turbo",
-                max_tokens=400,
-                temperature=0.7
-            )
+                max_tokens=500,
+                temperature=0.7,
+                timeout=LLM_TIMEOUT
+            ))]
+
+            # The advice does not depend on the reply, so both completions run concurrently
+            advice_call = advice_completion(request, language_instruction)
+            if advice_call is not None:
+                calls.append(timing.measure("llm-advice", advice_call))
+
+            # Both calls are cancelled if the client disconnects
+            results = await cancel_on_disconnect(http_request, asyncio.gather(*calls))
+            chat_response = results[0]
+            advice = (results[1] or None) if len(results) > 1 else None
+        
+        if http_response is not None:
+            http_response.headers["Server-Timing"] = timing.header()
             
         logging.info(f"Chat response generated successfully")
         
         return ChatResponse(response=chat_response, advice=advice)
         
+    except BulkheadFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in patient chat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Chat service error: {str(e)}")
 
+@router.post("/patient-chat/stream")
+async def stream_chat_response(request: ChatRequest):
+    """
+    Streaming version of /patient-chat, sent as server-sent events.
+
+    Reply tokens are sent as "token" events while they are generated. A final
+    "done" event carries the full reply, the advice (generated concurrently)
+    and the recommendations extracted from the reply.
+    """
+    faq = faq_answer(request)
+    if faq is not None:
+        async def faq_events():
+            yield sse_event("token", {"text": faq["answer"]})
+            yield sse_event("done", {
+                "response": faq["answer"],
+                "advice": None,
+                "recommendations": extract_recommendations(faq["answer"]),
+                "source": "faq"
+            })
+
+        return sse_response(faq_events())
+
+    openai_messages, language_instruction = build_chat_messages(request)
+    try:
+        check_quota(openai_messages, 500)
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    # Refuse up front while saturated, so the client gets a 503 instead of an empty stream
+    if chat_bulkhead.saturated():
+        raise HTTPException(status_code=503, detail="Too many concurrent 'chat' requests. Please try again shortly.",
+                            headers={"Retry-After": "5"})
+
+    async def events():
+        try:
+            # The slot is held until the stream ends or the client goes away
+            async with chat_bulkhead.acquire():
+                # Started before the reply streams so it is usually ready by the end
+                advice_call = advice_completion(request, language_instruction)
+                advice_task = asyncio.ensure_future(advice_call) if advice_call is not None else None
+                try:
+                    chunks = []
+                    async for text in astream_chat_completion(
+                        messages=openai_messages,
+                        model="gpt-3.5-turbo",
+                        max_tokens=500,
+                        temperature=0.7,
+                        timeout=LLM_TIMEOUT
+                    ):
+                        chunks.append(text)
+                        yield sse_event("token", {"text": text})
+
+                    chat_response = "".join(chunks)
+                    advice = (await advice_task or None) if advice_task is not None else None
+                    yield sse_event("done", {
+                        "response": chat_response,
+                        "advice": advice,
+                        "recommendations": extract_recommendations(chat_response)
+                    })
+                finally:
+                    # The client went away mid-stream; nobody will read the advice
+                    if advice_task is not None and not advice_task.done():
+                        advice_task.cancel()
+        except BulkheadFullError as e:
+            yield sse_event("error", {"detail": str(e)})
+
+    return sse_response(events())
+
 @router.post("/assessment-advice", response_model=ChatResponse)
 async def get_assessment_advice(request: Request):
     """
@@ -147,65 +349,29 @@ async def get_assessment_advice(request: Request):
         if not assessment_type or not results:
             raise HTTPException(status_code=400, detail="Missing assessment data")
             
-        # Construct prompt based on assessment type
+        # Results and language go in the user message, after the static instructions
         if assessment_type == "speech_hearing":
-            prompt = f"""
-            Based on these speech and hearing assessment results:
-            - Speech score: {results.get('speech_score', 'N/A')}/15 (Level: {results.get('speech_level', 'N/A')})
-            - Hearing score: {results.get('hearing_score', 'N/A')}/15 (Level: {results.get('hearing_level', 'N/A')})
-            - Total score: {results.get('total_score', 'N/A')}/30 (Level: {results.get('overall_level', 'N/A')})
-            
-            Provide comprehensive rehabilitation advice, including:
-            1. Specific exercises the patient should practice daily
-            2. Technology tools or apps that might help
-            3. When they should see a specialist
-            4. Signs of improvement to look for
-            5. How family members can assist in the rehabilitation process
-            """
+            prompt = f"""Based on these speech and hearing assessment results:
+- Speech score: {results.get('speech_score', 'N/A')}/15 (Level: {results.get('speech_level', 'N/A')})
+- Hearing score: {results.get('hearing_score', 'N/A')}/15 (Level: {results.get('hearing_level', 'N/A')})
+- Total score: {results.get('total_score', 'N/A')}/30 (Level: {results.get('overall_level', 'N/A')})"""
             
         elif assessment_type == "movement":
-            prompt = f"""
-            Based on these movement assessment results:
-            - Upper limb score: {results.get('upper_limb_score', 'N/A')}/15 (Level: {results.get('upper_limb_level', 'N/A')})
-            - Lower limb score: {results.get('lower_limb_score', 'N/A')}/12 (Level: {results.get('lower_limb_level', 'N/A')})
-            - Balance score: {results.get('balance_score', 'N/A')}/12 (Level: {results.get('balance_level', 'N/A')})
-            - Total score: {results.get('total_score', 'N/A')}/39 (Level: {results.get('overall_level', 'N/A')})
-            
-            Provide comprehensive rehabilitation advice, including:
-            1. Specific exercises for each area (upper limbs, lower limbs, balance)
-            2. Safety precautions to prevent falls
-            3. Adaptive equipment recommendations
-            4. Goal setting for recovery milestones
-            5. How to track progress effectively
-            """
+            prompt = f"""Based on these movement assessment results:
+- Upper limb score: {results.get('upper_limb_score', 'N/A')}/15 (Level: {results.get('upper_limb_level', 'N/A')})
+- Lower limb score: {results.get('lower_limb_score', 'N/A')}/12 (Level: {results.get('lower_limb_level', 'N/A')})
+- Balance score: {results.get('balance_score', 'N/A')}/12 (Level: {results.get('balance_level', 'N/A')})
+- Total score: {results.get('total_score', 'N/A')}/39 (Level: {results.get('overall_level', 'N/A')})"""
             
         elif assessment_type == "phq9":
-            prompt = f"""
-            Based on the PHQ-9 depression assessment with a score of {results.get('score', 'N/A')} 
-            (Category: {results.get('category', 'N/A')}),
-            
-            Provide comprehensive psychological support advice, including:
-            1. Self-care strategies for mental health
-            2. When to seek professional help
-            3. How family members can provide emotional support
-            4. Daily activities to improve mood
-            5. How mental health connects with overall recovery
-            """
+            prompt = (f"Based on the PHQ-9 depression assessment with a score of {results.get('score', 'N/A')} "
+                      f"(Category: {results.get('category', 'N/A')}).")
             
         elif assessment_type == "blood_pressure":
-            prompt = f"""
-            Based on the blood pressure reading in category '{results.get('category', 'N/A')}',
-            
-            Provide comprehensive health management advice, including:
-            1. Diet recommendations specific to this blood pressure level
-            2. Exercise guidelines appropriate for stroke rehabilitation patients
-            3. Stress management techniques
-            4. Monitoring schedule recommendations
-            5. Warning signs that require immediate medical attention
-            """
+            prompt = f"Based on the blood pressure reading in category '{results.get('category', 'N/A')}'."
             
         else:
-            prompt = f"Provide general rehabilitation advice for a stroke patient based on their assessment results."
+            prompt = f"Assessment type: {assessment_type}."
         
         # Add language instruction
         if language == "es":
@@ -214,21 +380,32 @@ async def get_assessment_advice(request: Request):
             prompt += "\nPlease respond in Russian."
             
         # Get response from OpenAI using our helper
-        advice = create_chat_completion(
-            messages=[
-                {"role": "system", "content": "You are a medical specialist providing comprehensive rehabilitation advice for stroke patients."},
-                {"role": "user", "content": prompt}
-            ],
-            model="gpt-3.5-turbo",
-            max_tokens=550,
-            temperature=0.7
-        )
+        async with chat_bulkhead.acquire():
+            advice = await cancel_on_disconnect(request, acreate_chat_completion(
+                messages=advice_prompt.build(
+                    static=[message("system", ADVICE_SYSTEM_MESSAGE),
+                            message("system", ADVICE_INSTRUCTIONS.get(assessment_type, ADVICE_INSTRUCTIONS[None]))],
+                    history=[message("user", prompt)]
+                ),
+                model="gpt-3.5-turbo",
+                max_tokens=550,
+                temperature=0.7,
+                timeout=LLM_TIMEOUT,
+                # The prompt depends only on the assessment results and language
+                cache=llm_cache
+            ))
         
         return ChatResponse(
             response="Assessment advice generated successfully.", 
             advice=advice
         )
         
+    except BulkheadFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except QuotaExceededError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error generating assessment advice: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Assessment advice error: {str(e)}")
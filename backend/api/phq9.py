@@ -1,21 +1,25 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-import joblib
-import numpy as np
+from typing import List
 import sys
 import os
 
 # Add project root to Python path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 from ml_models.phq_model import predict_phq_level, analyze_phq9
+from ml_models.phq_lookup import predict_phq
 from backend.schemas.phq9 import PHQ9Request, PHQ9Response
+from backend.utils.batch_inputs import BatchValidationError, stack_columns, check_range
+from backend.utils.micro_batcher import MicroBatcher
 router = APIRouter()
 
-# Load the PHQ-9 model
-import os
-
-phq9_model_path = os.path.join(os.path.dirname(__file__), "../../ml_models/phq_model.pkl")
-phq9_model = joblib.load(os.path.abspath(phq9_model_path))
+# Concurrent single predictions are grouped into one vectorized predict_phq call
+phq_batcher = MicroBatcher(
+    "phq",
+    predict_phq,
+    max_batch_size=int(os.getenv("PHQ_BATCH_MAX_SIZE", "64")),
+    max_wait_ms=float(os.getenv("PHQ_BATCH_MAX_WAIT_MS", "2")),
+)
 
 class PHQ9Request(BaseModel):
     phq1: int
@@ -28,6 +32,20 @@ class PHQ9Request(BaseModel):
     phq8: int
     phq9: int
 
+class PHQ9BatchRequest(BaseModel):
+    """Columnar PHQ-9 answers: entry i of every list belongs to patient i."""
+    phq1: List[int]
+    phq2: List[int]
+    phq3: List[int]
+    phq4: List[int]
+    phq5: List[int]
+    phq6: List[int]
+    phq7: List[int]
+    phq8: List[int]
+    phq9: List[int]
+
+PHQ9_COLUMNS = [f"phq{i}" for i in range(1, 10)]
+
 class PHQInput(BaseModel):
     q1: int
     q2: int
@@ -40,13 +58,27 @@ class PHQInput(BaseModel):
     q9: int
 
 @router.post("/phq9/predict")
-def predict_phq9(data: PHQ9Request):
-    features = np.array([[
+async def predict_phq9(data: PHQ9Request):
+    prediction = await phq_batcher.predict([
         data.phq1, data.phq2, data.phq3, data.phq4, data.phq5,
         data.phq6, data.phq7, data.phq8, data.phq9
-    ]])
-    prediction = phq9_model.predict(features)
-    return {"prediction": prediction[0]}
+    ])
+    return {"prediction": prediction}
+
+@router.post("/phq9/predict-batch")
+def predict_phq9_batch(data: PHQ9BatchRequest):
+    """
+    Predict PHQ-9 results for a whole cohort in one call.
+    All rows are validated together and scored with a single vectorized prediction.
+    """
+    try:
+        features = stack_columns(data, PHQ9_COLUMNS)
+        check_range(features, 0, 3)
+    except BatchValidationError as e:
+        raise HTTPException(status_code=422, detail=e.to_detail())
+
+    predictions = predict_phq(features)
+    return {"count": len(predictions), "predictions": predictions.tolist()}
 
 @router.post("/phq/analyze")
 async def analyze_phq(input_data: PHQInput):
@@ -1,11 +1,18 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from typing import List
-import openai
+from typing import List, Optional
 import logging
+import os
+from backend.utils.openai_helper import create_chat_completion
+from backend.utils.llm_cache import llm_cache
+from backend.utils.bulkhead import recommendations_bulkhead
+from backend.utils.job_queue import recommendation_jobs, JobQueueFullError, RECOMMENDATIONS_PENDING
 
 router = APIRouter()
 
+# Seconds to wait for the OpenAI recommendations before answering with a fallback message
+LLM_TIMEOUT = float(os.getenv("SPEECH_HEARING_LLM_TIMEOUT", "15"))
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
@@ -28,14 +35,20 @@ class SpeechHearingResponse(BaseModel):
     hearing_level: str
     overall_level: str
     recommendations: str
+    # Set when the recommendations are generated in the background; fetch them from /jobs/{recommendations_id}
+    recommendations_id: Optional[str] = None
     
 @router.post("/speech-hearing", response_model=SpeechHearingResponse)
-def analyze_speech_hearing_alt(data: SpeechHearingRequest):
+def analyze_speech_hearing_alt(data: SpeechHearingRequest, defer_recommendations: bool = False):
     """Alternative endpoint for speech hearing assessment that matches frontend path"""
-    return analyze_speech_hearing(data)
+    return analyze_speech_hearing(data, defer_recommendations)
 
 @router.post("/assessment/speech-hearing", response_model=SpeechHearingResponse)
-def analyze_speech_hearing(data: SpeechHearingRequest):
+def analyze_speech_hearing(data: SpeechHearingRequest, defer_recommendations: bool = False):
+    """
+    Score a speech and hearing assessment. With defer_recommendations=true the scores are
+    returned right away and the AI recommendations follow at /jobs/{recommendations_id}.
+    """
     try:
         # Calculate scores
         questions = data.questions
@@ -56,11 +69,20 @@ def analyze_speech_hearing(data: SpeechHearingRequest):
         overall_level = get_level(total_score, 30)
         
         # Generate AI recommendations
-        recommendations = generate_ai_recommendations(
+        recommendation_args = (
             speech_score, hearing_score, total_score,
             speech_level, hearing_level, overall_level,
             data.language, data.patient_age
         )
+        recommendations_id = None
+        if defer_recommendations:
+            try:
+                recommendations_id = recommendation_jobs.submit_from_thread(generate_ai_recommendations, *recommendation_args)
+                recommendations = RECOMMENDATIONS_PENDING
+            except JobQueueFullError:
+                recommendations = "Unable to generate AI recommendations at this time."
+        else:
+            recommendations = generate_ai_recommendations(*recommendation_args)
         
         logging.info(f"Analyzed speech and hearing assessment: Speech={speech_score}, Hearing={hearing_score}, Total={total_score}")
         
@@ -71,7 +93,8 @@ def analyze_speech_hearing(data: SpeechHearingRequest):
             speech_level=speech_level,
             hearing_level=hearing_level,
             overall_level=overall_level,
-            recommendations=recommendations
+            recommendations=recommendations,
+            recommendations_id=recommendations_id
         )
         
     except Exception as e:
@@ -136,17 +159,21 @@ def generate_ai_recommendations(speech_score: int, hearing_score: int, total_sco
             speech and hearing abilities based on the above scores. Include exercises, 
             therapies, and available resources.
             """        # Call OpenAI API
-        openai_response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a speech and hearing specialist providing professional medical recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=300,
-            temperature=0.7
-        )
-        
-        recommendations = openai_response.choices[0].message['content'].strip()
+        # Separate concurrency limit from chat traffic
+        with recommendations_bulkhead.acquire_sync():
+            recommendations = create_chat_completion(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a speech and hearing specialist providing professional medical recommendations."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=300,
+                temperature=0.7,
+                fallback="Unable to generate AI recommendations at this time.",
+                # The prompt depends only on scores, levels, age and language
+                cache=llm_cache,
+                timeout=LLM_TIMEOUT
+            ).strip()
         return recommendations
         
     except Exception as e:
@@ -1,5 +1,6 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException, Request
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 import os
 import logging
 import sys
@@ -17,6 +18,8 @@ except ImportError:
     logging.warning("Video ML models not available. Video analysis will be limited.")
     ML_AVAILABLE = False
 
+from backend.utils.job_queue import media_jobs, JobQueueFullError
+
 router = APIRouter()
 
 # Configure logging
@@ -31,14 +34,34 @@ class VideoAnalysisResponse(BaseModel):
     file_size: int
     duration: Optional[float] = None
     analysis: Optional[dict] = None
+    job_id: Optional[str] = None
     status: str = "success"
     message: str = ""
 
+def save_upload(file: UploadFile, file_path: str):
+    with open(file_path, "wb") as f:
+        shutil.copyfileobj(file.file, f)
+
+def submit_analysis(file_path: str, **options) -> str:
+    """Queue exercise analysis of a video in the media worker pool."""
+    try:
+        return media_jobs.submit(analyze_exercise_video, file_path, **options)
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+
+def parse_min_confidence(value) -> float:
+    """Validate a "min_confidence" option: a number from 0 to 1."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 1:
+        raise HTTPException(status_code=422, detail=f"min_confidence must be a number between 0 and 1, got {value!r}")
+    return float(value)
+
 @router.post("/upload", response_model=VideoAnalysisResponse)
-async def upload_video(file: UploadFile = File(...)):
+async def upload_video(file: UploadFile = File(...), background: bool = False):
     """
     Upload and analyze a video file for exercise analysis.
     Supports mp4, mov, avi formats.
+    Analysis runs in the media worker pool. With background=true the response returns
+    immediately with a job_id to poll at /jobs/{job_id}; otherwise it waits for the result.
     """
     try:
         # Validate file
@@ -56,8 +79,7 @@ async def upload_video(file: UploadFile = File(...)):
         
         # Save the uploaded file
         file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as f:
-            shutil.copyfileobj(file.file, f)
+        await run_in_threadpool(save_upload, file, file_path)
         
         # Get file size
         file_size = os.path.getsize(file_path)
@@ -70,20 +92,26 @@ async def upload_video(file: UploadFile = File(...)):
         
         # Perform video analysis if ML models are available
         if ML_AVAILABLE:
-            try:
-                # Video exercise analysis
-                analysis_results = analyze_exercise_video(file_path)
-                response.analysis = analysis_results
-                
+            response.job_id = submit_analysis(file_path)
+            if background:
+                response.status = "queued"
+                response.message = f"Video uploaded. Analysis queued, poll /jobs/{response.job_id} for the result."
+                return response
+
+            job = await media_jobs.wait(response.job_id)
+            if job["status"] == "succeeded":
+                response.analysis = job["result"]
                 response.message = "Video successfully uploaded and analyzed"
-            except Exception as ml_error:
-                logging.error(f"Error in video ML processing: {str(ml_error)}")
+            else:
+                logging.error(f"Error in video ML processing: {job['error']}")
                 response.message = "Video uploaded, but analysis failed. Basic information only."
         else:
             response.message = "Video uploaded successfully. Analysis not available."
         
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error processing video upload: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing video upload: {str(e)}")
@@ -91,7 +119,10 @@ async def upload_video(file: UploadFile = File(...)):
 @router.post("/analyze")
 async def analyze_video_data(request: Request):
     """
-    Analyze previously uploaded video file
+    Analyze previously uploaded video file.
+    Set "background": true in the body to get a job_id back instead of waiting.
+    Re-analysis reuses the video's cached pose landmarks, so an optional
+    "min_confidence" threshold can be tried without re-running pose estimation.
     """
     try:
         data = await request.json()
@@ -106,13 +137,22 @@ async def analyze_video_data(request: Request):
             raise HTTPException(status_code=404, detail=f"File {filename} not found")
             
         if ML_AVAILABLE:
-            # Video analysis
-            analysis_results = analyze_exercise_video(file_path)
+            options = {}
+            if data.get("min_confidence") is not None:
+                options["min_confidence"] = parse_min_confidence(data["min_confidence"])
+            job_id = submit_analysis(file_path, **options)
+            if data.get("background"):
+                return {"status": "queued", "filename": filename, "job_id": job_id}
+
+            job = await media_jobs.wait(job_id)
+            if job["status"] != "succeeded":
+                raise RuntimeError(job["error"])
             
             return {
                 "status": "success",
                 "filename": filename,
-                "analysis": analysis_results
+                "job_id": job_id,
+                "analysis": job["result"]
             }
         else:
             return {
@@ -120,6 +160,8 @@ async def analyze_video_data(request: Request):
                 "message": "Video analysis is not available"
             }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in video analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error in video analysis: {str(e)}")
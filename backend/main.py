@@ -1,7 +1,5 @@
 from fastapi import FastAPI, Request, HTTPException
 from pydantic import BaseModel
-import joblib
-import numpy as np
 from fastapi.middleware.cors import CORSMiddleware
 import json
 import os
@@ -9,10 +7,12 @@ import logging
 import random
 from starlette.responses import JSONResponse, StreamingResponse
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 from datetime import datetime
 import time
 from collections import defaultdict, deque
+from contextlib import asynccontextmanager
 
 # Rate limiting utility
 class RateLimiter:
@@ -149,7 +149,7 @@ except Exception as e:
     logging.error(f"Error importing OpenAI integration fix: {str(e)}")
 
 # Correctly import API routers with the package prefix
-from backend.api.phq9 import router as phq9_router, PHQInput
+from backend.api.phq9 import router as phq9_router, PHQInput, phq_batcher
 from backend.api.alert_test_api import router as alert_test_router
 from backend.api.alerts_api import router as alerts_router
 # Removing test routers but adding production routers
@@ -167,25 +167,32 @@ from backend.api.nihss import router as nihss_router
 from backend.api.openai_integration import router as openai_router, RehabilitationAnalysisRequest
 from backend.api.auth import router as auth_router
 from backend.api.assessment_history import router as assessment_history_router
+from backend.api.models_api import router as models_router
+from backend.api.jobs_api import router as jobs_router
+from backend.api.llm_api import router as llm_router
+
+from backend.utils.openai_helper import close_clients as close_openai_clients
+from backend.utils.llm_telemetry import LLMRouteMiddleware
+from backend.utils.faq_index import faq_index
+from backend.utils.token_quota import TokenQuotaMiddleware
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Build the FAQ index before the first chat request instead of during it
+    await run_in_threadpool(faq_index.load)
+    yield
+    # Release the pooled OpenAI connections
+    await close_openai_clients()
+
+app = FastAPI(lifespan=lifespan)
 
 # Add project root to Python path
 import sys
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-# Apply OpenAI helper patches to fix API compatibility issues
-try:
-    import fix_patient_chat
-except ImportError:
-    logging.warning("Could not import fix_patient_chat module")
-
-# Load the trained model
-model = joblib.load(os.path.abspath(os.path.join(os.path.dirname(__file__), "../ml_models/phq_model.pkl")))
-
 # Import deployment helpers for production environment
 try:
     from deployment_helpers import configure_for_production
@@ -214,6 +221,12 @@ app.add_middleware(
 # Add custom middleware to handle Content-Length issues
 app.add_middleware(ContentLengthMiddleware)
 
+# Tag LLM calls with the route that made them for /llm/telemetry
+app.add_middleware(LLMRouteMiddleware)
+
+# Per-client quotas in LLM tokens for /chat and /openai; RateLimiter only counts requests
+app.add_middleware(TokenQuotaMiddleware)
+
 # Log startup configuration
 logging.info(f"Starting application in {'production' if is_production else 'development'} mode")
 logging.info(f"CORS allowed origins: {allowed_origins}")
@@ -242,13 +255,12 @@ class PHQData(BaseModel):
     phq9: int
 
 @app.post("/predict")
-def predict(data: PHQData):
-    features = np.array([[
+async def predict(data: PHQData):
+    prediction = await phq_batcher.predict([
         data.phq1, data.phq2, data.phq3, data.phq4, data.phq5,
         data.phq6, data.phq7, data.phq8, data.phq9
-    ]])
-    prediction = model.predict(features)
-    return {"prediction": prediction[0]}
+    ])
+    return {"prediction": prediction}
 
 # Health-check endpoint
 @app.get("/health")
@@ -277,7 +289,7 @@ async def global_rehabilitation_analysis(request: Request):
         )
         
         # Call the handler
-        return await analyze_rehabilitation_data(rehab_request)
+        return await analyze_rehabilitation_data(rehab_request, request)
     except Exception as e:
         logging.error(f"Error in rehabilitation analysis: {str(e)}")
         return {
@@ -320,12 +332,12 @@ async def global_analyze(request: Request):
             return analyze_movement(data)
         elif assessment_type == "audio":
             # Forward to audio analysis
-            from backend.api.audio_routes import analyze_audio
-            return await analyze_audio(request)
+            from backend.api.audio_routes import analyze_audio_data
+            return await analyze_audio_data(request)
         elif assessment_type == "video":
             # Forward to video analysis
-            from backend.api.video_routes import analyze_video
-            return await analyze_video(request)
+            from backend.api.video_routes import analyze_video_data
+            return await analyze_video_data(request)
         else:
             return {
                 "status": "error",
@@ -359,6 +371,9 @@ app.include_router(openai_router, prefix="/openai")  # Changed from /ai to /open
 # Auth router
 app.include_router(auth_router, prefix="/auth", tags=["Authentication"])
 app.include_router(assessment_history_router, prefix="/assessments", tags=["Assessments"])
+app.include_router(models_router, prefix="/models", tags=["Models"])
+app.include_router(jobs_router, prefix="/jobs", tags=["Jobs"])
+app.include_router(llm_router, prefix="/llm", tags=["LLM"])
 
 @app.middleware("http")
 async def add_recommendations(request: Request, call_next):
@@ -372,8 +387,10 @@ async def add_recommendations(request: Request, call_next):
         return response
 
     # Only process JSON responses from specific assessment endpoints and skip streaming responses
+    # Batch endpoints are skipped too: re-parsing a cohort-sized body only to add one string is wasted work
     if (response.headers.get("content-type") == "application/json" and 
         not isinstance(response, StreamingResponse) and
+        not request.url.path.endswith("-batch") and
         ("/assessment" in request.url.path or "/phq" in request.url.path)):
         try:
             # Collect the entire response body
@@ -400,8 +417,9 @@ async def add_recommendations(request: Request, call_next):
                     data["recommendations"] = "Recommendations unavailable."
             
             # Create a new response with the modified data
-            # This ensures Content-Length is correctly calculated
-            return JSONResponse(content=data, status_code=response.status_code, headers=dict(response.headers))
+            # The old Content-Length is dropped so it is recalculated for the new body
+            headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+            return JSONResponse(content=data, status_code=response.status_code, headers=headers)
         except Exception as e:
             # If any error occurs processing the response, log and return the original
             print(f"Error processing response: {str(e)}")
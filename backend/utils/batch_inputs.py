@@ -0,0 +1,67 @@
+"""
+Helpers for columnar batch requests: one list per questionnaire item, one entry per patient.
+"""
+
+import os
+from typing import List
+
+import numpy as np
+from pydantic import BaseModel
+
+BATCH_MAX_ROWS = int(os.getenv("BATCH_MAX_ROWS", "50000"))
+
+# Number of offending row indices echoed back in validation errors
+MAX_REPORTED_ROWS = 20
+
+
+class BatchValidationError(ValueError):
+    """Raised when a columnar batch is malformed or contains out-of-range rows."""
+
+    def __init__(self, message: str, rows: List[int] = None):
+        super().__init__(message)
+        self.message = message
+        self.rows = rows or []
+
+    def to_detail(self) -> dict:
+        return {"message": self.message, "rows": self.rows}
+
+
+def stack_columns(data: BaseModel, columns: List[str], max_rows: int = BATCH_MAX_ROWS) -> np.ndarray:
+    """
+    Stack the named list fields of a request into an (n_rows, n_columns) int array.
+
+    Raises:
+        BatchValidationError: If the columns are empty, of different lengths or too long.
+    """
+    lengths = {name: len(getattr(data, name)) for name in columns}
+    n_rows = lengths[columns[0]]
+    if len(set(lengths.values())) != 1:
+        raise BatchValidationError(f"All columns must have the same length, got {lengths}")
+    if n_rows == 0:
+        raise BatchValidationError("Batch is empty")
+    if n_rows > max_rows:
+        raise BatchValidationError(f"Batch has {n_rows} rows, the maximum is {max_rows}")
+
+    matrix = np.empty((n_rows, len(columns)), dtype=np.int64)
+    for j, name in enumerate(columns):
+        matrix[:, j] = getattr(data, name)
+    return matrix
+
+
+def check_range(matrix: np.ndarray, low: int, high: int = None):
+    """
+    Reject the batch if any value lies outside [low, high], reporting the offending rows.
+
+    Raises:
+        BatchValidationError: If at least one row has an out-of-range value.
+    """
+    invalid = matrix < low
+    if high is not None:
+        invalid |= matrix > high
+    bad_rows = np.flatnonzero(invalid.any(axis=1))
+    if bad_rows.size:
+        allowed = f"{low}-{high}" if high is not None else f">= {low}"
+        raise BatchValidationError(
+            f"{bad_rows.size} rows have values outside the allowed range {allowed}",
+            rows=bad_rows[:MAX_REPORTED_ROWS].tolist(),
+        )
@@ -0,0 +1,187 @@
+"""
+Bulkheads: per-route concurrency limits for LLM calls.
+
+Chat, rehabilitation analysis and the assessment recommendations all wait on
+the same upstream API, and the sync routes also share one threadpool. Each
+group of routes gets its own bulkhead: at most ``max_concurrent`` calls run,
+up to ``max_queue`` more wait for at most ``queue_timeout`` seconds, and the
+rest are refused with BulkheadFullError right away. A burst of chat traffic
+then fills the chat bulkhead and gets 503s, while ``/bp/analyze`` and
+``/assessment/movement`` keep their own slots. Routes whose main result does
+not depend on the LLM degrade to their fallback text instead of failing.
+
+Limits are configured per bulkhead with ``BULKHEAD_<NAME>_CONCURRENCY``,
+``BULKHEAD_<NAME>_QUEUE`` and ``BULKHEAD_<NAME>_QUEUE_TIMEOUT``.
+"""
+
+import asyncio
+import os
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict
+
+
+class BulkheadFullError(Exception):
+    """Raised when a bulkhead has no free slot and its wait queue is full or the wait timed out."""
+
+
+class _Waiter:
+    def __init__(self, loop=None):
+        self.granted = False
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Bulkhead:
+    def __init__(self, name: str, max_concurrent: int = 8, max_queue: int = 16, queue_timeout: float = 2.0):
+        """
+        Args:
+            name (str): Bulkhead name, used in errors and stats.
+            max_concurrent (int): Calls running at the same time.
+            max_queue (int): Calls allowed to wait for a slot; 0 refuses as soon as all slots are busy.
+            queue_timeout (float): Seconds a call waits for a slot before it is refused.
+        """
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+        self._counts = {"accepted": 0, "rejected": 0, "timed_out": 0, "peak_active": 0, "peak_queued": 0}
+
+    @asynccontextmanager
+    async def acquire(self):
+        """
+        Hold a slot for the duration of the block, waiting in the queue if needed.
+
+        Raises:
+            BulkheadFullError: If the queue is full or no slot freed up within queue_timeout.
+        """
+        waiter = self._enter(asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter.future, self.queue_timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                granted = not self._abandon(waiter)
+                if isinstance(e, asyncio.CancelledError):
+                    if granted:
+                        self._release()
+                    raise
+                if not granted:
+                    raise self._timed_out()
+                # The slot arrived just as the wait timed out; use it
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextmanager
+    def acquire_sync(self):
+        """Blocking counterpart of acquire() for sync routes running in the threadpool."""
+        waiter = self._enter(None)
+        if waiter is not None and not waiter.event.wait(self.queue_timeout) and self._abandon(waiter):
+            raise self._timed_out()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def saturated(self) -> bool:
+        """Whether a new call would be refused right now."""
+        with self._lock:
+            return self.active >= self.max_concurrent and len(self._waiters) >= self.max_queue
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "active": self.active,
+                "queued": len(self._waiters),
+                "max_concurrent": self.max_concurrent,
+                "max_queue": self.max_queue,
+                "queue_timeout": self.queue_timeout,
+                **self._counts,
+            }
+
+    def _enter(self, loop):
+        """Take a free slot (returns None) or join the queue (returns the waiter)."""
+        with self._lock:
+            if self.active < self.max_concurrent and not self._waiters:
+                self._take()
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self._counts["rejected"] += 1
+                raise BulkheadFullError(
+                    f"Too many concurrent '{self.name}' requests ({self.active} running, "
+                    f"{len(self._waiters)} waiting). Please try again shortly.")
+            waiter = _Waiter(loop)
+            self._waiters.append(waiter)
+            self._counts["peak_queued"] = max(self._counts["peak_queued"], len(self._waiters))
+            return waiter
+
+    def _take(self):
+        self.active += 1
+        self._counts["accepted"] += 1
+        self._counts["peak_active"] = max(self._counts["peak_active"], self.active)
+
+    def _abandon(self, waiter) -> bool:
+        """Leave the queue; False if a slot was already handed to the waiter."""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._waiters.remove(waiter)
+            return True
+
+    def _timed_out(self):
+        with self._lock:
+            self._counts["timed_out"] += 1
+        return BulkheadFullError(
+            f"No free slot for '{self.name}' requests within {self.queue_timeout:g}s. Please try again shortly.")
+
+    def _release(self):
+        with self._lock:
+            self.active -= 1
+            if not self._waiters:
+                return
+            # Hand the slot straight to the longest waiting call
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+            self._take()
+        waiter.wake()
+
+
+bulkheads: Dict[str, Bulkhead] = {}
+
+
+def register_bulkhead(name: str, max_concurrent: int, max_queue: int, queue_timeout: float) -> Bulkhead:
+    """Create a bulkhead whose limits can be overridden by BULKHEAD_<NAME>_* variables."""
+    prefix = f"BULKHEAD_{name.upper()}"
+    bulkhead = Bulkhead(
+        name,
+        max_concurrent=int(os.getenv(f"{prefix}_CONCURRENCY", str(max_concurrent))),
+        max_queue=int(os.getenv(f"{prefix}_QUEUE", str(max_queue))),
+        queue_timeout=float(os.getenv(f"{prefix}_QUEUE_TIMEOUT", str(queue_timeout)))
+    )
+    bulkheads[name] = bulkhead
+    return bulkhead
+
+
+# Patient chat, assessment advice and general chat completion; refused with 503 when full
+chat_bulkhead = register_bulkhead("chat", max_concurrent=8, max_queue=16, queue_timeout=2.0)
+# Rehabilitation analysis (gpt-4o, up to 1000 tokens); refused with 503 when full
+analysis_bulkhead = register_bulkhead("analysis", max_concurrent=4, max_queue=8, queue_timeout=2.0)
+# AI recommendations of the BP, movement and speech/hearing routes; the routes answer
+# without them when full, so the waits are short and the scores are never held up
+recommendations_bulkhead = register_bulkhead("recommendations", max_concurrent=8, max_queue=8, queue_timeout=0.5)
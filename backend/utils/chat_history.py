@@ -0,0 +1,221 @@
+"""
+Token-budgeted conversation window for patient chat.
+
+The chat frontend sends the whole conversation on every turn, so without
+compaction each turn is slower and more expensive than the last. The prompt
+is assembled as:
+
+1. the fixed system messages (instructions);
+2. one system message summarizing the older turns, if there are any;
+3. the last ``keep_turns`` messages verbatim, with the per-request context
+   messages (language, patient context) placed right before the newest one,
+   so the prefix shared with the previous turn stays byte-identical.
+
+Older messages are folded into a running summary built locally from the
+first sentence of each message, so compaction costs no extra LLM call and
+adds no latency. Messages are folded ``fold_step`` at a time, so the summary,
+and with it the prompt prefix the provider may have cached, changes only
+every few messages instead of on every turn. Summaries are cached by a rolling hash of the folded
+messages, so each turn only summarizes the messages folded since the last
+one. If the prompt is still over the token budget, more recent messages are
+folded too and the oldest summary lines are dropped. The newest message is
+kept verbatim unless it alone does not fit, e.g. a long pasted document; then
+it is cut to the room left.
+
+Tokens are counted with tiktoken when it is installed, otherwise estimated
+at about four characters per token.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # not installed, or the encoding could not be loaded offline
+    _encoding = None
+
+CHAT_TOKEN_BUDGET = int(os.getenv("CHAT_TOKEN_BUDGET", "3000"))
+CHAT_KEEP_TURNS = int(os.getenv("CHAT_KEEP_TURNS", "6"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "400"))
+CHAT_CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "300"))
+CHAT_FOLD_STEP = int(os.getenv("CHAT_FOLD_STEP", "4"))
+
+# Per-message formatting overhead of the chat format
+MESSAGE_OVERHEAD_TOKENS = 4
+# Longest line a folded message contributes to the summary
+SUMMARY_LINE_CHARS = 160
+
+_sentence_end = re.compile(r"(?<=[.!?])\s")
+_whitespace = re.compile(r"\s+")
+
+
+def count_tokens(text: str) -> int:
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Prompt tokens of a list of chat messages, formatting overhead included."""
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+def truncate(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens, marking the cut with an ellipsis."""
+    if count_tokens(text) <= max_tokens:
+        return text
+    if _encoding is not None:
+        return _encoding.decode(_encoding.encode(text)[:max(max_tokens - 1, 0)]) + "…"
+    return text[:max(max_tokens - 1, 0) * 4] + "…"
+
+
+def compact_context(context: Optional[Dict[str, Any]], max_tokens: int = CHAT_CONTEXT_TOKENS) -> str:
+    """
+    One-line patient context: empty values dropped, nested values as compact JSON,
+    the whole line capped at max_tokens.
+    """
+    if not context:
+        return ""
+    parts = []
+    # Sorted keys: the same context always gives the same bytes, whatever order the client sent
+    for key, value in sorted(context.items()):
+        if value is None or value == "" or value == [] or value == {}:
+            continue
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value, ensure_ascii=False, separators=(",", ":"), sort_keys=True)
+        parts.append(f"{key}: {value}")
+    if not parts:
+        return ""
+    return truncate("Patient information: " + "; ".join(parts), max_tokens)
+
+
+def summary_line(message: Dict[str, str]) -> str:
+    """First sentence of a message, labeled with who said it."""
+    text = _whitespace.sub(" ", message["content"]).strip()
+    first = _sentence_end.split(text, 1)[0]
+    if len(first) > SUMMARY_LINE_CHARS:
+        first = first[:SUMMARY_LINE_CHARS - 1].rstrip() + "…"
+    speaker = {"user": "Patient", "assistant": "Assistant"}.get(message["role"], "Note")
+    return f"- {speaker}: {first}"
+
+
+class ChatHistory:
+    def __init__(self, token_budget: int = CHAT_TOKEN_BUDGET, keep_turns: int = CHAT_KEEP_TURNS,
+                 summary_tokens: int = CHAT_SUMMARY_TOKENS, max_cached: int = 1024,
+                 fold_step: int = CHAT_FOLD_STEP):
+        """
+        Args:
+            token_budget (int): Upper bound on prompt tokens of the assembled messages.
+            keep_turns (int): Most recent messages kept verbatim while they fit the budget.
+            summary_tokens (int): Upper bound on tokens of the summary message.
+            max_cached (int): Running summaries kept in memory; least recently used are evicted.
+            fold_step (int): Older messages are folded in groups of this size; up to
+                fold_step - 1 messages beyond keep_turns stay verbatim meanwhile.
+        """
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.fold_step = max(1, fold_step)
+        self.summary_tokens = summary_tokens
+        self.max_cached = max_cached
+        self._summaries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "compacted": 0, "folded_messages": 0, "summary_hits": 0,
+                        "tokens_in": 0, "tokens_out": 0}
+
+    def build(self, system_messages: List[Dict[str, str]], history: List[Dict[str, str]],
+              context_messages: List[Dict[str, str]] = ()) -> List[Dict[str, str]]:
+        """
+        Assemble the prompt: system messages, a summary of older turns, recent turns verbatim.
+
+        Args:
+            system_messages: Fixed messages that always come first.
+            history: The conversation, oldest first, ending with the message to answer.
+            context_messages: Per-request messages placed just before the message to answer.
+        """
+        fixed = list(system_messages) + list(context_messages)
+        folding = max(0, len(history) - self.keep_turns)
+        keep = len(history) - (folding - folding % self.fold_step)
+        while True:
+            folded, recent = history[:len(history) - keep], history[len(history) - keep:]
+            summary = self._summary_message(folded, self._summary_budget(fixed, recent))
+            messages = (list(system_messages) + ([summary] if summary else []) + recent[:-1]
+                        + list(context_messages) + recent[-1:])
+            if keep <= 1 or message_tokens(messages) <= self.token_budget:
+                break
+            keep -= 1
+        if recent and message_tokens(messages) > self.token_budget:
+            room = self.token_budget - message_tokens(messages[:-1]) - MESSAGE_OVERHEAD_TOKENS
+            messages[-1] = {**recent[-1], "content": truncate(recent[-1]["content"], room)}
+
+        with self._lock:
+            self._counts["requests"] += 1
+            self._counts["tokens_in"] += message_tokens(fixed + history)
+            self._counts["tokens_out"] += message_tokens(messages)
+            if folded:
+                self._counts["compacted"] += 1
+                self._counts["folded_messages"] += len(folded)
+        return messages
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            cached = len(self._summaries)
+        return {
+            **counts,
+            "cached_summaries": cached,
+            "token_budget": self.token_budget,
+            "keep_turns": self.keep_turns,
+            "fold_step": self.fold_step,
+            "tokenizer": "tiktoken" if _encoding is not None else "estimate",
+        }
+
+    def _summary_budget(self, system_messages, recent):
+        room = self.token_budget - message_tokens(list(system_messages) + recent) - MESSAGE_OVERHEAD_TOKENS
+        return max(0, min(self.summary_tokens, room))
+
+    def _summary_message(self, folded, max_tokens):
+        if not folded or max_tokens <= 0:
+            return None
+        lines = self._summary_lines(folded)
+        header = "Summary of the earlier conversation:"
+        # The most recent lines matter most; drop the oldest until it fits
+        while lines and count_tokens("\n".join([header] + lines)) > max_tokens:
+            lines = lines[1:]
+        if not lines:
+            return None
+        return {"role": "system", "content": "\n".join([header] + lines)}
+
+    def _summary_lines(self, folded):
+        """Summary lines of the folded messages, extending the longest cached prefix."""
+        digests = []
+        digest = ""
+        for message in folded:
+            digest = hashlib.sha256(f"{digest}\0{message['role']}\0{message['content']}".encode("utf-8")).hexdigest()
+            digests.append(digest)
+
+        start, lines = 0, []
+        with self._lock:
+            for i in range(len(digests) - 1, -1, -1):
+                cached = self._summaries.get(digests[i])
+                if cached is not None:
+                    self._summaries.move_to_end(digests[i])
+                    self._counts["summary_hits"] += 1
+                    start, lines = i + 1, list(cached)
+                    break
+
+        lines += [summary_line(message) for message in folded[start:]]
+        with self._lock:
+            self._summaries[digests[-1]] = tuple(lines)
+            while len(self._summaries) > self.max_cached:
+                self._summaries.popitem(last=False)
+        return lines
+
+
+# Shared by the patient chat routes
+chat_history = ChatHistory()
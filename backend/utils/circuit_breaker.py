@@ -0,0 +1,135 @@
+"""
+Circuit breaker for upstream calls.
+
+When OpenAI is down or very slow, every request would otherwise wait out its
+whole deadline before falling back to canned text, tying up workers. The
+breaker counts consecutive failures, where a call slower than the latency
+threshold counts as a failure too, and after ``failure_threshold`` of them
+it opens. While open, calls are refused at once so callers answer with their
+fallback immediately. After ``reset_timeout`` seconds one trial call is let
+through (half-open). If it succeeds the breaker closes, and if it fails the
+breaker opens again.
+"""
+
+import os
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+OPENAI_BREAKER_FAILURES = int(os.getenv("OPENAI_BREAKER_FAILURES", "5"))
+OPENAI_BREAKER_LATENCY = float(os.getenv("OPENAI_BREAKER_LATENCY", "20"))
+OPENAI_BREAKER_RESET = float(os.getenv("OPENAI_BREAKER_RESET", "30"))
+
+
+class CircuitOpenError(Exception):
+    """Raised in place of a call refused by an open breaker."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open; retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = OPENAI_BREAKER_FAILURES,
+                 latency_threshold: float = OPENAI_BREAKER_LATENCY, reset_timeout: float = OPENAI_BREAKER_RESET):
+        """
+        Args:
+            name (str): Name shown in stats and errors.
+            failure_threshold (int): Consecutive failures that open the breaker.
+            latency_threshold (float): Seconds after which a successful call still counts as a failure.
+            reset_timeout (float): Seconds the breaker stays open before a trial call.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.latency_threshold = latency_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self._counts = {"successes": 0, "failures": 0, "slow_calls": 0, "rejected": 0, "opened": 0}
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now; refused calls are counted."""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._trial_running = False
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._trial_running:
+                self._trial_running = True
+                return True
+            self._counts["rejected"] += 1
+            return False
+
+    def check(self):
+        """Like allow(), but raises CircuitOpenError when the call is refused."""
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self, duration: float):
+        """Record a finished call; one slower than latency_threshold counts as a failure."""
+        if duration > self.latency_threshold:
+            with self._lock:
+                self._counts["slow_calls"] += 1
+            self.record_failure()
+            return
+        with self._lock:
+            self._counts["successes"] += 1
+            self.consecutive_failures = 0
+            self._trial_running = False
+            self.state = CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._counts["failures"] += 1
+            self.consecutive_failures += 1
+            self._trial_running = False
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    self._counts["opened"] += 1
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """Give back a trial slot taken by allow() for a call that was abandoned without a result."""
+        with self._lock:
+            self._trial_running = False
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial call through."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def reset(self):
+        """Close the breaker, e.g. after fixing the API key."""
+        with self._lock:
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def stats(self) -> dict:
+        retry_after = self.retry_after()
+        with self._lock:
+            return {
+                "name": self.name,
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "retry_after": round(retry_after, 1),
+                "failure_threshold": self.failure_threshold,
+                "latency_threshold": self.latency_threshold,
+                "reset_timeout": self.reset_timeout,
+                **self._counts,
+            }
+
+
+# Guards every OpenAI call in the process
+openai_breaker = CircuitBreaker("openai")
@@ -0,0 +1,53 @@
+"""
+Cancel in-flight work when the HTTP client goes away.
+
+An LLM call can take several seconds. If the user closes the page or the
+frontend aborts the request meanwhile, there is nobody left to read the answer,
+so the upstream call is cancelled instead of holding a connection and tokens.
+"""
+
+import asyncio
+from typing import Awaitable, Optional
+
+from fastapi import HTTPException, Request
+
+# How often the connection is checked while waiting
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class ClientDisconnected(HTTPException):
+    """The client closed the connection before the response was ready (nginx's 499)."""
+
+    def __init__(self):
+        super().__init__(status_code=499, detail="Client closed request")
+
+
+async def cancel_on_disconnect(request: Optional[Request], awaitable: Awaitable,
+                               poll_interval: float = DISCONNECT_POLL_SECONDS):
+    """
+    Await awaitable, cancelling it if the client disconnects first.
+
+    Args:
+        request: The incoming request; None (e.g. a direct call from another handler) just awaits.
+        awaitable: Coroutine or task doing the work.
+        poll_interval: Seconds between connection checks.
+
+    Raises:
+        ClientDisconnected: If the client went away before the work finished.
+    """
+    if request is None:
+        return await awaitable
+
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise ClientDisconnected()
+    finally:
+        # Also covers this handler itself being cancelled
+        if not task.done():
+            task.cancel()
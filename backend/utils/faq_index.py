@@ -0,0 +1,203 @@
+"""
+Local answers to common patient questions.
+
+Many patient chat questions are the same few dozen FAQs about exercises,
+blood pressure and PHQ-9 scores. backend/data/faq_corpus.json holds curated
+answers to them in English, Russian, Uzbek and Spanish, each with a few
+phrasings of the question per language.
+
+Every phrasing is embedded as a hashed TF-IDF vector of words, word pairs and
+character trigrams. The trigrams tolerate Russian and Uzbek inflections and
+typos. Accents are stripped, so "como" matches "cómo". The vectors form one
+L2-normalized NumPy matrix, so a lookup is a single matrix-vector product:
+cosine similarity against every phrasing in well under a millisecond.
+Questions scoring at least FAQ_MATCH_THRESHOLD are answered from the corpus.
+Everything else goes to the model.
+"""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from collections import Counter
+from typing import List, Optional
+
+import numpy as np
+
+FAQ_CORPUS_PATH = os.getenv(
+    "FAQ_CORPUS_PATH",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../data/faq_corpus.json"))
+)
+# Cosine similarity needed to answer locally; above 1 disables local answers
+FAQ_MATCH_THRESHOLD = float(os.getenv("FAQ_MATCH_THRESHOLD", "0.6"))
+# Stricter bar for questions about the patient's own readings: "How often should I check my
+# blood pressure?" is a FAQ (1.0), "What is my blood pressure?" (0.64) needs the patient's data
+FAQ_PERSONAL_THRESHOLD = float(os.getenv("FAQ_PERSONAL_THRESHOLD", "0.8"))
+# Hashed feature space; collisions are rare for a corpus of a few hundred phrasings
+FAQ_INDEX_DIM = int(os.getenv("FAQ_INDEX_DIM", str(2 ** 14)))
+
+_word = re.compile(r"\w+")
+_apostrophes = str.maketrans({"ʻ": "'", "ʼ": "'", "’": "'", "‘": "'", "`": "'"})
+
+
+def normalize(text: str) -> str:
+    """Lowercase, accents and diacritics stripped, Uzbek apostrophe variants unified."""
+    text = unicodedata.normalize("NFKD", text.translate(_apostrophes).lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def features(text: str) -> Counter:
+    """Words, adjacent word pairs and character trigrams of a question."""
+    words = _word.findall(normalize(text))
+    counts = Counter(f"w:{w}" for w in words)
+    counts.update(f"b:{a} {b}" for a, b in zip(words, words[1:]))
+    for w in words:
+        padded = f"<{w}>"
+        counts.update(f"c:{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return counts
+
+
+class FAQIndex:
+    def __init__(self, path: Optional[str] = FAQ_CORPUS_PATH, threshold: float = FAQ_MATCH_THRESHOLD,
+                 dim: int = FAQ_INDEX_DIM):
+        """
+        Args:
+            path (str): JSON corpus of entries with per-language questions and answers.
+            threshold (float): Minimum cosine similarity for a local answer.
+            dim (int): Size of the hashed feature space.
+        """
+        self.path = path
+        self.threshold = threshold
+        self.dim = dim
+        self.entries: List[dict] = []
+        self._rows: List[tuple] = []
+        self._matrix = None
+        self._idf = None
+        self._lock = threading.Lock()
+        self._counts = {"lookups": 0, "answered": 0, "lookup_ms": 0.0}
+
+    def search(self, question: str, k: int = 3) -> List[dict]:
+        """
+        Best matching entries for a question, most similar first.
+
+        Returns:
+            list: Dicts with the entry ``id``, ``topic``, ``score``, the ``language``
+            and ``question`` of the closest phrasing.
+        """
+        self.load()
+        matrix = self._matrix
+        if matrix is None or not question.strip():
+            return []
+        scores = matrix @ self._vector(features(question), self._idf)
+
+        best = {}
+        for row in np.argsort(scores)[::-1]:
+            entry_index, language, phrasing = self._rows[row]
+            if entry_index not in best:
+                best[entry_index] = {"id": self.entries[entry_index]["id"], "topic": self.entries[entry_index]["topic"],
+                                     "score": round(float(scores[row]), 3), "language": language, "question": phrasing}
+                if len(best) == k:
+                    break
+        return list(best.values())
+
+    def answer(self, question: str, language: Optional[str] = None,
+               threshold: Optional[float] = None) -> Optional[dict]:
+        """
+        Curated answer to a question if it matches an entry closely enough, else None.
+
+        Args:
+            question: The patient's question.
+            language: Language of the answer; defaults to the language of the matched phrasing.
+            threshold: Minimum similarity for this question; defaults to the index threshold.
+
+        Returns:
+            dict: ``id``, ``answer``, ``language`` and ``score`` of the match.
+        """
+        started = time.perf_counter()
+        matches = self.search(question, k=1)
+        threshold = self.threshold if threshold is None else threshold
+        match = matches[0] if matches and matches[0]["score"] >= threshold else None
+        with self._lock:
+            self._counts["lookups"] += 1
+            self._counts["answered"] += match is not None
+            self._counts["lookup_ms"] += (time.perf_counter() - started) * 1000
+        if match is None:
+            return None
+
+        answers = next(e["answers"] for e in self.entries if e["id"] == match["id"])
+        language = language if language in answers else match["language"]
+        return {"id": match["id"], "answer": answers.get(language) or answers["en"],
+                "language": language, "score": match["score"]}
+
+    def stats(self) -> dict:
+        self.load()
+        with self._lock:
+            counts = dict(self._counts)
+        lookups = counts.pop("lookups")
+        lookup_ms = counts.pop("lookup_ms")
+        return {
+            "entries": len(self.entries),
+            "phrasings": len(self._rows),
+            "threshold": self.threshold,
+            "lookups": lookups,
+            "answered": counts["answered"],
+            "answered_ratio": round(counts["answered"] / lookups, 3) if lookups else None,
+            "avg_lookup_ms": round(lookup_ms / lookups, 3) if lookups else None,
+        }
+
+    def _vector(self, counts: Counter, idf: Optional[np.ndarray]) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, count in counts.items():
+            digest = zlib.crc32(feature.encode("utf-8"))
+            # The sign bit spreads colliding features around zero instead of adding them up
+            sign = 1.0 if digest & 0x80000000 else -1.0
+            vector[digest % self.dim] += sign * (1 + math.log(count))
+        if idf is not None:
+            vector *= idf
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def load(self):
+        """Build the index now instead of on the first lookup; a no-op once built."""
+        # Built lazily so importing the module never reads the corpus
+        if self._matrix is not None or not self.path:
+            return
+        with self._lock:
+            if self._matrix is not None or not self.path:
+                return
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    entries = json.load(f)["entries"]
+            except (OSError, ValueError, KeyError) as e:
+                logging.error(f"Error loading FAQ corpus: {str(e)}")
+                self.path = None
+                return
+
+            rows, counts = [], []
+            for i, entry in enumerate(entries):
+                for language, questions in entry["questions"].items():
+                    for question in questions:
+                        rows.append((i, language, question))
+                        counts.append(features(question))
+
+            # Document frequency per hashed bucket, smoothed like scikit-learn's TfidfVectorizer
+            df = np.zeros(self.dim, dtype=np.float32)
+            for c in counts:
+                df[np.unique([zlib.crc32(feature.encode("utf-8")) % self.dim for feature in c])] += 1
+            idf = (np.log((1 + len(rows)) / (1 + df)) + 1).astype(np.float32)
+            matrix = np.stack([self._vector(c, idf) for c in counts]) if rows else None
+
+            self._idf = idf
+            self.entries = entries
+            self._rows = rows
+            # Set last: load() and search() check _matrix without the lock
+            self._matrix = matrix
+
+
+# Shared index of the bundled corpus
+faq_index = FAQIndex()
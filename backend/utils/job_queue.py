@@ -0,0 +1,236 @@
+"""
+Background job queue for CPU-heavy work (Whisper, MediaPipe) and for AI text
+that should not hold up a response.
+
+Jobs run in a bounded process pool so they never block the event loop and a
+crash in native code only takes down a pool worker. Submitting returns a job id
+immediately; callers either await the job or poll ``/jobs/{job_id}``.
+"""
+
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, Dict, Optional
+
+from anyio import from_thread
+
+
+class JobQueueFullError(Exception):
+    """Raised when the number of unfinished jobs has reached the queue's limit."""
+
+
+class JobQueue:
+    def __init__(self, name: str, max_workers: int = 2, max_pending: int = 16, max_retries: int = 1,
+                 retry_delay: float = 1.0, use_processes: bool = True, job_ttl: float = 3600.0,
+                 initializer: Optional[Callable] = None):
+        """
+        Args:
+            name (str): Queue name, used in logs and stats.
+            max_workers (int): Jobs executing in parallel (pool size).
+            max_pending (int): Unfinished (queued + running) jobs accepted before submit() rejects.
+            max_retries (int): Extra attempts after a failed attempt.
+            retry_delay (float): Seconds before the first retry; doubles with each attempt.
+            use_processes (bool): Run jobs in a process pool; False uses threads (tests, I/O-bound jobs).
+            job_ttl (float): Seconds a finished job stays available for polling.
+            initializer (callable): Run once in each worker process at start, e.g. to preload models.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.use_processes = use_processes
+        self.job_ttl = job_ttl
+        self.initializer = initializer
+        self._executor = None
+        self._jobs: Dict[str, dict] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._tasks = set()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> str:
+        """
+        Queue fn(*args, **kwargs) and return its job id. Must be called from the event loop.
+
+        Raises:
+            JobQueueFullError: If max_pending jobs are already unfinished.
+        """
+        self._prune()
+        if self.pending_count() >= self.max_pending:
+            raise JobQueueFullError(f"Job queue '{self.name}' is full ({self.max_pending} unfinished jobs)")
+
+        job_id = uuid.uuid4().hex
+        self._jobs[job_id] = {
+            "id": job_id,
+            "queue": self.name,
+            "task": getattr(fn, "__name__", str(fn)),
+            "status": "queued",
+            "attempts": 0,
+            "result": None,
+            "error": None,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        self._events[job_id] = asyncio.Event()
+        task = asyncio.get_running_loop().create_task(self._run(job_id, partial(fn, *args, **kwargs)))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    def submit_from_thread(self, fn: Callable, *args, **kwargs) -> str:
+        """
+        submit() for sync routes, which FastAPI runs in its threadpool: the job is
+        queued on the application's event loop and its id returned.
+
+        Raises:
+            JobQueueFullError: If max_pending jobs are already unfinished.
+        """
+        return from_thread.run_sync(partial(self.submit, fn, *args, **kwargs))
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Submit a job and wait for it; returns the result or raises the job's final error."""
+        job = await self.wait(self.submit(fn, *args, **kwargs))
+        if job["status"] != "succeeded":
+            raise RuntimeError(job["error"])
+        return job["result"]
+
+    def get(self, job_id: str) -> Optional[dict]:
+        """Return a snapshot of the job, or None if it is unknown or expired."""
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """Wait until the job finishes or timeout seconds pass, then return its snapshot."""
+        event = self._events.get(job_id)
+        if event is not None:
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id)
+
+    def pending_count(self) -> int:
+        return sum(1 for job in self._jobs.values() if job["finished_at"] is None)
+
+    def stats(self) -> dict:
+        counts = {}
+        for job in self._jobs.values():
+            counts[job["status"]] = counts.get(job["status"], 0) + 1
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending_count(),
+            "jobs": counts,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, job_id: str, call: Callable):
+        job = self._jobs[job_id]
+        loop = asyncio.get_running_loop()
+        try:
+            for attempt in range(1, self.max_retries + 2):
+                job["attempts"] = attempt
+                job["status"] = "running"
+                job["started_at"] = job["started_at"] or time.time()
+                try:
+                    job["result"] = await loop.run_in_executor(self._get_executor(), call)
+                    job["status"] = "succeeded"
+                    job["error"] = None
+                    break
+                except Exception as e:
+                    if isinstance(e, BrokenProcessPool):
+                        # A worker died (e.g. native crash); start a fresh pool for the retry
+                        self.shutdown()
+                    job["error"] = str(e) or e.__class__.__name__
+                    logging.error(f"Job {job_id} ({job['task']}) attempt {attempt} failed: {job['error']}")
+                    if attempt > self.max_retries:
+                        job["status"] = "failed"
+                    else:
+                        job["status"] = "retrying"
+                        await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        finally:
+            if job["status"] not in ("succeeded", "failed"):
+                job["status"] = "cancelled"
+            job["finished_at"] = time.time()
+            self._events[job_id].set()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.use_processes:
+                # spawn: forking a process that already runs threads (uvicorn, torch) is unsafe
+                context = multiprocessing.get_context(os.getenv("JOB_START_METHOD", "spawn"))
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                                     initializer=self.initializer)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+        return self._executor
+
+    def _prune(self):
+        cutoff = time.time() - self.job_ttl
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] is not None and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+            del self._events[job_id]
+
+
+# Every queue in the process, by name, for the jobs endpoint
+queues: Dict[str, JobQueue] = {}
+
+
+def register_queue(queue: JobQueue) -> JobQueue:
+    queues[queue.name] = queue
+    atexit.register(queue.shutdown)
+    return queue
+
+
+def preload_media_worker():
+    """Worker initializer: load Whisper up front when WHISPER_PRELOAD is set."""
+    try:
+        from ml_models.whisper_service import preload_if_configured
+        preload_if_configured()
+    except Exception as e:
+        logging.error(f"Error preloading media worker: {str(e)}")
+
+
+# Whisper and MediaPipe analysis of uploaded media
+media_jobs = register_queue(JobQueue(
+    "media",
+    max_workers=int(os.getenv("MEDIA_JOB_WORKERS", "2")),
+    max_pending=int(os.getenv("MEDIA_JOB_MAX_PENDING", "16")),
+    max_retries=int(os.getenv("MEDIA_JOB_RETRIES", "1")),
+    initializer=preload_media_worker,
+))
+
+
+# AI recommendation text of the scoring routes, generated after the scores are returned.
+# The work is waiting on the OpenAI API, so threads are enough
+recommendation_jobs = register_queue(JobQueue(
+    "recommendations",
+    max_workers=int(os.getenv("RECOMMENDATION_JOB_WORKERS", "4")),
+    max_pending=int(os.getenv("RECOMMENDATION_JOB_MAX_PENDING", "64")),
+    max_retries=0,
+    use_processes=False,
+))
+
+# Placeholder sent with the scores while their recommendations are generated
+RECOMMENDATIONS_PENDING = "AI recommendations are being generated."
+
+
+def find_job(job_id: str) -> Optional[JobQueue]:
+    """Return the queue that owns job_id, or None."""
+    for queue in queues.values():
+        if queue.get(job_id) is not None:
+            return queue
+    return None
@@ -0,0 +1,249 @@
+"""
+Cache for LLM completions of deterministic prompts.
+
+Assessment advice and recommendation prompts are built only from scores,
+levels, age and language, so the same prompt is sent over and over. Answers
+are cached under a hash of the normalized messages plus the model and
+sampling parameters, in two tiers:
+
+* an in-process LRU with a TTL, for repeats within one worker;
+* optionally, a SQLite file at LLM_CACHE_PATH shared by the workers on a
+  host that survives restarts, with its own (longer) TTL. It is off unless
+  LLM_CACHE_PATH is set, since the cached prompts carry patient scores.
+
+The async methods look in memory on the event loop and leave the SQLite I/O
+to the threadpool, so a locked database never stalls other requests.
+
+Only real completions are stored; fallback text returned after an API error
+or timeout never enters the cache.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(6 * 3600)))
+LLM_CACHE_DISK_TTL = float(os.getenv("LLM_CACHE_DISK_TTL", str(7 * 24 * 3600)))
+# SQLite file of the persistent tier; empty disables it
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "")
+
+_whitespace = re.compile(r"\s+")
+
+
+def normalize_messages(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """Collapse whitespace so prompts differing only in indentation or line breaks share a key."""
+    return [{"role": m.get("role", ""), "content": _whitespace.sub(" ", str(m.get("content", ""))).strip()}
+            for m in messages]
+
+
+def cache_key(messages: List[Dict[str, str]], model: str, temperature: float, max_tokens: int) -> str:
+    """SHA-256 of the normalized messages, model and sampling parameters."""
+    payload = json.dumps({
+        "messages": normalize_messages(messages),
+        "model": model,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, ttl: float = LLM_CACHE_TTL,
+                 disk_path: Optional[str] = LLM_CACHE_PATH, disk_ttl: float = LLM_CACHE_DISK_TTL):
+        """
+        Args:
+            max_entries (int): Entries kept in memory; least recently used are evicted.
+            ttl (float): Seconds an entry stays valid in memory.
+            disk_path (str): SQLite file for the persistent tier; None or "" disables it.
+            disk_ttl (float): Seconds an entry stays valid on disk.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path or None
+        self.disk_ttl = disk_ttl
+        self._memory = OrderedDict()
+        # _lock guards the memory tier and counters, _db_lock the SQLite connection
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._db = None
+        self._counts = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "disk_errors": 0}
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached completion for key, or None."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None:
+            value = self._disk_lookup(key, now)
+        return value
+
+    async def aget(self, key: str) -> Optional[str]:
+        """get for coroutines: the disk tier is read in the threadpool."""
+        now = time.time()
+        value = self._memory_get(key, now)
+        if value is None:
+            value = await self._off_loop(self._disk_lookup, key, now)
+        return value
+
+    def set(self, key: str, value: str):
+        """Store a completion in both tiers."""
+        now = time.time()
+        self._store(key, value, now)
+        self._disk_set(key, value, now)
+
+    async def aset(self, key: str, value: str):
+        """set for coroutines: the disk tier is written in the threadpool."""
+        now = time.time()
+        self._store(key, value, now)
+        await self._off_loop(self._disk_set, key, value, now)
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                with db:
+                    db.execute("DELETE FROM llm_cache")
+            except sqlite3.Error as e:
+                self._disk_error(e)
+
+    def purge_expired(self) -> int:
+        """Delete expired rows from the disk tier; returns how many were removed."""
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return 0
+            try:
+                with db:
+                    return db.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (time.time(),)).rowcount
+            except sqlite3.Error as e:
+                self._disk_error(e)
+                return 0
+
+    def stats(self) -> dict:
+        disk_entries = None
+        with self._db_lock:
+            db = self._connect()
+            if db is not None:
+                try:
+                    disk_entries = db.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+                except sqlite3.Error as e:
+                    self._disk_error(e)
+        with self._lock:
+            counts = dict(self._counts)
+            memory_entries = len(self._memory)
+        lookups = counts["memory_hits"] + counts["disk_hits"] + counts["misses"]
+        return {
+            **counts,
+            "hit_ratio": round((counts["memory_hits"] + counts["disk_hits"]) / lookups, 3) if lookups else None,
+            "memory_entries": memory_entries,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "disk_path": self.disk_path,
+            "disk_entries": disk_entries,
+            "disk_ttl": self.disk_ttl,
+        }
+
+    async def _off_loop(self, fn, *args):
+        # Without a disk tier there is no I/O worth a thread hop
+        if self.disk_path is None:
+            return fn(*args)
+        return await run_in_threadpool(fn, *args)
+
+    def _memory_get(self, key, now):
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._counts["memory_hits"] += 1
+                return value
+            del self._memory[key]
+            return None
+
+    def _disk_lookup(self, key, now):
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self._counts["misses"] += 1
+            else:
+                self._counts["disk_hits"] += 1
+                self._remember(key, value, now)
+        return value
+
+    def _store(self, key, value, now):
+        with self._lock:
+            self._remember(key, value, now)
+            self._counts["stores"] += 1
+
+    def _remember(self, key, value, now):
+        self._memory[key] = (now + self.ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counts["evictions"] += 1
+
+    def _disk_get(self, key, now):
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return None
+            try:
+                row = db.execute("SELECT value FROM llm_cache WHERE key = ? AND expires_at > ?", (key, now)).fetchone()
+            except sqlite3.Error as e:
+                self._disk_error(e)
+                return None
+        return row[0] if row else None
+
+    def _disk_set(self, key, value, now):
+        with self._db_lock:
+            db = self._connect()
+            if db is None:
+                return
+            try:
+                with db:
+                    db.execute("INSERT OR REPLACE INTO llm_cache (key, value, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                               (key, value, now, now + self.disk_ttl))
+            except sqlite3.Error as e:
+                self._disk_error(e)
+
+    def _connect(self):
+        # Called with _db_lock held; opened lazily so importing the module never touches the filesystem
+        if self._db is None and self.disk_path:
+            try:
+                os.makedirs(os.path.dirname(self.disk_path) or ".", exist_ok=True)
+                db = sqlite3.connect(self.disk_path, timeout=5, check_same_thread=False)
+                # WAL lets several worker processes read while one writes
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("CREATE TABLE IF NOT EXISTS llm_cache ("
+                           "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL, expires_at REAL)")
+                db.commit()
+                self._db = db
+            except sqlite3.Error as e:
+                self._disk_error(e)
+                self.disk_path = None
+        return self._db
+
+    def _disk_error(self, error):
+        with self._lock:
+            self._counts["disk_errors"] += 1
+        logging.error(f"LLM cache disk error: {str(error)}")
+
+
+# Shared cache for deterministic prompts
+llm_cache = LLMCache()
@@ -0,0 +1,254 @@
+"""
+Per-call telemetry for LLM requests.
+
+Every call through openai_helper produces one record: the route that made it,
+model, prompt and completion tokens, time to first token (streams), total
+latency, cache outcome, upstream attempts and whether the fallback text was
+returned. Records are aggregated per (route, model) into fixed-bucket
+histograms, served on /llm/telemetry, and optionally appended as JSON lines
+to a size-rotated local file (LLM_TELEMETRY_LOG).
+
+The route comes from a context variable set by LLMRouteMiddleware for each
+HTTP request; calls made outside a request (background jobs) report
+"background". Upstream attempts are counted by an httpx request hook on the
+pooled clients, so retries made inside the OpenAI SDK are visible too.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional, Sequence
+
+LLM_TELEMETRY_LOG = os.getenv("LLM_TELEMETRY_LOG", "")
+LLM_TELEMETRY_LOG_MAX_MB = float(os.getenv("LLM_TELEMETRY_LOG_MAX_MB", "10"))
+LLM_TELEMETRY_LOG_BACKUPS = int(os.getenv("LLM_TELEMETRY_LOG_BACKUPS", "5"))
+
+# Bucket upper bounds; a final +inf bucket catches the rest
+LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+current_route: ContextVar[str] = ContextVar("llm_route", default="background")
+_current_call: ContextVar[Optional[dict]] = ContextVar("llm_call", default=None)
+
+
+class Histogram:
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = None
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Upper bound of the bucket holding the pct-th percentile; the maximum for the last bucket."""
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        buckets = {f"le_{bound:g}": n for bound, n in zip(self.bounds, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 1) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": round(self.max, 1) if self.max is not None else None,
+            "buckets": buckets,
+        }
+
+
+class _RouteStats:
+    def __init__(self):
+        self.counts = {"calls": 0, "streams": 0, "fallbacks": 0, "cache_hits": 0, "cache_misses": 0,
+                       "retries": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.errors: Dict[str, int] = {}
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.ttft_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.completion_tokens = Histogram(TOKEN_BUCKETS)
+
+    def add(self, call: dict):
+        counts = self.counts
+        counts["calls"] += 1
+        counts["streams"] += call["stream"]
+        counts["fallbacks"] += call["fallback"]
+        counts["cache_hits"] += call["cache"] == "hit"
+        counts["cache_misses"] += call["cache"] == "miss"
+        counts["retries"] += call["retries"]
+        if call["error"]:
+            self.errors[call["error"]] = self.errors.get(call["error"], 0) + 1
+        self.latency_ms.observe(call["latency_ms"])
+        if call["ttft_ms"] is not None:
+            self.ttft_ms.observe(call["ttft_ms"])
+        # Only tokens actually sent upstream; cache hits and coalesced callers cost nothing
+        if call["prompt_tokens"] is not None:
+            counts["prompt_tokens"] += call["prompt_tokens"]
+            self.prompt_tokens.observe(call["prompt_tokens"])
+        if call["completion_tokens"] is not None:
+            counts["completion_tokens"] += call["completion_tokens"]
+            self.completion_tokens.observe(call["completion_tokens"])
+
+    def summary(self) -> dict:
+        return {
+            **self.counts,
+            "errors": dict(self.errors),
+            "latency_ms": self.latency_ms.summary(),
+            "ttft_ms": self.ttft_ms.summary(),
+            "prompt_tokens_per_call": self.prompt_tokens.summary(),
+            "completion_tokens_per_call": self.completion_tokens.summary(),
+        }
+
+
+class LLMTelemetry:
+    def __init__(self, log_path: Optional[str] = LLM_TELEMETRY_LOG,
+                 log_max_bytes: int = int(LLM_TELEMETRY_LOG_MAX_MB * 1024 * 1024),
+                 log_backups: int = LLM_TELEMETRY_LOG_BACKUPS):
+        """
+        Args:
+            log_path (str): JSON-lines file for every call record; None or "" disables it.
+            log_max_bytes (int): Size at which the file is rotated.
+            log_backups (int): Rotated files kept.
+        """
+        self.log_path = log_path or None
+        self.log_max_bytes = log_max_bytes
+        self.log_backups = log_backups
+        self._routes: Dict[tuple, _RouteStats] = {}
+        self._lock = threading.Lock()
+        self._logger = None
+        self.started = time.time()
+
+    def start(self, model: str, stream: bool = False) -> dict:
+        """New call record for the current route; pass it to finish() when the call is over."""
+        return {
+            "ts": time.time(),
+            "route": current_route.get(),
+            "model": model,
+            "stream": stream,
+            "cache": "off",
+            "prompt_tokens": None,
+            "completion_tokens": None,
+            "ttft_ms": None,
+            "latency_ms": None,
+            "attempts": 0,
+            "retries": 0,
+            "fallback": False,
+            "error": None,
+            "_started": time.perf_counter(),
+        }
+
+    def finish(self, call: dict):
+        """Close a call record: aggregate it and append it to the log file."""
+        call["latency_ms"] = round((time.perf_counter() - call.pop("_started")) * 1000, 1)
+        call["retries"] = max(0, call["attempts"] - 1)
+        with self._lock:
+            stats = self._routes.get((call["route"], call["model"]))
+            if stats is None:
+                stats = self._routes[(call["route"], call["model"])] = _RouteStats()
+            stats.add(call)
+        logger = self._file_logger()
+        if logger is not None:
+            logger.info(json.dumps(call))
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = [{"route": route, "model": model, **stats.summary()}
+                      for (route, model), stats in sorted(self._routes.items())]
+        return {"since": self.started, "log_path": self.log_path, "routes": routes}
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self.started = time.time()
+
+    def _file_logger(self):
+        # Opened lazily so importing the module never touches the filesystem
+        if self._logger is None and self.log_path:
+            try:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                handler = RotatingFileHandler(self.log_path, maxBytes=self.log_max_bytes,
+                                              backupCount=self.log_backups, encoding="utf-8")
+            except OSError as e:
+                logging.error(f"Error opening LLM telemetry log: {str(e)}")
+                self.log_path = None
+                return None
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger = logging.getLogger(f"llm_telemetry.{id(self)}")
+            logger.setLevel(logging.INFO)
+            # Records go to the file only, not to the application log
+            logger.propagate = False
+            logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+
+@contextmanager
+def collecting(call: dict):
+    """Attribute upstream attempts and token usage inside the block to call."""
+    token = _current_call.set(call)
+    try:
+        yield call
+    finally:
+        _current_call.reset(token)
+
+
+def note_usage(response):
+    """Copy the token usage reported by the API onto the current call record."""
+    call = _current_call.get()
+    usage = getattr(response, "usage", None)
+    if call is None or usage is None:
+        return
+    call["prompt_tokens"] = getattr(usage, "prompt_tokens", None)
+    call["completion_tokens"] = getattr(usage, "completion_tokens", None)
+
+
+def count_attempt(request):
+    """httpx request hook for the sync client: one upstream attempt, retries included."""
+    call = _current_call.get()
+    if call is not None:
+        call["attempts"] += 1
+
+
+async def acount_attempt(request):
+    """httpx request hook for the async client."""
+    count_attempt(request)
+
+
+class LLMRouteMiddleware:
+    """Pure ASGI middleware recording the request path as the route of LLM calls made while handling it."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_route.set(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_route.reset(token)
+
+
+# Shared telemetry for every LLM call in the process
+llm_telemetry = LLMTelemetry()
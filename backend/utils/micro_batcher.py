@@ -0,0 +1,160 @@
+"""
+Asyncio micro-batching in front of model inference.
+
+Concurrent requests each submit one feature row. A collector task groups them
+into a single (n, features) array, runs one ``predict`` call in the threadpool
+and resolves every waiting request with its own row of the result.
+
+Batching is adaptive: a request that arrives while the batcher is idle is
+dispatched immediately, so there is no added latency at low load. Once requests
+start queueing (a batch is running, or several arrive together) the collector
+waits up to ``max_wait_ms`` for the batch to fill up to ``max_batch_size``.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Dict
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+# Every batcher in the process, by name, for the metrics endpoint
+batchers: Dict[str, "MicroBatcher"] = {}
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    def __init__(self, name: str, predict_fn: Callable, max_batch_size: int = 64,
+                 max_wait_ms: float = 2.0, sample_size: int = 1000):
+        """
+        Args:
+            name (str): Name reported in metrics.
+            predict_fn (callable): Takes an (n, features) array and returns n predictions.
+            max_batch_size (int): Largest number of rows sent to predict_fn at once.
+            max_wait_ms (float): Longest time a queued request waits for the batch to fill.
+            sample_size (int): Number of recent queue-wait samples kept for percentiles.
+        """
+        self.name = name
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._loop = None
+        self._queue = None
+        self._collector = None
+        self._last_batch_size = 0
+
+        self._requests = 0
+        self._batches = 0
+        self._errors = 0
+        self._size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._queue_waits = deque(maxlen=sample_size)
+        self._predict_times = deque(maxlen=sample_size)
+
+        batchers[name] = self
+
+    async def predict(self, row):
+        """Queue one feature row and wait for its prediction."""
+        self._ensure_collector()
+        future = self._loop.create_future()
+        await self._queue.put((row, future, time.perf_counter()))
+        return await future
+
+    def metrics(self) -> dict:
+        """Return batch size and queue wait statistics."""
+        waits = np.array(self._queue_waits) * 1000.0
+        predict_times = np.array(self._predict_times) * 1000.0
+        return {
+            "requests": self._requests,
+            "batches": self._batches,
+            "errors": self._errors,
+            "mean_batch_size": round(self._requests / self._batches, 2) if self._batches else None,
+            "batch_size_histogram": {f"<={bucket}": count for bucket, count in self._size_histogram.items()},
+            "queue_wait_ms": _summarize(waits),
+            "predict_ms": _summarize(predict_times),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    def _ensure_collector(self):
+        loop = asyncio.get_running_loop()
+        # Queues and tasks belong to one event loop; start fresh if the loop changed
+        if self._loop is not loop or self._collector is None or self._collector.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._collector = loop.create_task(self._collect())
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+
+            # Only wait for more rows when there is concurrent load to batch
+            if not self._queue.empty() or self._last_batch_size > 1:
+                deadline = self._loop.time() + self.max_wait
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - self._loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                    except asyncio.TimeoutError:
+                        break
+
+            # Pick up anything that is already queued without waiting
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            await self._run_batch(batch)
+
+    async def _run_batch(self, batch):
+        dispatched_at = time.perf_counter()
+
+        # Inside the try: a malformed row must fail this batch's callers, not the collector task
+        try:
+            rows = np.asarray([row for row, _, _ in batch])
+            self._record_batch(batch, dispatched_at)
+            predictions = await run_in_threadpool(self.predict_fn, rows)
+            predictions = predictions.tolist() if hasattr(predictions, "tolist") else list(predictions)
+        except Exception as e:
+            self._errors += 1
+            logging.error(f"Batched prediction failed for '{self.name}': {str(e)}")
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._predict_times.append(time.perf_counter() - dispatched_at)
+
+        for (_, future, _), prediction in zip(batch, predictions):
+            # The caller may have gone away (client disconnect cancels the request)
+            if not future.done():
+                future.set_result(prediction)
+
+    def _record_batch(self, batch, dispatched_at):
+        size = len(batch)
+        self._last_batch_size = size
+        self._requests += size
+        self._batches += 1
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self._size_histogram[bucket] += 1
+                break
+        else:
+            self._size_histogram.setdefault(float("inf"), 0)
+            self._size_histogram[float("inf")] += 1
+        self._queue_waits.extend(dispatched_at - queued_at for _, _, queued_at in batch)
+
+
+def _summarize(samples_ms: np.ndarray) -> dict:
+    if samples_ms.size == 0:
+        return {"count": 0}
+    return {
+        "count": int(samples_ms.size),
+        "mean": round(float(samples_ms.mean()), 3),
+        "p50": round(float(np.percentile(samples_ms, 50)), 3),
+        "p95": round(float(np.percentile(samples_ms, 95)), 3),
+        "max": round(float(samples_ms.max()), 3),
+    }
@@ -1,13 +1,31 @@
 ﻿"""
 This module provides a fix for the OpenAI API integration, updating it to work with
 both the legacy OpenAI API (< 1.0.0) and the new OpenAI API (>= 1.0.0).
+
+It is the single gateway to the OpenAI API. The key is resolved once per process,
+and one sync and one async client are kept for the life of the process on a
+keep-alive HTTP connection pool, so calls reuse warm TLS connections instead of
+opening a new one per request. Every call runs within a per-route deadline and
+behind a circuit breaker, so while OpenAI is down requests fall back at once
+instead of each waiting out its timeout. Each call is recorded in llm_telemetry
+and charged to the token quota of the client that made it.
 """
 
 import os
+import asyncio
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+import time
+from typing import AsyncIterator, List, Dict, Optional
 from dotenv import load_dotenv
 
+from backend.utils.llm_cache import cache_key
+from backend.utils.single_flight import llm_flights
+from backend.utils.circuit_breaker import CircuitOpenError, openai_breaker
+from backend.utils.chat_history import count_tokens, message_tokens
+from backend.utils.llm_telemetry import llm_telemetry, collecting, note_usage, count_attempt, acount_attempt
+from backend.utils.token_quota import QuotaExceededError, check_quota, current_client, token_quota
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 
@@ -20,7 +38,8 @@ except Exception as e:
 
 # Try to import the new OpenAI client
 try:
-    from openai import OpenAI
+    from openai import OpenAI, AsyncOpenAI
+    import httpx
     USING_NEW_CLIENT = True
     logging.info("Using new OpenAI client (>= 1.0.0)")
 except ImportError:
@@ -28,7 +47,31 @@ except ImportError:
     import openai
     logging.info("Using legacy OpenAI client (< 1.0.0)")
 
+# Connection pool shared by every OpenAI call in the process
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_MAX_KEEPALIVE = int(os.getenv("OPENAI_MAX_KEEPALIVE", "20"))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+# Overall deadline for one awaited completion, retries included
+OPENAI_CALL_TIMEOUT = float(os.getenv("OPENAI_CALL_TIMEOUT", "30"))
+
+_api_key = None
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
 def get_openai_key():
+    """Get the OpenAI API key, resolving it on the first call only."""
+    global _api_key
+    if _api_key is None:
+        with _client_lock:
+            if _api_key is None:
+                _api_key = _load_openai_key()
+    return _api_key
+
+def _load_openai_key():
     """Get the OpenAI API key from environment variables."""
     # Get the key from environment variables
     api_key = os.getenv("OPENAI_API_KEY")
@@ -79,8 +122,183 @@ def get_openai_key():
     logging.info(f"Using OpenAI API key: {masked_key}")
     return api_key
 
+def _http_limits():
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def _http_timeout():
+    return httpx.Timeout(OPENAI_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+def get_client():
+    """Return the process-wide synchronous OpenAI client."""
+    global _client
+    if _client is None:
+        api_key = get_openai_key()
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    api_key=api_key,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=httpx.Client(limits=_http_limits(), timeout=_http_timeout(),
+                                             event_hooks={"request": [count_attempt]})
+                )
+    return _client
+
+def get_async_client():
+    """Return the process-wide AsyncOpenAI client."""
+    global _async_client
+    if _async_client is None:
+        api_key = get_openai_key()
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(
+                    api_key=api_key,
+                    max_retries=OPENAI_MAX_RETRIES,
+                    http_client=httpx.AsyncClient(limits=_http_limits(), timeout=_http_timeout(),
+                                                  event_hooks={"request": [acount_attempt]})
+                )
+    return _async_client
+
+async def close_clients():
+    """Close the pooled connections, e.g. on application shutdown."""
+    global _client, _async_client
+    client, async_client = _client, _async_client
+    _client = _async_client = None
+    if client is not None:
+        client.close()
+    if async_client is not None:
+        await async_client.close()
+
+def fallback_message(error: Exception) -> str:
+    """User-facing text returned in place of a completion when the API call fails."""
+    # Check if it's an authentication error
+    if "authentication" in str(error).lower() or "api key" in str(error).lower() or "401" in str(error):
+        return "I'm having trouble connecting to my knowledge base. This might be due to missing API credentials. Please contact support to ensure API access is properly configured."
+    # Return a user-friendly error message
+    return "I apologize, but I'm experiencing technical difficulties right now. Please try again later or contact support if the problem persists."
+
+def _complete(messages, model, temperature, max_tokens, timeout=None):
+    """Blocking completion call; raises on any API error."""
+    if USING_NEW_CLIENT:
+        # Use the pooled OpenAI client (>= 1.0.0)
+        client = get_client()
+        if timeout is not None:
+            # A blocking call cannot be cut short from outside, so the whole budget
+            # goes to one attempt; the circuit breaker deals with repeated failures
+            client = client.with_options(timeout=timeout, max_retries=0)
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        note_usage(response)
+        return response.choices[0].message.content
+    else:
+        # Use legacy OpenAI client (< 1.0.0)
+        openai.api_key = get_openai_key()
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            request_timeout=timeout
+        )
+        note_usage(response)
+        return response.choices[0].message.content
+
+async def _acomplete(messages, model, temperature, max_tokens):
+    """Awaitable completion call; raises on any API error."""
+    if USING_NEW_CLIENT:
+        response = await get_async_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        note_usage(response)
+        return response.choices[0].message.content
+
+    # Legacy client is blocking; keep it off the event loop
+    from starlette.concurrency import run_in_threadpool
+    return await run_in_threadpool(_complete, messages, model, temperature, max_tokens)
+
+def _record_error(error: Exception):
+    """Count an API error against the circuit breaker unless the request itself was invalid."""
+    if getattr(error, "status_code", None) in (400, 404, 422):
+        openai_breaker.release()
+    else:
+        openai_breaker.record_failure()
+
+def _guarded_complete(messages, model, temperature, max_tokens, timeout):
+    """_complete behind the circuit breaker; raises CircuitOpenError while it is open."""
+    openai_breaker.check()
+    started = time.monotonic()
+    try:
+        text = _complete(messages, model, temperature, max_tokens, timeout)
+    except Exception as e:
+        _record_error(e)
+        raise
+    openai_breaker.record_success(time.monotonic() - started)
+    return text
+
+async def _aguarded_complete(messages, model, temperature, max_tokens, timeout):
+    """_acomplete within a deadline, behind the circuit breaker; a missed deadline counts as a failure."""
+    openai_breaker.check()
+    started = time.monotonic()
+    try:
+        text = await asyncio.wait_for(_acomplete(messages, model, temperature, max_tokens), timeout)
+    except asyncio.TimeoutError:
+        openai_breaker.record_failure()
+        raise
+    except asyncio.CancelledError:
+        # Every caller went away; says nothing about the upstream's health
+        openai_breaker.release()
+        raise
+    except Exception as e:
+        _record_error(e)
+        raise
+    openai_breaker.record_success(time.monotonic() - started)
+    return text
+
+def _check_quota(call, messages, max_tokens, fallback):
+    """
+    Make sure the client can afford a call that needs the model.
+
+    Returns:
+        bool: False if the quota is spent and the call should return its fallback instead.
+
+    Raises:
+        QuotaExceededError: If the quota is spent and the caller gave no fallback.
+    """
+    try:
+        check_quota(messages, max_tokens)
+    except QuotaExceededError:
+        call["error"] = "QuotaExceededError"
+        if fallback is None:
+            raise
+        call["fallback"] = True
+        return False
+    return True
+
+def _charge_quota(call):
+    """Charge the tokens a call actually used to the client's quota."""
+    token_quota.charge(current_client.get(), (call["prompt_tokens"] or 0) + (call["completion_tokens"] or 0))
+
+def _log_error(error: Exception):
+    if isinstance(error, CircuitOpenError):
+        # Expected while OpenAI is down; one line per request would flood the log
+        logging.debug(f"Skipping OpenAI API call: {str(error)}")
+    else:
+        logging.error(f"Error calling OpenAI API: {str(error)}")
+
 def create_chat_completion(messages: List[Dict[str, str]], model: str = "gpt-4o", 
-                          temperature: float = 0.7, max_tokens: int = 1000):
+                          temperature: float = 0.7, max_tokens: int = 1000,
+                          fallback: Optional[str] = None, cache=None,
+                          timeout: Optional[float] = None):
     """
     Create a chat completion using either the new or legacy OpenAI API.
     
@@ -89,37 +307,197 @@ def create_chat_completion(messages: List[Dict[str, str]], model: str = "gpt-4o"
         model: The model to use for completion
         temperature: Controls randomness (0 to 1)
         max_tokens: Maximum number of tokens to generate
+        fallback: Text to return if the call fails; defaults to a generic apology
+        cache: Optional LLMCache for prompts built only from structured inputs; fallbacks are never cached
+        timeout: Deadline in seconds for the route; defaults to OPENAI_CALL_TIMEOUT
         
     Returns:
         The generated text response
+
+    Raises:
+        QuotaExceededError: If the client's token quota is spent and no fallback was given
     """
-    api_key = get_openai_key()
-    
+    if timeout is None:
+        timeout = OPENAI_CALL_TIMEOUT
+
+    key = cache_key(messages, model, temperature, max_tokens)
+    call = llm_telemetry.start(model)
     try:
-        if USING_NEW_CLIENT:
-            # Use new OpenAI client (>= 1.0.0)
-            client = OpenAI(api_key=api_key)
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
-        else:
-            # Use legacy OpenAI client (< 1.0.0)
-            openai.api_key = api_key
-            response = openai.ChatCompletion.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens
-            )
-            return response.choices[0].message.content
-    except Exception as e:
-        logging.error(f"Error calling OpenAI API: {str(e)}")
-        # Check if it's an authentication error
-        if "authentication" in str(e).lower() or "api key" in str(e).lower() or "401" in str(e):
-            return "I'm having trouble connecting to my knowledge base. This might be due to missing API credentials. Please contact support to ensure API access is properly configured."
-        # Return a user-friendly error message
-        return "I apologize, but I'm experiencing technical difficulties right now. Please try again later or contact support if the problem persists."
+        if cache is not None:
+            cached = cache.get(key)
+            call["cache"] = "miss" if cached is None else "hit"
+            if cached is not None:
+                return cached
+
+        # Only calls that need the model count against the client's token quota
+        if not _check_quota(call, messages, max_tokens, fallback):
+            return fallback
+
+        try:
+            # Identical requests already in flight share one upstream call
+            with collecting(call):
+                text = llm_flights.run_sync(key, lambda: _guarded_complete(messages, model, temperature, max_tokens, timeout))
+        except Exception as e:
+            _log_error(e)
+            call.update(fallback=True, error=type(e).__name__)
+            return fallback if fallback is not None else fallback_message(e)
+
+        if cache is not None and text:
+            cache.set(key, text)
+        return text
+    finally:
+        _charge_quota(call)
+        llm_telemetry.finish(call)
+
+async def acreate_chat_completion(messages: List[Dict[str, str]], model: str = "gpt-4o",
+                                  temperature: float = 0.7, max_tokens: int = 1000,
+                                  fallback: Optional[str] = None, timeout: Optional[float] = None,
+                                  cache=None):
+    """
+    Async version of create_chat_completion for use in async request handlers.
+    Uses the pooled AsyncOpenAI client, so waiting on the API never blocks the event loop.
+    Cancelling the awaiting task (e.g. on client disconnect) aborts the HTTP request.
+
+    Args:
+        timeout: Deadline in seconds for the route before returning the fallback; defaults to OPENAI_CALL_TIMEOUT
+
+    Raises:
+        QuotaExceededError: If the client's token quota is spent and no fallback was given
+    """
+    if timeout is None:
+        timeout = OPENAI_CALL_TIMEOUT
+
+    key = cache_key(messages, model, temperature, max_tokens)
+    call = llm_telemetry.start(model)
+    try:
+        if cache is not None:
+            cached = await cache.aget(key)
+            call["cache"] = "miss" if cached is None else "hit"
+            if cached is not None:
+                return cached
+
+        # Only calls that need the model count against the client's token quota
+        if not _check_quota(call, messages, max_tokens, fallback):
+            return fallback
+
+        try:
+            # Identical requests already in flight share one upstream call, bounded by the
+            # deadline of the caller that started it; it stops once every caller gave up
+            with collecting(call):
+                text = await llm_flights.run(key, lambda: _aguarded_complete(messages, model, temperature, max_tokens, timeout))
+        except asyncio.TimeoutError:
+            logging.error(f"OpenAI API call timed out after {timeout}s")
+            call.update(fallback=True, error="TimeoutError")
+            return fallback if fallback is not None else fallback_message(TimeoutError("timed out"))
+        except Exception as e:
+            _log_error(e)
+            call.update(fallback=True, error=type(e).__name__)
+            return fallback if fallback is not None else fallback_message(e)
+
+        if cache is not None and text:
+            await cache.aset(key, text)
+        return text
+    finally:
+        _charge_quota(call)
+        llm_telemetry.finish(call)
+
+async def _astream(messages, model, temperature, max_tokens):
+    """Yield the completion text as it is generated; raises on any API error."""
+    if USING_NEW_CLIENT:
+        stream = await get_async_client().chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Releases the pooled connection, also when the consumer stops early
+            await stream.close()
+        return
+
+    # Legacy client cannot stream through the pool; send the whole answer as one chunk
+    yield await _acomplete(messages, model, temperature, max_tokens)
+
+async def astream_chat_completion(messages: List[Dict[str, str]], model: str = "gpt-4o",
+                                  temperature: float = 0.7, max_tokens: int = 1000,
+                                  fallback: Optional[str] = None,
+                                  timeout: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Stream a chat completion as text chunks while the model generates it.
+
+    If the call fails before the first chunk, the fallback text is yielded instead.
+    A failure after that ends the stream, keeping what was already sent.
+    Closing the generator (e.g. on client disconnect) aborts the HTTP request.
+    While the circuit breaker is open or the client's token quota is spent, only
+    the fallback is yielded; routes check the quota up front to answer with a 429.
+
+    Args:
+        timeout: Seconds to wait for the first chunk and between chunks; defaults to OPENAI_CALL_TIMEOUT
+    """
+    if timeout is None:
+        timeout = OPENAI_CALL_TIMEOUT
+
+    call = llm_telemetry.start(model, stream=True)
+    try:
+        check_quota(messages, max_tokens)
+    except QuotaExceededError as e:
+        call.update(fallback=True, error="QuotaExceededError")
+        llm_telemetry.finish(call)
+        yield fallback if fallback is not None else str(e)
+        return
+    if not openai_breaker.allow():
+        call.update(fallback=True, error="CircuitOpenError")
+        llm_telemetry.finish(call)
+        yield fallback if fallback is not None else fallback_message(CircuitOpenError(openai_breaker.name, 0))
+        return
+
+    stream = _astream(messages, model, temperature, max_tokens)
+    started = time.monotonic()
+    received = False
+    # Streamed chunks carry no usage, so tokens are estimated
+    call["prompt_tokens"] = message_tokens(messages)
+    parts = []
+    try:
+        while True:
+            try:
+                with collecting(call):
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                logging.error(f"OpenAI API stream stalled for {timeout}s")
+                call["error"] = "TimeoutError"
+                if not received:
+                    openai_breaker.record_failure()
+                    call["fallback"] = True
+                    yield fallback if fallback is not None else fallback_message(TimeoutError("timed out"))
+                return
+            except Exception as e:
+                logging.error(f"Error streaming from OpenAI API: {str(e)}")
+                call["error"] = type(e).__name__
+                if not received:
+                    _record_error(e)
+                    call["fallback"] = True
+                    yield fallback if fallback is not None else fallback_message(e)
+                return
+            if not received:
+                # Time to first token is what the breaker's latency threshold guards
+                openai_breaker.record_success(time.monotonic() - started)
+                call["ttft_ms"] = round((time.monotonic() - started) * 1000, 1)
+                received = True
+            parts.append(chunk)
+            yield chunk
+    finally:
+        if not received:
+            openai_breaker.release()
+        call["completion_tokens"] = count_tokens("".join(parts))
+        # Like a failed completion, a stream that never produced text costs no quota
+        if received:
+            _charge_quota(call)
+        llm_telemetry.finish(call)
+        await stream.aclose()
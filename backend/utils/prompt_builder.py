@@ -0,0 +1,172 @@
+"""
+Prefix-stable prompt assembly.
+
+Providers cache the processed prefix of a prompt: OpenAI reuses it for a
+request whose first 1024+ tokens are byte-identical to a recent one (in
+128-token steps), which cuts time to first token and input cost. A prefix only
+survives as far as the first byte that differs, so prompts are assembled from
+the most static content to the most dynamic:
+
+1. static system messages, identical for every request of a route (and language);
+2. the conversation so far, which only grows between turns of a session;
+3. per-request context: patient information, language instruction;
+4. the message to answer.
+
+Each builder also checks that its static prefix stays byte-identical and
+estimates the provider's prefix cache-hit ratio. For every prompt it hashes
+the serialized messages cumulatively and looks for the longest prefix sent
+within the last PROMPT_CACHE_TTL seconds. Matching is per whole message, so the
+estimate is a lower bound. Statistics are served on /llm/prompts.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Sequence
+
+from backend.utils.chat_history import message_tokens
+
+# Provider prompt cache behaviour: minimum cached prefix, step and how long a prefix stays warm
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+PROMPT_CACHE_INCREMENT = int(os.getenv("PROMPT_CACHE_INCREMENT", "128"))
+PROMPT_CACHE_TTL = float(os.getenv("PROMPT_CACHE_TTL", "300"))
+# More distinct static prefixes than this means something dynamic leaked into them
+PROMPT_MAX_STATIC_VARIANTS = int(os.getenv("PROMPT_MAX_STATIC_VARIANTS", "16"))
+
+
+def message(role: str, content: str) -> Dict[str, str]:
+    """A chat message with a fixed key order, so equal messages serialize to equal bytes."""
+    return {"role": role, "content": content}
+
+
+def assemble(static: Sequence[Dict[str, str]], context: Sequence[Dict[str, str]] = (),
+             history: Sequence[Dict[str, str]] = ()) -> List[Dict[str, str]]:
+    """Static messages, the conversation before the last message, the context, then the last message."""
+    history = [message(m["role"], m["content"]) for m in history]
+    return ([message(m["role"], m["content"]) for m in static] + history[:-1]
+            + [message(m["role"], m["content"]) for m in context] + history[-1:])
+
+
+def prefix_digests(messages: Sequence[Dict[str, str]]) -> List[str]:
+    """Digest of every prefix of messages: the i-th covers messages[:i + 1], byte for byte."""
+    digests = []
+    digest = b""
+    for m in messages:
+        data = json.dumps(message(m["role"], m["content"]), ensure_ascii=False, separators=(",", ":"))
+        digest = hashlib.sha256(digest + data.encode("utf-8")).digest()
+        digests.append(digest.hex())
+    return digests
+
+
+def cacheable_tokens(shared_tokens: int, min_tokens: int = PROMPT_CACHE_MIN_TOKENS,
+                     increment: int = PROMPT_CACHE_INCREMENT) -> int:
+    """Tokens of a shared prefix the provider would serve from its cache."""
+    if shared_tokens < min_tokens:
+        return 0
+    return min_tokens + (shared_tokens - min_tokens) // increment * increment
+
+
+class PromptBuilder:
+    def __init__(self, name: str, ttl: float = PROMPT_CACHE_TTL, min_tokens: int = PROMPT_CACHE_MIN_TOKENS,
+                 increment: int = PROMPT_CACHE_INCREMENT, max_prefixes: int = 4096,
+                 max_static_variants: int = PROMPT_MAX_STATIC_VARIANTS):
+        """
+        Args:
+            name (str): Route the prompts are for, as reported on /llm/prompts.
+            ttl (float): Seconds a prefix sent upstream is assumed to stay cached.
+            min_tokens (int): Shortest prefix the provider caches.
+            increment (int): Step in which longer prefixes are cached.
+            max_prefixes (int): Prefix digests remembered; least recently seen are evicted.
+            max_static_variants (int): Distinct static prefixes expected, e.g. one per language.
+        """
+        self.name = name
+        self.ttl = ttl
+        self.min_tokens = min_tokens
+        self.increment = increment
+        self.max_prefixes = max_prefixes
+        self.max_static_variants = max_static_variants
+        self._prefixes = OrderedDict()
+        self._static_variants = set()
+        self._lock = threading.Lock()
+        self._counts = {"requests": 0, "prompt_tokens": 0, "shared_prefix_tokens": 0,
+                        "cached_tokens": 0, "cache_hits": 0}
+
+    def build(self, static: Sequence[Dict[str, str]], context: Sequence[Dict[str, str]] = (),
+              history: Sequence[Dict[str, str]] = ()) -> List[Dict[str, str]]:
+        """Assemble a prompt with assemble() and record its prefix statistics."""
+        return self.observe(assemble(static, context, history), len(static))
+
+    def observe(self, messages: List[Dict[str, str]], static_count: int) -> List[Dict[str, str]]:
+        """
+        Record the prefix statistics of an assembled prompt and return it unchanged.
+
+        Args:
+            messages: The prompt as it will be sent.
+            static_count: How many leading messages are the route's static prefix.
+        """
+        digests = prefix_digests(messages)
+        now = time.monotonic()
+        with self._lock:
+            shared = 0
+            for i in range(len(digests) - 1, -1, -1):
+                seen_at = self._prefixes.get(digests[i])
+                if seen_at is not None and now - seen_at <= self.ttl:
+                    shared = i + 1
+                    break
+            for digest in digests:
+                self._prefixes[digest] = now
+                self._prefixes.move_to_end(digest)
+            while len(self._prefixes) > self.max_prefixes:
+                self._prefixes.popitem(last=False)
+
+            if static_count:
+                self._static_variants.add(digests[static_count - 1])
+                if len(self._static_variants) == self.max_static_variants + 1:
+                    logging.warning(f"Prompt '{self.name}' has more than {self.max_static_variants} "
+                                    f"static prefixes; per-request content is breaking prefix caching")
+
+            total = message_tokens(messages)
+            shared_tokens = message_tokens(messages[:shared])
+            cached = min(cacheable_tokens(shared_tokens, self.min_tokens, self.increment), total)
+            self._counts["requests"] += 1
+            self._counts["prompt_tokens"] += total
+            self._counts["shared_prefix_tokens"] += shared_tokens
+            self._counts["cached_tokens"] += cached
+            self._counts["cache_hits"] += cached > 0
+        return messages
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            variants = len(self._static_variants)
+        requests, tokens = counts["requests"], counts["prompt_tokens"]
+        return {
+            **counts,
+            "static_variants": variants,
+            "expected_hit_ratio": round(counts["cache_hits"] / requests, 3) if requests else None,
+            "expected_cached_token_ratio": round(counts["cached_tokens"] / tokens, 3) if tokens else None,
+            "shared_prefix_ratio": round(counts["shared_prefix_tokens"] / tokens, 3) if tokens else None,
+            "avg_prompt_tokens": round(tokens / requests, 1) if requests else None,
+            "min_cached_tokens": self.min_tokens,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._prefixes.clear()
+            self._static_variants.clear()
+            for key in self._counts:
+                self._counts[key] = 0
+
+
+prompt_builders: Dict[str, PromptBuilder] = {}
+
+
+def register_prompt(name: str) -> PromptBuilder:
+    """Create the prompt builder of a route, reported on /llm/prompts."""
+    builder = PromptBuilder(name)
+    prompt_builders[name] = builder
+    return builder
@@ -0,0 +1,17 @@
+"""
+Recommendations listed in LLM answers, shared by the /chat and /openai routes.
+"""
+
+from typing import List, Optional
+
+
+def extract_recommendations(text: str) -> Optional[List[str]]:
+    """
+    Bullet points of an answer (lines starting with "- " or "• "), or None if it has none.
+    """
+    # Assumes the AI formats recommendations with bullet points
+    recommendations = []
+    for line in text.split('\n'):
+        if line.strip().startswith('- ') or line.strip().startswith('• '):
+            recommendations.append(line.strip()[2:])
+    return recommendations or None
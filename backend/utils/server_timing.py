@@ -0,0 +1,30 @@
+"""
+Server-Timing header support.
+
+Handlers record how long each stage took, and the durations are sent in the
+standard ``Server-Timing`` response header, where browser devtools show them
+next to the request, e.g. ``llm-reply;dur=812.4, llm-advice;dur=790.1, total;dur=815.0``.
+"""
+
+import time
+from typing import Awaitable, Dict
+
+
+class ServerTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.durations: Dict[str, float] = {}
+
+    async def measure(self, name: str, awaitable: Awaitable):
+        """Await awaitable and record its duration under name."""
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.durations[name] = (time.perf_counter() - started) * 1000
+
+    def header(self) -> str:
+        """Header value with every recorded stage plus the total so far, in milliseconds."""
+        entries = dict(self.durations)
+        entries["total"] = (time.perf_counter() - self.started) * 1000
+        return ", ".join(f"{name};dur={duration:.1f}" for name, duration in entries.items())
@@ -0,0 +1,117 @@
+"""
+Single-flight coalescing of identical in-flight calls.
+
+When a cohort finishes the same assessment with identical scores, or a user
+double-submits a form, the same prompt is sent to OpenAI several times at
+once. Callers passing the same key while a call is running wait for that call
+and share its result (or exception) instead of starting their own.
+
+Works for coroutines (``run``) and for blocking calls made from worker threads
+(``run_sync``). Only concurrent calls are merged; once a call finishes, the
+next caller starts a new one (the LLM cache covers repeats over time).
+"""
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Any, _Flight] = {}
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+        self._counts = {"calls": 0, "coalesced": 0}
+
+    async def run(self, key: str, factory: Callable[[], Awaitable]):
+        """
+        Await factory() once for all concurrent callers with the same key.
+
+        Cancelling one caller (e.g. its client disconnected) does not affect the
+        others; the shared call is only cancelled when every caller has left.
+        """
+        # Tasks belong to one event loop, so flights are tracked per loop
+        flight_key = (id(asyncio.get_running_loop()), key)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(factory()))
+            self._flights[flight_key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(flight_key, flight))
+            self._count("calls")
+        else:
+            self._count("coalesced")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Late callers must not join a call that is being cancelled
+                self._forget(flight_key, flight)
+                flight.task.cancel()
+
+    def run_sync(self, key: str, fn: Callable[[], Any]):
+        """Blocking counterpart of run() for calls made from worker threads."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self._counts["calls"] += 1
+            else:
+                self._counts["coalesced"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            in_flight = len(self._flights) + len(self._calls)
+        requests = counts["calls"] + counts["coalesced"]
+        return {
+            **counts,
+            "in_flight": in_flight,
+            # Share of requests that did not reach the upstream API
+            "coalesced_ratio": round(counts["coalesced"] / requests, 3) if requests else None,
+        }
+
+    def _forget(self, flight_key, flight):
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+
+    def _count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+
+# Shared by every OpenAI completion in the process
+llm_flights = SingleFlight()
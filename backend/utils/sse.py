@@ -0,0 +1,43 @@
+"""
+Server-sent events for streamed LLM answers.
+
+Completions of 500-1000 tokens take several seconds. Streaming endpoints send
+each chunk to the browser as it arrives, so the first words show up after the
+upstream first-token latency instead of after the whole generation:
+
+    event: token
+    data: {"text": "Gentle"}
+
+    event: done
+    data: {"response": "...", "recommendations": [...]}
+
+Browsers read these with ``EventSource`` or ``fetch`` and a stream reader.
+"""
+
+import json
+from typing import Any, AsyncIterator
+
+from fastapi.responses import StreamingResponse
+
+SSE_MEDIA_TYPE = "text/event-stream"
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Stops nginx from buffering the stream until it ends
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Any) -> str:
+    """Format one event; data is JSON-encoded so newlines in the text cannot end the event."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """
+    Stream already formatted events.
+
+    Starlette stops iterating when the client disconnects, which closes the
+    generator and with it the upstream OpenAI request.
+    """
+    return StreamingResponse(events, media_type=SSE_MEDIA_TYPE, headers=SSE_HEADERS)
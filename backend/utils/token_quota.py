@@ -0,0 +1,195 @@
+"""
+Per-client token quotas for the LLM routes.
+
+RateLimiter in main.py counts requests, but an LLM request costs its tokens:
+one client pasting long chat histories into /openai/chat/completion uses as
+much upstream throughput as hundreds of short questions. Every client (the
+user of a valid bearer token, else the client IP) gets a token bucket
+denominated in LLM tokens. It holds up to TOKEN_QUOTA_CAPACITY tokens and
+refills at TOKEN_QUOTA_REFILL_PER_MINUTE. Per client that is two floats,
+refilled lazily on access, so every operation is O(1). Beyond
+TOKEN_QUOTA_MAX_CLIENTS the least recently seen clients are forgotten; they
+come back with a full bucket.
+
+openai_helper checks the bucket before a call goes upstream, against the
+estimated cost of the prompt plus max_tokens, and charges the tokens the call
+actually used once it is over. Cache hits and FAQ answers never reach the
+check, so they stay free and keep being served while a quota is spent. A call
+with an explicit fallback degrades to it; any other call raises
+QuotaExceededError, which the routes turn into a 429.
+
+TokenQuotaMiddleware identifies the client of every request under
+TOKEN_QUOTA_PATHS and reports its bucket in X-Token-Quota-Limit,
+X-Token-Quota-Remaining and X-Token-Quota-Reset response headers.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from backend.utils.chat_history import message_tokens
+
+# Burst size in tokens; 0 disables the quotas
+TOKEN_QUOTA_CAPACITY = int(os.getenv("TOKEN_QUOTA_CAPACITY", "20000"))
+TOKEN_QUOTA_REFILL_PER_MINUTE = float(os.getenv("TOKEN_QUOTA_REFILL_PER_MINUTE", "2000"))
+TOKEN_QUOTA_MAX_CLIENTS = int(os.getenv("TOKEN_QUOTA_MAX_CLIENTS", "10000"))
+TOKEN_QUOTA_PATHS = tuple(p for p in os.getenv("TOKEN_QUOTA_PATHS", "/chat/,/openai/").split(",") if p)
+
+# Client whose quota LLM calls are charged to; None outside TOKEN_QUOTA_PATHS
+current_client: ContextVar[Optional[str]] = ContextVar("quota_client", default=None)
+
+
+class QuotaExceededError(Exception):
+    """Raised when a client's token bucket cannot cover the estimated cost of a call."""
+
+    def __init__(self, client: str, retry_after: int):
+        self.client = client
+        self.retry_after = retry_after
+        super().__init__(f"Token quota exhausted. Please wait {retry_after} seconds before asking again.")
+
+
+class TokenQuota:
+    def __init__(self, capacity: int = TOKEN_QUOTA_CAPACITY, refill_per_minute: float = TOKEN_QUOTA_REFILL_PER_MINUTE,
+                 max_clients: int = TOKEN_QUOTA_MAX_CLIENTS):
+        """
+        Args:
+            capacity (int): Tokens a client can spend in a burst; 0 disables the quota.
+            refill_per_minute (float): Tokens added back to every bucket per minute.
+            max_clients (int): Buckets kept; least recently seen clients are evicted.
+        """
+        self.capacity = capacity
+        self.rate = refill_per_minute / 60
+        self.max_clients = max_clients
+        # client -> [tokens, monotonic time of the last refill]
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._counts = {"checks": 0, "refused": 0, "charged_tokens": 0, "evictions": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0 and self.rate > 0
+
+    def check(self, client: Optional[str], tokens: int):
+        """
+        Make sure client can afford a call estimated at tokens; nothing is charged yet.
+
+        Raises:
+            QuotaExceededError: If the bucket holds fewer tokens than the estimate (capped at the capacity).
+        """
+        if client is None or not self.enabled:
+            return
+        needed = min(tokens, self.capacity)
+        with self._lock:
+            self._counts["checks"] += 1
+            balance = self._refill(client)[0]
+            if balance >= needed:
+                return
+            self._counts["refused"] += 1
+        raise QuotaExceededError(client, math.ceil((needed - balance) / self.rate))
+
+    def charge(self, client: Optional[str], tokens: int):
+        """Take the tokens a call used from client's bucket; the balance may go negative."""
+        if client is None or not self.enabled or tokens <= 0:
+            return
+        with self._lock:
+            self._refill(client)[0] -= tokens
+            self._counts["charged_tokens"] += tokens
+
+    def headers(self, client: str) -> Dict[str, str]:
+        """Quota response headers: capacity, whole tokens left and seconds until the bucket is full."""
+        with self._lock:
+            balance = self._refill(client)[0]
+        return {
+            "X-Token-Quota-Limit": str(self.capacity),
+            "X-Token-Quota-Remaining": str(max(0, int(balance))),
+            "X-Token-Quota-Reset": str(math.ceil((self.capacity - balance) / self.rate)),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+            clients = len(self._buckets)
+        return {
+            **counts,
+            "enabled": self.enabled,
+            "capacity": self.capacity,
+            "refill_per_minute": self.rate * 60,
+            "clients": clients,
+            "max_clients": self.max_clients,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+            for key in self._counts:
+                self._counts[key] = 0
+
+    def _refill(self, client):
+        now = time.monotonic()
+        bucket = self._buckets.get(client)
+        if bucket is None:
+            bucket = self._buckets[client] = [float(self.capacity), now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+                self._counts["evictions"] += 1
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            self._buckets.move_to_end(client)
+        return bucket
+
+
+def client_id(scope) -> str:
+    """Quota key of a request: "user:<id>" for a valid bearer token, else "ip:<address>"."""
+    for name, value in scope.get("headers", ()):
+        if name == b"authorization" and value[:7].lower() == b"bearer ":
+            # Imported here: the auth stack pulls in the database models
+            from backend.core.auth import decode_access_token
+            try:
+                return f"user:{decode_access_token(value[7:].decode('latin-1'))['sub']}"
+            except Exception:
+                # An invalid or expired token is charged to the address like an anonymous request
+                break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+def check_quota(messages: List[Dict[str, str]], max_tokens: int):
+    """Raise QuotaExceededError if the current client cannot afford a completion of messages."""
+    token_quota.check(current_client.get(), message_tokens(messages) + max_tokens)
+
+
+class TokenQuotaMiddleware:
+    """Pure ASGI middleware charging LLM calls to the requesting client and adding the quota headers."""
+
+    def __init__(self, app, paths=TOKEN_QUOTA_PATHS):
+        self.app = app
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not token_quota.enabled or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+        client = client_id(scope)
+
+        async def send_with_headers(event):
+            if event["type"] == "http.response.start":
+                # Sent when the handler returns, so the balance includes what this request used
+                headers = [(k.lower().encode("latin-1"), v.encode("latin-1"))
+                           for k, v in token_quota.headers(client).items()]
+                event = {**event, "headers": list(event.get("headers", [])) + headers}
+            await send(event)
+
+        token = current_client.set(client)
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_client.reset(token)
+
+
+# Shared quotas of every client of the process
+token_quota = TokenQuota()
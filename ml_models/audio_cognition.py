@@ -1,22 +1,36 @@
-import whisper
 import numpy as np
 
-def analyze_audio(file_path):
+from ml_models.whisper_service import whisper_service
+
+# Silence between two words, in seconds, counted as a long pause
+LONG_PAUSE_SECONDS = 1.0
+
+def analyze_audio(file_path, transcript=None):
     """
     Transcribe and analyze audio for cognitive patterns.
 
     Args:
         file_path (str): Path to the audio file (.wav or .mp3).
+        transcript (dict): Optional Whisper result for this file, to avoid transcribing it again.
 
     Returns:
         dict: Structured result with transcription, speech clarity, repetition score, and cognitive risk level.
     """
-    # Load Whisper model
-    model = whisper.load_model("base")
+    if transcript is None:
+        transcript = whisper_service.transcribe(file_path)
+    return analyze_transcript(transcript)
+
+def analyze_transcript(transcript):
+    """
+    Compute cognitive speech metrics from a Whisper transcription result.
 
-    # Transcribe audio
-    result = model.transcribe(file_path)
-    transcription = result['text']
+    Args:
+        transcript (dict): Whisper result with ``text`` and optionally ``segments`` with word timings.
+
+    Returns:
+        dict: Structured result with transcription, speech clarity, repetition score, and cognitive risk level.
+    """
+    transcription = transcript['text']
 
     # Analyze key patterns
     words = transcription.split()
@@ -37,9 +51,50 @@ def analyze_audio(file_path):
     else:
         cognitive_risk = "Low"
 
-    return {
+    result = {
         "transcription": transcription,
         "speech_clarity": speech_clarity,
         "repetition_score": repetition_score,
         "cognitive_risk": cognitive_risk
     }
+    result.update(analyze_word_timing(transcript.get("segments", [])))
+    return result
+
+def analyze_word_timing(segments):
+    """
+    Derive speech rate and pauses from Whisper word timings.
+
+    Args:
+        segments (list): Whisper segments, each with a ``words`` list of start/end times.
+
+    Returns:
+        dict: Words per minute and number of long pauses, or an empty dict without word timings.
+    """
+    timings = [(word["start"], word["end"]) for segment in segments for word in segment.get("words", [])]
+    if not timings:
+        return {}
+
+    starts, ends = np.array(timings).T
+    speaking_time = ends[-1] - starts[0]
+    gaps = starts[1:] - ends[:-1]
+    return {
+        "words_per_minute": round(len(timings) / speaking_time * 60, 1) if speaking_time > 0 else None,
+        "long_pauses": int((gaps > LONG_PAUSE_SECONDS).sum())
+    }
+
+def transcribe_and_analyze(file_path):
+    """
+    Transcribe an audio file once and compute its cognitive metrics.
+    Top-level so it can run as a background job in a worker process.
+
+    Args:
+        file_path (str): Path to the audio file.
+
+    Returns:
+        dict: ``transcription`` text and ``analysis`` metrics.
+    """
+    transcript = whisper_service.transcribe(file_path)
+    return {
+        "transcription": transcript["text"],
+        "analysis": analyze_transcript(transcript)
+    }
@@ -1,4 +1,4 @@
-import whisper
+from ml_models.whisper_service import whisper_service
 
 def transcribe_audio(audio_file_path: str) -> str:
     """
@@ -10,11 +10,9 @@ def transcribe_audio(audio_file_path: str) -> str:
     Returns:
         str: Transcribed text.
     """
-    # Load the Whisper model
-    model = whisper.load_model("base")
-
-    # Transcribe the audio file
-    result = model.transcribe(audio_file_path)
+    # The shared service keeps the Whisper model loaded and reuses the
+    # transcript if this file was already transcribed
+    result = whisper_service.transcribe(audio_file_path)
 
     # Return the transcribed text
     return result['text']
@@ -0,0 +1,106 @@
+"""
+Benchmark exercise video analysis.
+
+Compares building a new Pose estimator for every video and processing every
+full-size frame (the old behaviour) with reusing estimators from a PosePool,
+with and without frame sampling/downscaling, and reports videos/sec and
+per-frame latency for each.
+
+    python -m ml_models.bench_video_exercise video1.mp4 video2.mp4 --repeat 5
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from ml_models.pose_pool import PosePool, create_pose_estimator
+from ml_models.video_frames import iter_frames
+
+# Strategy name -> (reuse estimators, sample and downscale frames)
+STRATEGIES = {
+    "per_video": (False, False),
+    "pooled": (True, False),
+    "sampled": (True, True),
+}
+
+
+class TimedEstimator:
+    """Wraps an estimator and records the latency of every process() call."""
+
+    def __init__(self, estimator, latencies):
+        self.estimator = estimator
+        self.latencies = latencies
+
+    def process(self, frame):
+        started = time.perf_counter()
+        result = self.estimator.process(frame)
+        self.latencies.append(time.perf_counter() - started)
+        return result
+
+    def reset(self):
+        reset = getattr(self.estimator, "reset", None)
+        if reset is not None:
+            reset()
+
+    def close(self):
+        self.estimator.close()
+
+
+def run_video(video_path, pool, sampled):
+    """Run the frames of a video through an estimator borrowed from pool."""
+    frames = iter_frames(video_path, color=cv2.COLOR_BGR2RGB) if sampled else \
+        iter_frames(video_path, target_fps=None, max_side=None, color=cv2.COLOR_BGR2RGB)
+    with pool.acquire() as pose:
+        for frame in frames:
+            pose.process(frame)
+
+
+def benchmark(video_paths, repeat=3, factory=create_pose_estimator):
+    """
+    Time every strategy over the same videos.
+
+    Returns:
+        dict: Per strategy, videos/sec and mean/p95 per-frame latency in milliseconds.
+    """
+    results = {}
+    for mode, (reuse, sampled) in STRATEGIES.items():
+        latencies = []
+        pool = PosePool(lambda: TimedEstimator(factory(), latencies), max_idle=1 if reuse else 0)
+
+        videos = 0
+        started = time.perf_counter()
+        for _ in range(repeat):
+            for video_path in video_paths:
+                run_video(video_path, pool, sampled)
+                videos += 1
+        elapsed = time.perf_counter() - started
+        pool.close()
+
+        frame_ms = np.array(latencies) * 1000
+        results[mode] = {
+            "videos": videos,
+            "frames": len(latencies),
+            "estimators_created": pool.created,
+            "videos_per_sec": round(videos / elapsed, 3) if elapsed > 0 else None,
+            "frame_ms_mean": round(float(frame_ms.mean()), 2) if len(frame_ms) else None,
+            "frame_ms_p95": round(float(np.percentile(frame_ms, 95)), 2) if len(frame_ms) else None,
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("videos", nargs="+", help="Video files to analyze")
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the video list per strategy")
+    args = parser.parse_args(argv)
+
+    for mode, stats in benchmark(args.videos, repeat=args.repeat).items():
+        print(f"{mode:>10}: {stats['videos_per_sec']} videos/sec, "
+              f"{stats['frame_ms_mean']} ms/frame (p95 {stats['frame_ms_p95']} ms), "
+              f"{stats['estimators_created']} estimators for {stats['videos']} videos")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 import cv2
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-import joblib
+
+from ml_models.model_registry import registry
+from ml_models.video_frames import iter_frames, RunningStats
+from ml_models.video_exercise import analyze_exercise_video as score_exercise_video
 
 # Placeholder for feature extraction from video
 def extract_features_from_video(video_file_path: str) -> np.ndarray:
     """
     Extract features from a video file for exercise analysis.
+    Frames are sampled and downscaled (see ml_models.video_frames) and the
+    statistics are accumulated in a single pass without storing per-frame values.
 
     Args:
         video_file_path (str): Path to the video file.
@@ -14,34 +18,21 @@ def extract_features_from_video(video_file_path: str) -> np.ndarray:
     Returns:
         np.ndarray: Extracted features as a numpy array.
     """
-    # Open the video file
-    cap = cv2.VideoCapture(video_file_path)
-
-    if not cap.isOpened():
-        raise ValueError("Error opening video file")
-
-    features = []
-
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+    stats = RunningStats()
 
-        # Example: Extract mean pixel intensity as a feature
-        gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        mean_intensity = np.mean(gray_frame)
-        features.append(mean_intensity)
-
-    cap.release()
+    # Example: Extract mean pixel intensity as a feature
+    for gray_frame in iter_frames(video_file_path, color=cv2.COLOR_BGR2GRAY):
+        stats.push(float(gray_frame.mean()))
 
     # Aggregate features (e.g., mean and standard deviation)
-    features = np.array(features)
-    return np.array([np.mean(features), np.std(features)])
+    return np.array([stats.mean, stats.std])
 
 # Function to analyze exercise video
 def analyze_exercise_video(video_file_path: str) -> str:
     """
     Analyze a video file to determine exercise accuracy.
+    The exercise model is trained on joint angles, so frames are classified from
+    MediaPipe pose landmarks (see ml_models.video_exercise) rather than pixel intensity.
 
     Args:
         video_file_path (str): Path to the video file.
@@ -49,16 +40,10 @@ def analyze_exercise_video(video_file_path: str) -> str:
     Returns:
         str: Exercise accuracy ("Correct" or "Incorrect").
     """
-    # Load the pre-trained model
-    model = joblib.load('exercise_model.joblib')
-
-    # Extract features from the video
-    features = extract_features_from_video(video_file_path)
-
-    # Predict exercise accuracy
-    prediction = model.predict([features])
+    # Classify every sampled frame's joint angles with the shared registry model
+    result = score_exercise_video(video_file_path, model=registry.get("exercise"))
 
-    return "Correct" if prediction[0] == 1 else "Incorrect"
+    return "Correct" if result["status"] == "Pass" else "Incorrect"
 
 if __name__ == "__main__":
     # Example usage
@@ -0,0 +1,129 @@
+"""
+On-disk cache of pose landmarks per video.
+
+Pose estimation dominates the cost of exercise analysis, while scoring the
+landmarks takes milliseconds. The landmarks of every analyzed video are saved
+as a float16 (frames, 33, 4) ``.npy`` array, about 264 bytes per frame, named
+by the SHA-256 of the video content and a version string covering the pose
+model and frame sampling. Re-analyzing the same video, changing thresholds or
+swapping the exercise classifier reads the array back memory-mapped instead of
+running MediaPipe again. Any change to the model or sampling settings changes
+the version and so misses the old entries.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from typing import Optional
+
+import numpy as np
+
+from ml_models.pose_pool import pose_model_version
+from ml_models.video_frames import VIDEO_ANALYSIS_FPS, VIDEO_ANALYSIS_MAX_SIDE
+
+# Bump when the layout of the cached arrays changes
+CACHE_FORMAT = 1
+
+LANDMARK_CACHE_DIR = os.getenv(
+    "LANDMARK_CACHE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "../uploads/landmarks"))
+)
+LANDMARK_CACHE_MAX_MB = float(os.getenv("LANDMARK_CACHE_MAX_MB", "512"))
+
+
+def landmark_version() -> str:
+    """Version of the cached landmarks: pose model plus sampling settings."""
+    return f"{pose_model_version()}-fps{VIDEO_ANALYSIS_FPS:g}-side{VIDEO_ANALYSIS_MAX_SIDE}-f{CACHE_FORMAT}"
+
+
+class LandmarkCache:
+    def __init__(self, directory: str = LANDMARK_CACHE_DIR, version: Optional[str] = None,
+                 max_bytes: Optional[int] = int(LANDMARK_CACHE_MAX_MB * 1024 * 1024)):
+        """
+        Args:
+            directory (str): Where the .npy files are stored.
+            version (str): Landmark version; defaults to landmark_version().
+            max_bytes (int): Oldest entries are deleted once the cache grows past this; None for no limit.
+        """
+        self.directory = directory
+        self.version = version or landmark_version()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def load(self, video_path: str) -> Optional[np.ndarray]:
+        """Return the cached landmarks of a video, memory-mapped read-only, or None."""
+        path = self.path(video_path)
+        try:
+            landmarks = np.load(path, mmap_mode="r")
+        except (FileNotFoundError, ValueError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return landmarks
+
+    def save(self, video_path: str, landmarks: np.ndarray) -> str:
+        """Store a video's (frames, 33, 4) landmarks as float16 and return the file path."""
+        path = self.path(video_path)
+        os.makedirs(self.directory, exist_ok=True)
+        # Write to a temporary file and rename so readers never see a partial array
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".npy.tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, np.asarray(landmarks, dtype=np.float16))
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        self.prune()
+        return path
+
+    def path(self, video_path: str) -> str:
+        """Cache file for a video under the current version."""
+        version = hashlib.sha256(self.version.encode()).hexdigest()[:12]
+        return os.path.join(self.directory, f"{self.content_hash(video_path)}-{version}.npy")
+
+    def content_hash(self, video_path: str) -> str:
+        """SHA-256 of the video bytes, remembered per path, size and mtime."""
+        stat = os.stat(video_path)
+        key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._digests.get(key)
+        if digest is None:
+            sha = hashlib.sha256()
+            with open(video_path, "rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    sha.update(chunk)
+            digest = sha.hexdigest()
+            with self._lock:
+                self._digests[key] = digest
+        return digest
+
+    def prune(self):
+        """Delete the least recently written entries beyond max_bytes."""
+        if self.max_bytes is None:
+            return
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.name.endswith(".npy")]
+        except FileNotFoundError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        total = 0
+        for entry in entries:
+            total += entry.stat().st_size
+            if total > self.max_bytes:
+                try:
+                    os.unlink(entry.path)
+                except OSError as e:
+                    logging.error(f"Error pruning landmark cache: {str(e)}")
+
+    def stats(self) -> dict:
+        return {"version": self.version, "hits": self.hits, "misses": self.misses}
+
+
+# Shared cache; set LANDMARK_CACHE_DIR to an empty string to disable it
+landmark_cache = LandmarkCache() if LANDMARK_CACHE_DIR else None
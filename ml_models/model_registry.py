@@ -0,0 +1,204 @@
+"""
+Process-wide registry for trained model artifacts.
+
+Every artifact is loaded at most once per process, on first use, with
+``joblib.load(..., mmap_mode="r")``. Plain numpy arrays inside an uncompressed
+joblib pickle (lookup tables, cached landmarks) are then backed by a read-only
+memory map of the file, so all uvicorn workers on a host share a single copy of
+those pages through the OS page cache. scikit-learn trees copy their node
+arrays when unpickled, so a forest still costs one copy per worker, but only one.
+
+Artifacts are hot-reloaded without restarting workers: publish a new version by
+writing it next to the old one and ``os.replace``-ing it over the registered
+path. Each worker notices the changed file within ``check_interval`` seconds,
+loads the new version in full and only then swaps the reference, so in-flight
+requests keep using the previous model until the swap.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import joblib
+
+ML_MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def get_rss_bytes():
+    """Return the resident set size of the current process in bytes, or None if unknown."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    if resource is not None:
+        # ru_maxrss is the peak RSS, in kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if os.uname().sysname == "Darwin" else peak * 1024
+    return None
+
+
+def _artifact_version(path):
+    """Identify an artifact version by its inode, size and modification time."""
+    stat = os.stat(path)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+class ModelEntry:
+    def __init__(self, name, path, loader, mmap_mode):
+        self.name = name
+        self.path = path
+        self.loader = loader
+        self.mmap_mode = mmap_mode
+        self.model = None
+        self.version = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self.rss_delta_bytes = None
+        self.load_count = 0
+        self.last_error = None
+        self.last_checked = 0.0
+        self.lock = threading.Lock()
+
+
+class ModelRegistry:
+    """Loads each registered artifact once and hands out the shared instance."""
+
+    def __init__(self, check_interval=5.0):
+        # Seconds between checks for a newer artifact on disk; 0 disables hot reload
+        self.check_interval = check_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, path, loader=None, mmap_mode="r"):
+        """
+        Register an artifact under a name. Nothing is read from disk until the first get().
+
+        Args:
+            name (str): Registry key, e.g. "phq".
+            path (str): Path to the artifact file.
+            loader (callable): Optional ``loader(path, mmap_mode)``; defaults to joblib.load.
+            mmap_mode (str): Passed to the loader; None loads the artifact fully into memory.
+        """
+        with self._lock:
+            self._entries[name] = ModelEntry(name, os.path.abspath(path), loader or _joblib_loader, mmap_mode)
+
+    def get(self, name):
+        """
+        Return the loaded artifact registered under name, loading it on first use.
+
+        Raises:
+            KeyError: If no artifact is registered under name.
+            FileNotFoundError: If the artifact has never been loaded and the file is missing.
+        """
+        entry = self._get_entry(name)
+        if entry.model is None:
+            return self._load(entry)
+
+        if self.check_interval and time.monotonic() - entry.last_checked >= self.check_interval:
+            entry.last_checked = time.monotonic()
+            try:
+                if _artifact_version(entry.path) != entry.version:
+                    self._load(entry)
+            except Exception as e:
+                # Keep serving the version already in memory
+                entry.last_error = str(e)
+                logging.error(f"Hot reload of model '{name}' failed: {str(e)}")
+        return entry.model
+
+    def reload(self, name):
+        """Load the artifact again from its registered path and atomically swap it in."""
+        return self._load(self._get_entry(name), force=True)
+
+    def path(self, name):
+        """Return the registered artifact path for name."""
+        return self._get_entry(name).path
+
+    def version(self, name):
+        """Return the (inode, size, mtime) version of the loaded artifact, or None if not loaded."""
+        return self._get_entry(name).version
+
+    def artifact_version(self, name):
+        """Return the (inode, size, mtime) version of the artifact file on disk, or None if it is missing."""
+        try:
+            return _artifact_version(self._get_entry(name).path)
+        except OSError:
+            return None
+
+    def is_available(self, name):
+        """Return True if the artifact is loaded or present on disk."""
+        entry = self._entries.get(name)
+        return entry is not None and (entry.model is not None or os.path.exists(entry.path))
+
+    def status(self):
+        """Return load statistics for every registered artifact."""
+        return {
+            "rss_bytes": get_rss_bytes(),
+            "models": {
+                name: {
+                    "path": entry.path,
+                    "loaded": entry.model is not None,
+                    "mmap_mode": entry.mmap_mode,
+                    "version": list(entry.version) if entry.version else None,
+                    "loaded_at": entry.loaded_at,
+                    "load_seconds": entry.load_seconds,
+                    "rss_delta_bytes": entry.rss_delta_bytes,
+                    "load_count": entry.load_count,
+                    "last_error": entry.last_error,
+                }
+                for name, entry in list(self._entries.items())
+            },
+        }
+
+    def _get_entry(self, name):
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"No model registered under '{name}'")
+
+    def _load(self, entry, force=False):
+        with entry.lock:
+            version = _artifact_version(entry.path)
+            # Another thread may have finished the same load while we waited for the lock
+            if entry.model is not None and not force and version == entry.version:
+                return entry.model
+
+            rss_before = get_rss_bytes()
+            started = time.perf_counter()
+            model = entry.loader(entry.path, entry.mmap_mode)
+            load_seconds = time.perf_counter() - started
+            rss_after = get_rss_bytes()
+
+            entry.version = version
+            entry.loaded_at = time.time()
+            entry.load_seconds = round(load_seconds, 4)
+            entry.rss_delta_bytes = rss_after - rss_before if rss_before is not None and rss_after is not None else None
+            entry.load_count += 1
+            entry.last_error = None
+            entry.last_checked = time.monotonic()
+            # Swap last so readers only ever see a fully loaded model
+            entry.model = model
+
+            logging.info(
+                f"Loaded model '{entry.name}' from {entry.path} in {entry.load_seconds}s "
+                f"(rss delta: {entry.rss_delta_bytes} bytes)"
+            )
+            return model
+
+
+def _joblib_loader(path, mmap_mode):
+    return joblib.load(path, mmap_mode=mmap_mode)
+
+
+# Shared registry used by the API and the ml_models helpers
+registry = ModelRegistry(check_interval=float(os.getenv("MODEL_RELOAD_INTERVAL", "5")))
+registry.register("phq", os.path.join(ML_MODELS_DIR, "phq_model.pkl"))
+registry.register("phq_scaled", os.path.join(ML_MODELS_DIR, "phq_model.joblib"))
+registry.register("exercise", os.path.join(ML_MODELS_DIR, "exercise_model.joblib"))
+registry.register("phq_lookup", os.path.join(ML_MODELS_DIR, "phq_lookup.joblib"))
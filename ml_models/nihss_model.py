@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -67,6 +68,31 @@ def predict_nihss_severity(input_dict):
         logging.error(f"Error predicting NIHSS severity: {str(e)}")
         return "Unable to determine severity"
 
+# Lower edges of the severity bands used by predict_nihss_severity
+NIHSS_CUT_POINTS = np.array([0, 1, 5, 16, 21, 43])
+NIHSS_SEVERITY_LABELS = np.array([
+    "Invalid Score",              # total < 0
+    "No Stroke Symptoms",         # 0
+    "Minor Stroke",               # 1-4
+    "Moderate Stroke",            # 5-15
+    "Moderate to Severe Stroke",  # 16-20
+    "Severe Stroke",              # 21-42
+    "Invalid Score",              # > 42
+])
+
+def predict_nihss_severity_batch(item_scores):
+    """
+    Vectorized predict_nihss_severity for many patients at once.
+
+    Args:
+        item_scores: (n_patients, 11) array of NIHSS item scores
+
+    Returns:
+        tuple: (total scores, severity labels), both arrays of length n_patients
+    """
+    totals = np.asarray(item_scores).sum(axis=1)
+    return totals, NIHSS_SEVERITY_LABELS[np.digitize(totals, NIHSS_CUT_POINTS)]
+
 if __name__ == "__main__":
     # Update this path when you have the NIHSS dataset
     train_nihss_model('data/nihss_dataset.csv')
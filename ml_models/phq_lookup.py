@@ -0,0 +1,217 @@
+"""
+Precomputed lookup table for the PHQ-9 RandomForest.
+
+The model takes nine answers, each 0-3, so there are only 4**9 = 262,144
+possible inputs. ``compile_table`` evaluates the forest over all of them once
+and stores the index of the predicted class per input as a uint8 array
+(256 KB). Serving a prediction is then a base-4 encoding of the answers and a
+single array index.
+
+The table records the SHA-256 of the model artifact it was compiled from and is
+only used while that artifact is the one being served; otherwise predictions
+fall back to the forest. Answers outside 0-3 also go to the forest.
+
+Usage:
+    python -m ml_models.phq_lookup compile [--model PATH] [--output PATH]
+    python -m ml_models.phq_lookup verify [--model PATH] [--table PATH]
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+from ml_models.model_registry import registry
+
+N_ITEMS = 9
+N_LEVELS = 4
+TABLE_SIZE = N_LEVELS ** N_ITEMS
+
+# Weight of each answer in the base-4 index, first answer most significant
+_PLACE_VALUES = N_LEVELS ** np.arange(N_ITEMS - 1, -1, -1, dtype=np.int64)
+
+_table_check = {"key": None, "valid": False}
+
+
+def encode_inputs(features: np.ndarray) -> np.ndarray:
+    """Map an (n, 9) array of answers in 0-3 to table indices."""
+    return np.asarray(features, dtype=np.int64) @ _PLACE_VALUES
+
+
+def enumerate_inputs(start: int = 0, stop: int = TABLE_SIZE) -> np.ndarray:
+    """Return the answer rows for table indices [start, stop) as an (n, 9) int array."""
+    indices = np.arange(start, stop, dtype=np.int64)
+    return (indices[:, None] // _PLACE_VALUES) % N_LEVELS
+
+
+def in_table_range(features: np.ndarray) -> np.ndarray:
+    """Return a boolean mask of the rows whose answers are all within 0-3."""
+    features = np.asarray(features)
+    return ((features >= 0) & (features < N_LEVELS)).all(axis=1)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compile_table(model, batch_size: int = 65536) -> dict:
+    """
+    Evaluate the model over every possible PHQ-9 input.
+
+    Args:
+        model: Fitted classifier with ``predict`` and ``classes_``.
+        batch_size (int): Rows per predict call, to bound peak memory.
+
+    Returns:
+        dict: ``table`` (class index per input) and ``classes``.
+    """
+    classes = np.asarray(model.classes_)
+    dtype = np.uint8 if len(classes) <= np.iinfo(np.uint8).max + 1 else np.int16
+    table = np.empty(TABLE_SIZE, dtype=dtype)
+
+    for start in range(0, TABLE_SIZE, batch_size):
+        stop = min(start + batch_size, TABLE_SIZE)
+        predictions = model.predict(enumerate_inputs(start, stop))
+        table[start:stop] = np.searchsorted(classes, predictions)
+
+    return {"table": table, "classes": classes}
+
+
+def verify_table(model, lookup: dict, batch_size: int = 65536) -> dict:
+    """
+    Check that the table reproduces ``model.predict`` exactly on every input.
+
+    Returns:
+        dict: Number of rows checked, number of mismatches and the first mismatching input.
+    """
+    mismatches = 0
+    first_mismatch = None
+    classes = lookup["classes"]
+    table = lookup["table"]
+
+    for start in range(0, TABLE_SIZE, batch_size):
+        stop = min(start + batch_size, TABLE_SIZE)
+        inputs = enumerate_inputs(start, stop)
+        expected = model.predict(inputs)
+        actual = classes[table[start:stop]]
+        differs = expected != actual
+        if differs.any():
+            mismatches += int(differs.sum())
+            if first_mismatch is None:
+                row = int(np.argmax(differs))
+                first_mismatch = {
+                    "input": inputs[row].tolist(),
+                    "expected": _to_python(expected[row]),
+                    "table": _to_python(actual[row]),
+                }
+
+    return {"rows": TABLE_SIZE, "mismatches": mismatches, "first_mismatch": first_mismatch}
+
+
+def save_table(lookup: dict, model_sha256: str, output_path: str):
+    """Write the table atomically so serving workers hot-reload a complete file."""
+    tmp_path = output_path + ".tmp"
+    # Uncompressed so the registry can memory-map the table across workers
+    joblib.dump({**lookup, "model_sha256": model_sha256}, tmp_path)
+    os.replace(tmp_path, output_path)
+
+
+def _model_version():
+    """Version of the PHQ model predictions come from: the loaded one, else the file it would load."""
+    return registry.version("phq") or registry.artifact_version("phq")
+
+
+def get_lookup_table():
+    """
+    Return the compiled table if it exists and matches the current PHQ model artifact, else None.
+    """
+    if not registry.is_available("phq_lookup"):
+        return None
+    lookup = registry.get("phq_lookup")
+
+    # The model file is hashed only when the table or the model version changes, not per request
+    key = (registry.version("phq_lookup"), _model_version())
+    if key != _table_check["key"]:
+        valid = key[1] is not None and file_sha256(registry.path("phq")) == lookup["model_sha256"]
+        if not valid:
+            logging.warning("PHQ lookup table does not match the current PHQ model; using the model directly")
+        _table_check.update(key=key, valid=valid)
+
+    return lookup if _table_check["valid"] else None
+
+
+def predict_phq(features) -> np.ndarray:
+    """
+    Predict with the PHQ-9 model, answering from the lookup table whenever possible.
+
+    Args:
+        features: (n, 9) array-like of answers, or a single row of 9 answers.
+
+    Returns:
+        np.ndarray: One prediction per row, identical to ``model.predict``.
+    """
+    features = np.asarray(features)
+    if features.ndim == 1:
+        features = features.reshape(1, -1)
+
+    lookup = get_lookup_table()
+    if lookup is None:
+        return registry.get("phq").predict(features)
+
+    covered = in_table_range(features)
+    if covered.all():
+        return lookup["classes"][lookup["table"][encode_inputs(features)]]
+
+    predictions = np.empty(len(features), dtype=lookup["classes"].dtype)
+    predictions[covered] = lookup["classes"][lookup["table"][encode_inputs(features[covered])]]
+    predictions[~covered] = registry.get("phq").predict(features[~covered])
+    return predictions
+
+
+def _to_python(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile or verify the PHQ-9 lookup table")
+    parser.add_argument("command", choices=["compile", "verify"])
+    parser.add_argument("--model", default=registry.path("phq"), help="Path to the PHQ model artifact")
+    parser.add_argument("--table", "--output", dest="table", default=registry.path("phq_lookup"),
+                        help="Path to the lookup table artifact")
+    args = parser.parse_args(argv)
+
+    model = joblib.load(args.model)
+
+    if args.command == "compile":
+        started = time.perf_counter()
+        lookup = compile_table(model)
+        save_table(lookup, file_sha256(args.model), args.table)
+        print(f"Compiled {TABLE_SIZE} inputs into {args.table} "
+              f"({lookup['table'].nbytes} bytes, {lookup['table'].dtype}) "
+              f"in {time.perf_counter() - started:.1f}s")
+        result = verify_table(model, lookup)
+    else:
+        lookup = joblib.load(args.table, mmap_mode="r")
+        if lookup["model_sha256"] != file_sha256(args.model):
+            print("Table was compiled from a different model artifact")
+            return 1
+        result = verify_table(model, lookup)
+
+    print(f"Verified {result['rows']} inputs: {result['mismatches']} mismatches")
+    if result["mismatches"]:
+        print(f"First mismatch: {result['first_mismatch']}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
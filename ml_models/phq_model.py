@@ -8,6 +8,8 @@ import pandas as pd
 import numpy as np
 import joblib
 
+from ml_models.model_registry import registry
+
 # Load and preprocess dataset
 def load_and_preprocess_data(file_path):
     data = pd.read_csv(file_path)
@@ -42,7 +44,7 @@ def save_model(model, scaler, file_path):
 
 # Predict depression level
 def predict_phq_level(input_dict):
-    model_data = joblib.load("ml_models/phq_model.joblib")
+    model_data = registry.get("phq_scaled")
     model = model_data["model"]
     scaler = model_data["scaler"]
     input_array = np.array([list(input_dict.values())]).reshape(1, -1)
@@ -0,0 +1,167 @@
+"""
+Joint-angle features from MediaPipe Pose landmarks.
+
+The exercise model is trained on the angle columns of the Physical Exercise
+Recognition dataset (``angles.csv``), named after the three joints that form
+each angle, e.g. ``right_elbow_right_shoulder_right_hip`` is the angle at the
+right shoulder between the elbow and the hip. Landmarks for a whole video are
+held in one (frames, 33, 4) array of x, y, z, visibility, so every angle for
+every frame comes out of a handful of NumPy operations and the model scores
+all frames in a single predict_proba call.
+"""
+
+import numpy as np
+import pandas as pd
+
+NUM_LANDMARKS = 33
+
+# MediaPipe Pose landmark indices of the joints used by the angle features
+LANDMARK_INDEX = {
+    "nose": 0,
+    "left_shoulder": 11,
+    "right_shoulder": 12,
+    "left_elbow": 13,
+    "right_elbow": 14,
+    "left_wrist": 15,
+    "right_wrist": 16,
+    "left_hip": 23,
+    "right_hip": 24,
+    "left_knee": 25,
+    "right_knee": 26,
+    "left_ankle": 27,
+    "right_ankle": 28,
+}
+
+# Virtual joints: midpoint of two landmarks
+MIDPOINTS = {
+    "mid_hip": ("left_hip", "right_hip"),
+    "mid_shoulder": ("left_shoulder", "right_shoulder"),
+}
+
+# angles.csv feature columns, used when the model does not record its own
+DEFAULT_ANGLE_FEATURES = [
+    "right_elbow_right_shoulder_right_hip",
+    "left_elbow_left_shoulder_left_hip",
+    "right_knee_mid_hip_left_knee",
+    "right_hip_right_knee_right_ankle",
+    "left_hip_left_knee_left_ankle",
+    "right_wrist_right_elbow_right_shoulder",
+    "left_wrist_left_elbow_left_shoulder",
+]
+
+
+def landmarks_to_array(pose_landmarks, out=None):
+    """
+    Copy one frame's MediaPipe landmarks into a (33, 4) x, y, z, visibility array.
+
+    Args:
+        pose_landmarks: ``results.pose_landmarks`` from Pose.process(), or None.
+        out (np.ndarray): Optional (33, 4) row to fill in place, e.g. one frame of a video array.
+
+    Returns:
+        np.ndarray: The filled array; all NaN when no pose was detected.
+    """
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+    if pose_landmarks is None:
+        out[:] = np.nan
+        return out
+    out[:] = [(lm.x, lm.y, lm.z, lm.visibility) for lm in pose_landmarks.landmark]
+    return out
+
+
+def parse_angle_feature(name):
+    """
+    Split an angle column name into its (end, vertex, end) joints.
+
+    Raises:
+        ValueError: If the name is not three known joints joined by underscores.
+    """
+    known = set(LANDMARK_INDEX) | set(MIDPOINTS)
+    tokens = name.split("_")
+    joints = []
+    while tokens:
+        # Joint names contain underscores themselves; take the longest known prefix
+        for size in range(len(tokens), 0, -1):
+            candidate = "_".join(tokens[:size])
+            if candidate in known:
+                joints.append(candidate)
+                tokens = tokens[size:]
+                break
+        else:
+            raise ValueError(f"Unknown joint in angle feature '{name}'")
+    if len(joints) != 3:
+        raise ValueError(f"Angle feature '{name}' must name exactly three joints")
+    return tuple(joints)
+
+
+def joint_positions(landmarks, joints):
+    """
+    Gather joint coordinates for every frame.
+
+    Args:
+        landmarks (np.ndarray): (frames, 33, 4) landmark array.
+        joints (list): Joint names, including midpoints.
+
+    Returns:
+        np.ndarray: (frames, len(joints), 3) x, y, z coordinates.
+    """
+    xyz = landmarks[..., :3]
+    columns = []
+    for joint in joints:
+        if joint in MIDPOINTS:
+            first, second = MIDPOINTS[joint]
+            columns.append((xyz[:, LANDMARK_INDEX[first]] + xyz[:, LANDMARK_INDEX[second]]) / 2)
+        else:
+            columns.append(xyz[:, LANDMARK_INDEX[joint]])
+    return np.stack(columns, axis=1)
+
+
+def angle_features(landmarks, feature_names=DEFAULT_ANGLE_FEATURES):
+    """
+    Compute joint angles in degrees for every frame at once.
+
+    Args:
+        landmarks (np.ndarray): (frames, 33, 4) landmark array; frames without a pose are NaN.
+        feature_names (list): Angle columns in the order the model expects.
+
+    Returns:
+        np.ndarray: (frames, len(feature_names)) angles; NaN rows for frames without a pose.
+    """
+    triples = [parse_angle_feature(name) for name in feature_names]
+    ends_a = joint_positions(landmarks, [a for a, _, _ in triples])
+    vertices = joint_positions(landmarks, [b for _, b, _ in triples])
+    ends_c = joint_positions(landmarks, [c for _, _, c in triples])
+
+    ba = ends_a - vertices
+    bc = ends_c - vertices
+    norms = np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosines = np.einsum("fjk,fjk->fj", ba, bc) / norms
+    # Coincident joints give a zero-length limb; call that a closed angle rather than NaN
+    cosines[norms == 0] = 1.0
+    return np.degrees(np.arccos(np.clip(cosines, -1.0, 1.0)))
+
+
+def classify_frames(model, landmarks):
+    """
+    Classify every frame that has a pose with one batched predict_proba call.
+
+    Args:
+        model: Fitted classifier trained on angle columns (``feature_names_in_`` is honoured).
+        landmarks (np.ndarray): (frames, 33, 4) landmark array.
+
+    Returns:
+        tuple: (labels, confidences, detected) where labels and confidences cover the
+        detected frames only and detected is a boolean mask over all frames.
+    """
+    feature_names = list(getattr(model, "feature_names_in_", DEFAULT_ANGLE_FEATURES))
+    features = angle_features(landmarks, feature_names)
+    detected = ~np.isnan(features).any(axis=1)
+    if not detected.any():
+        return np.array([], dtype=object), np.array([], dtype=np.float64), detected
+
+    frame_features = pd.DataFrame(features[detected], columns=feature_names)
+    probabilities = model.predict_proba(frame_features)
+    best = probabilities.argmax(axis=1)
+    return model.classes_[best], probabilities[np.arange(len(best)), best], detected
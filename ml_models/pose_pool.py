@@ -0,0 +1,115 @@
+"""
+Pool of long-lived MediaPipe Pose estimators.
+
+Building a Pose graph loads its TFLite models and starts calculator threads,
+which costs far more than processing a frame. Estimators are created on first
+use, reset between videos so tracking state does not leak from one upload to
+the next, and reused for the life of the process. A media job worker runs one
+video at a time, so each worker process ends up holding a single estimator.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import mediapipe as mp
+    MEDIAPIPE_AVAILABLE = True
+except ImportError:
+    mp = None
+    MEDIAPIPE_AVAILABLE = False
+
+# 0 (lite), 1 (full) or 2 (heavy) pose landmark model
+POSE_MODEL_COMPLEXITY = int(os.getenv("POSE_MODEL_COMPLEXITY", "1"))
+
+
+def create_pose_estimator():
+    """Build a MediaPipe Pose estimator for video (tracking) input."""
+    if mp is None:
+        raise ImportError("mediapipe is not installed")
+    return mp.solutions.pose.Pose(static_image_mode=False, model_complexity=POSE_MODEL_COMPLEXITY)
+
+
+class PosePool:
+    def __init__(self, factory=None, max_idle: int = 4):
+        """
+        Args:
+            factory (callable): Returns a new estimator; defaults to create_pose_estimator.
+            max_idle (int): Idle estimators kept for reuse; extras are closed when returned.
+        """
+        self.factory = factory or create_pose_estimator
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self._idle = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self):
+        """Borrow an estimator for one video; it is reset and returned to the pool afterwards."""
+        estimator = None
+        with self._lock:
+            if self._idle:
+                estimator = self._idle.pop()
+                self.reused += 1
+        if estimator is None:
+            estimator = self.factory()
+            with self._lock:
+                self.created += 1
+
+        healthy = False
+        try:
+            yield estimator
+            healthy = True
+        finally:
+            self._release(estimator, healthy)
+
+    def close(self):
+        """Close every idle estimator."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for estimator in idle:
+            _close(estimator)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"created": self.created, "reused": self.reused, "idle": len(self._idle)}
+
+    def _release(self, estimator, healthy: bool):
+        if healthy:
+            try:
+                # Drop the landmark tracking carried over from the previous video
+                reset = getattr(estimator, "reset", None)
+                if reset is not None:
+                    reset()
+            except Exception as e:
+                logging.error(f"Error resetting pose estimator: {str(e)}")
+                healthy = False
+
+        if healthy:
+            with self._lock:
+                if len(self._idle) < self.max_idle:
+                    self._idle.append(estimator)
+                    return
+        # A failed estimator may be in a bad state, and a full pool needs no more
+        _close(estimator)
+
+
+def _close(estimator):
+    try:
+        estimator.close()
+    except Exception as e:
+        logging.error(f"Error closing pose estimator: {str(e)}")
+
+
+def pose_model_version() -> str:
+    """Identify the landmark model, so results from a different model are not mixed up."""
+    mediapipe_version = getattr(mp, "__version__", "none")
+    return f"mediapipe-{mediapipe_version}-c{POSE_MODEL_COMPLEXITY}"
+
+
+# Shared pool for this process
+pose_pool = PosePool()
+atexit.register(pose_pool.close)
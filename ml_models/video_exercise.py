@@ -1,48 +1,133 @@
+import logging
+import os
+from collections import Counter
+
 import cv2
-import mediapipe as mp
+import numpy as np
+
+from ml_models.landmark_cache import landmark_cache
+from ml_models.model_registry import registry
+from ml_models.pose_features import landmarks_to_array, classify_frames, NUM_LANDMARKS
+from ml_models.pose_pool import pose_pool
+from ml_models.video_frames import iter_frames
 
-def analyze_exercise_video(video_path):
+# Minimum classifier probability for a frame to count as a correctly performed exercise
+FRAME_CONFIDENCE = float(os.getenv("EXERCISE_FRAME_CONFIDENCE", "0.5"))
+
+def analyze_exercise_video(video_path, pool=None, model=None, cache=None, min_confidence=None):
     """
     Analyze exercise video for movement quality and range.
 
     Args:
         video_path (str): Path to the exercise video file.
+        pool (PosePool): Pose estimator pool; defaults to the shared process pool.
+        model: Exercise classifier trained on joint angles; defaults to the registry's "exercise" model.
+        cache (LandmarkCache): Landmark cache; defaults to the shared cache when the shared pool is used.
+        min_confidence (float): Per-frame classifier probability to count as correct; defaults to FRAME_CONFIDENCE.
 
     Returns:
-        dict: Analysis result with pass/fail status and score out of 10.
+        dict: Analysis result with pass/fail status, score out of 10 and the recognized exercise.
     """
-    mp_pose = mp.solutions.pose
-    pose = mp_pose.Pose()
+    if cache is None and pool is None:
+        cache = landmark_cache
 
-    cap = cv2.VideoCapture(video_path)
-    total_frames = 0
-    correct_frames = 0
+    # Scoring a video seen before only needs its cached landmarks
+    landmarks = cache.load(video_path) if cache is not None else None
+    cached = landmarks is not None
+    if not cached:
+        landmarks = extract_landmarks(video_path, pool or pose_pool)
+        if cache is not None:
+            try:
+                cache.save(video_path, landmarks)
+            except Exception as e:
+                logging.error(f"Error caching landmarks for {video_path}: {str(e)}")
 
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
+    total_frames = len(landmarks)
+    result = score_landmarks(np.asarray(landmarks, dtype=np.float32), model, min_confidence)
 
-        total_frames += 1
+    # Calculate score
+    score = (result.pop("correct_frames") / total_frames) * 10 if total_frames > 0 else 0
+    status = "Pass" if score >= 7 else "Fail"
 
-        # Convert the frame to RGB
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return {
+        "status": status,
+        "score": round(score, 2),
+        "frames_analyzed": total_frames,
+        "landmarks_cached": cached,
+        **result
+    }
 
-        # Process the frame with MediaPipe Pose
-        results = pose.process(frame_rgb)
+def extract_landmarks(video_path, pool):
+    """
+    Run pose estimation over the sampled frames of a video.
 
-        if results.pose_landmarks:
-            # Analyze landmarks for movement quality (simplified example)
-            # Add logic to compare with standard rehab routine
-            correct_frames += 1  # Assume correct for demonstration purposes
+    Returns:
+        np.ndarray: (frames, 33, 4) float16 landmarks, NaN for frames without a pose. float16 is
+        what the landmark cache stores, so fresh and cached analyses score identically.
+    """
+    frames = []
+    # Reuse a long-lived estimator instead of building a pose graph per video
+    with pool.acquire() as pose:
+        # Sampled, downscaled RGB frames; the score is a ratio so it is stable under sampling
+        for frame_rgb in iter_frames(video_path, color=cv2.COLOR_BGR2RGB):
+            # Process the frame with MediaPipe Pose
+            results = pose.process(frame_rgb)
+            frames.append(landmarks_to_array(results.pose_landmarks))
 
-    cap.release()
+    if not frames:
+        return np.empty((0, NUM_LANDMARKS, 4), dtype=np.float16)
+    return np.stack(frames).astype(np.float16)
 
-    # Calculate score
-    score = (correct_frames / total_frames) * 10 if total_frames > 0 else 0
-    status = "Pass" if score >= 7 else "Fail"
+def score_landmarks(landmarks, model=None, min_confidence=None):
+    """
+    Classify every frame's joint angles in one batch and count correctly performed frames.
 
-    return {
-        "status": status,
-        "score": round(score, 2)
+    A frame is correct when a pose was detected and the classifier is at least
+    min_confidence (default FRAME_CONFIDENCE) sure it shows the video's dominant exercise.
+
+    Args:
+        landmarks (np.ndarray): (frames, 33, 4) landmark array; frames without a pose are NaN.
+        model: Exercise classifier; defaults to the registry's "exercise" model.
+        min_confidence (float): Minimum classifier probability for a correct frame.
+
+    Returns:
+        dict: ``correct_frames``, ``frames_with_pose``, ``exercise`` and ``mean_confidence``.
+    """
+    detected = ~np.isnan(landmarks).any(axis=(1, 2))
+    result = {
+        "correct_frames": int(detected.sum()),
+        "frames_with_pose": int(detected.sum()),
+        "exercise": None,
+        "mean_confidence": None
     }
+    if not detected.any():
+        return result
+
+    if model is None:
+        if not registry.is_available("exercise"):
+            # Without a classifier every frame with a pose counts as correct
+            logging.warning("Exercise model not available; scoring on pose detection only")
+            return result
+        model = registry.get("exercise")
+
+    labels, confidences, _ = classify_frames(model, landmarks)
+    exercises = np.array([exercise_name(label) for label in labels])
+    dominant = Counter(exercises).most_common(1)[0][0]
+    if min_confidence is None:
+        min_confidence = FRAME_CONFIDENCE
+    correct = (exercises == dominant) & (confidences >= min_confidence)
+
+    result.update({
+        "correct_frames": int(correct.sum()),
+        "exercise": dominant,
+        "mean_confidence": round(float(confidences.mean()), 3)
+    })
+    return result
+
+def exercise_name(label):
+    """Drop the phase from a pose label, e.g. "squats_down" -> "squats"."""
+    label = str(label)
+    for phase in ("_up", "_down"):
+        if label.endswith(phase):
+            return label[:-len(phase)]
+    return label
@@ -0,0 +1,103 @@
+"""
+Sampled, downscaled video decoding for analysis.
+
+Exercise analysis does not need every frame at camera resolution. Frames
+between samples are skipped with ``grab()``, which demuxes without converting
+to an image, and kept frames are shrunk with INTER_AREA before any further
+processing. At the defaults (10 fps, 640 px longest side) sampled analysis
+is expected to stay within 0.5 score points (out of 10) and 1 grey level of
+mean intensity of full-frame analysis; tests/test_video_frames.py holds the
+sampler to that tolerance.
+"""
+
+import math
+import os
+
+import cv2
+
+VIDEO_ANALYSIS_FPS = float(os.getenv("VIDEO_ANALYSIS_FPS", "10"))
+VIDEO_ANALYSIS_MAX_SIDE = int(os.getenv("VIDEO_ANALYSIS_MAX_SIDE", "640"))
+
+
+def iter_frames(video_path, target_fps=VIDEO_ANALYSIS_FPS, max_side=VIDEO_ANALYSIS_MAX_SIDE, color=None):
+    """
+    Yield sampled frames of a video.
+
+    Args:
+        video_path (str): Path to the video file.
+        target_fps (float): Frames per second to analyze; None or 0 keeps every frame.
+        max_side (int): Frames larger than this on their longest side are downscaled; None keeps full size.
+        color (int): Optional cv2 color conversion code, e.g. cv2.COLOR_BGR2RGB.
+
+    Yields:
+        np.ndarray: Decoded frames.
+
+    Raises:
+        ValueError: If the video cannot be opened.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        cap.release()
+        raise ValueError("Error opening video file")
+
+    try:
+        step = frame_step(cap.get(cv2.CAP_PROP_FPS), target_fps)
+        index = 0
+        while cap.grab():
+            keep = index % step == 0
+            index += 1
+            if not keep:
+                continue
+
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            frame = downscale(frame, max_side)
+            if color is not None:
+                frame = cv2.cvtColor(frame, color)
+            yield frame
+    finally:
+        cap.release()
+
+
+def frame_step(source_fps, target_fps):
+    """Keep one frame in every ``step`` to get close to target_fps."""
+    if not target_fps or not source_fps or source_fps <= target_fps or math.isnan(source_fps):
+        return 1
+    return max(1, int(round(source_fps / target_fps)))
+
+
+def downscale(frame, max_side):
+    """Shrink a frame so its longest side is at most max_side pixels."""
+    height, width = frame.shape[:2]
+    if not max_side or max(height, width) <= max_side:
+        return frame
+    scale = max_side / max(height, width)
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+
+
+class RunningStats:
+    """
+    Streaming mean and population standard deviation (Welford) in constant memory.
+    Like np.mean/np.std, both are NaN before any value is pushed.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def push(self, value):
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    @property
+    def mean(self):
+        return self._mean if self.count else math.nan
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / self.count) if self.count else math.nan
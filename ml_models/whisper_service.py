@@ -0,0 +1,112 @@
+"""
+Resident Whisper transcription service.
+
+The Whisper model is loaded once per process and kept in memory. Each audio
+file is transcribed once, with segment and word timings, and the result is
+cached by file identity so the transcription and the cognition metrics for an
+upload share a single pass over the audio.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import whisper
+    WHISPER_AVAILABLE = True
+except ImportError:
+    whisper = None
+    WHISPER_AVAILABLE = False
+
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "base")
+
+
+class WhisperService:
+    def __init__(self, model_name: str = WHISPER_MODEL_NAME, model_loader=None, cache_size: int = 32):
+        """
+        Args:
+            model_name (str): Whisper model size, e.g. "base".
+            model_loader (callable): Optional ``loader(model_name)``; defaults to whisper.load_model.
+            cache_size (int): Number of recent transcripts kept in memory.
+        """
+        self.model_name = model_name
+        self.model_loader = model_loader or _load_whisper_model
+        self.cache_size = cache_size
+        self.load_seconds = None
+        self._model = None
+        self._cache = OrderedDict()
+        self._load_lock = threading.Lock()
+        self._cache_lock = threading.Lock()
+        # Transcriptions are serialized: one warm model, one pass at a time
+        self._transcribe_lock = threading.Lock()
+
+    def get_model(self):
+        """Return the resident Whisper model, loading it on first use."""
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    started = time.perf_counter()
+                    self._model = self.model_loader(self.model_name)
+                    self.load_seconds = round(time.perf_counter() - started, 2)
+                    logging.info(f"Loaded Whisper model '{self.model_name}' in {self.load_seconds}s")
+        return self._model
+
+    def transcribe(self, file_path: str) -> dict:
+        """
+        Transcribe an audio file once, with segment and word timings.
+
+        Args:
+            file_path (str): Path to the audio file (.wav, .mp3, ...).
+
+        Returns:
+            dict: Whisper result with ``text``, ``segments`` (each with ``words``) and ``language``.
+        """
+        key = _file_key(file_path)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
+        model = self.get_model()
+        with self._transcribe_lock:
+            # Another request may have transcribed the same file while we waited
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
+            result = model.transcribe(file_path, word_timestamps=True)
+
+            with self._cache_lock:
+                self._cache[key] = result
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return result
+
+    def _cached(self, key):
+        with self._cache_lock:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+            return result
+
+
+def _file_key(file_path: str):
+    # A re-upload under the same name changes size or mtime and misses the cache
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+
+def _load_whisper_model(model_name: str):
+    if whisper is None:
+        raise ImportError("openai-whisper is not installed")
+    return whisper.load_model(model_name)
+
+
+# Shared service for this process
+whisper_service = WhisperService()
+
+
+def preload_if_configured():
+    """Load the model now if WHISPER_PRELOAD is set, so the first upload does not pay for it."""
+    if WHISPER_AVAILABLE and os.getenv("WHISPER_PRELOAD", "").lower() in ("1", "true", "yes"):
+        whisper_service.get_model()
@@ -0,0 +1,114 @@
+import asyncio
+import json
+import time
+import httpx
+import pytest
+from openai import OpenAI, AsyncOpenAI
+from backend.utils import openai_helper
+from backend.utils.circuit_breaker import openai_breaker
+from backend.utils.llm_cache import llm_cache
+from backend.utils.token_quota import token_quota
+
+def completion_body(content, model="gpt-3.5-turbo", usage=None):
+    body = {"id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": model,
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}]}
+    if usage:
+        body["usage"] = usage
+    return body
+
+class FakeOpenAI:
+    """
+    Scriptable OpenAI upstream behind the shared clients of openai_helper.
+
+    reply and delay are values or functions of the request body. statuses are
+    answered in turn and the last one repeats. Streams send chunks (by default
+    the whole reply) chunk_delay seconds apart and record their closing in closed.
+    """
+
+    def __init__(self, monkeypatch):
+        self.monkeypatch = monkeypatch
+        self.requests = []
+        self.reply = "Rest well."
+        self.delay = 0
+        self.statuses = [200]
+        self.usage = None
+        self.chunks = None
+        self.chunk_delay = 0
+        self.closed = []
+
+    def install(self, max_retries=0, event_hooks=None):
+        self.monkeypatch.setattr(openai_helper, "_client", OpenAI(
+            api_key="sk-test", max_retries=max_retries, http_client=httpx.Client(transport=httpx.MockTransport(self._handle))))
+        self.monkeypatch.setattr(openai_helper, "_async_client", AsyncOpenAI(
+            api_key="sk-test", max_retries=max_retries, http_client=httpx.AsyncClient(
+                transport=httpx.MockTransport(self._ahandle), event_hooks=event_hooks or {})))
+        return self
+
+    @property
+    def bodies(self):
+        return [json.loads(request.content) for request in self.requests]
+
+    def _receive(self, request):
+        self.requests.append(request)
+        body = json.loads(request.content)
+        status = self.statuses.pop(0) if len(self.statuses) > 1 else self.statuses[0]
+        delay = self.delay(body) if callable(self.delay) else self.delay
+        return body, status, delay
+
+    def _respond(self, body, status):
+        if status != 200:
+            return httpx.Response(status, headers={"retry-after-ms": "1"}, json={"error": {"message": "upstream error"}})
+        reply = self.reply(body) if callable(self.reply) else self.reply
+        if body.get("stream"):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"},
+                                  content=self._stream(body["model"], self.chunks or [reply]))
+        return httpx.Response(200, json=completion_body(reply, body["model"], self.usage))
+
+    def _handle(self, request):
+        body, status, delay = self._receive(request)
+        time.sleep(delay)
+        return self._respond(body, status)
+
+    async def _ahandle(self, request):
+        body, status, delay = self._receive(request)
+        await asyncio.sleep(delay)
+        return self._respond(body, status)
+
+    async def _stream(self, model, chunks):
+        try:
+            for text in chunks:
+                await asyncio.sleep(self.chunk_delay)
+                chunk = {"id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": model,
+                         "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n".encode()
+            yield b"data: [DONE]\n\n"
+        finally:
+            self.closed.append(True)
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    """Fake OpenAI answering "Rest well." to every completion; set its attributes to script other answers."""
+    return FakeOpenAI(monkeypatch).install()
+
+@pytest.fixture(autouse=True)
+def closed_openai_breaker():
+    """Tests that fake OpenAI failures must not trip the shared breaker for the tests after them."""
+    openai_breaker.reset()
+    yield
+    openai_breaker.reset()
+
+@pytest.fixture(autouse=True)
+def full_token_quotas():
+    """Every test client shares one address, so tests must not spend each other's token quota."""
+    token_quota.reset()
+    yield
+    token_quota.reset()
+
+@pytest.fixture(autouse=True)
+def memory_only_llm_cache(monkeypatch):
+    """Keep the prompts of the tests off disk and their cached answers out of later tests."""
+    monkeypatch.setattr(llm_cache, "disk_path", None)
+    monkeypatch.setattr(llm_cache, "_db", None)
+    llm_cache.clear()
+    yield
+    llm_cache.clear()
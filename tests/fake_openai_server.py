@@ -0,0 +1,138 @@
+"""
+Offline stand-in for the OpenAI chat completions API, for load tests.
+
+Serves ``POST /v1/chat/completions`` (plain and ``stream=true``) with
+configurable latency, token streaming, error rate and rate-limit responses, so
+the LLM routes can be exercised at volume without the paid API. Point the
+backend at it with ``OPENAI_BASE_URL=http://127.0.0.1:8089/v1``.
+
+Run:
+    python tests/fake_openai_server.py --port 8089 --latency lognormal:0.8:0.4 \\
+        --token-delay 0.02 --error-rate 0.01 --rate-limit-rate 0.02
+
+Latency specs: ``fixed:SECONDS``, ``uniform:LOW:HIGH`` or
+``lognormal:MEDIAN:SIGMA`` (median in seconds, sigma of the underlying normal).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+WORDS = ("Gentle daily walks help rebuild strength and balance. Practice speech exercises "
+         "for ten minutes twice a day. Monitor blood pressure every morning. Ask a family "
+         "member to join the exercises. Contact your doctor if symptoms get worse.").split()
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a function returning one sample in seconds."""
+    kind, *params = spec.split(":")
+    values = [float(p) for p in params]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma)
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+@dataclass
+class FakeOpenAIConfig:
+    latency: str = "fixed:0.5"        # time to the first token
+    token_delay: float = 0.02         # between streamed tokens
+    error_rate: float = 0.0           # share of requests answered with 500
+    rate_limit_rate: float = 0.0      # share of requests answered with 429
+    retry_after: float = 1.0
+    seed: int = None
+    counts: dict = field(default_factory=lambda: {"requests": 0, "streams": 0, "errors": 0, "rate_limited": 0})
+
+
+def create_app(config: FakeOpenAIConfig = None) -> FastAPI:
+    config = config or FakeOpenAIConfig()
+    sample_latency = parse_latency(config.latency)
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Fake OpenAI")
+    app.state.config = config
+
+    def completion_text(max_tokens):
+        # About one token per word; stay within the requested limit
+        return " ".join(rng.choice(WORDS) for _ in range(max(1, min(max_tokens, 400) * 3 // 4)))
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        config.counts["requests"] += 1
+        roll = rng.random()
+        if roll < config.rate_limit_rate:
+            config.counts["rate_limited"] += 1
+            return JSONResponse(status_code=429, headers={"retry-after": str(config.retry_after)}, content={
+                "error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}})
+        if roll < config.rate_limit_rate + config.error_rate:
+            config.counts["errors"] += 1
+            return JSONResponse(status_code=500, content={
+                "error": {"message": "The server had an error while processing your request.", "type": "server_error"}})
+
+        model = body.get("model", "gpt-3.5-turbo")
+        text = completion_text(int(body.get("max_tokens") or 256))
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        await asyncio.sleep(sample_latency())
+
+        if not body.get("stream"):
+            prompt_tokens = sum(len(str(m.get("content", ""))) // 4 for m in body.get("messages", []))
+            completion_tokens = len(text.split())
+            return {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": text}}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        config.counts["streams"] += 1
+
+        async def chunks():
+            for i, word in enumerate(text.split()):
+                if i:
+                    await asyncio.sleep(config.token_delay)
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                         "model": model, "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word},
+                                                      "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def stats():
+        return config.counts
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline fake OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0.5", help="fixed:S, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="seconds between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answered with 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FakeOpenAIConfig(latency=args.latency, token_delay=args.token_delay, error_rate=args.error_rate,
+                              rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
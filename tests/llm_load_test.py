@@ -0,0 +1,276 @@
+"""
+Load test of the LLM routes against the offline fake OpenAI server.
+
+Starts tests/fake_openai_server.py and the real FastAPI app, each under uvicorn
+in its own thread, points the app's OpenAI client at the fake server, then
+drives each LLM route with concurrent clients over HTTP. Reports per route:
+throughput, p50/p95/p99 latency, time to first byte for streaming routes,
+status codes, and the event-loop lag of the app's loop while the route was
+under load.
+
+Run:
+    python tests/llm_load_test.py --concurrency 20 --requests 200 \\
+        --latency lognormal:0.8:0.4 --error-rate 0.01
+
+The LLM response cache is disabled unless --cache is given, so every request
+reaches the fake server. Results can also be written as JSON with --json.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+# Add the project root to the path so the backend can be imported
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+sys.path.append(os.path.dirname(__file__))
+
+import httpx
+import uvicorn
+
+
+def movement_results():
+    upper, lower, balance = random.randint(0, 15), random.randint(0, 12), random.randint(0, 12)
+    return {"upper_limb_score": upper, "lower_limb_score": lower, "balance_score": balance,
+            "total_score": upper + lower + balance, "overall_level": random.choice(["Poor", "Fair", "Good"])}
+
+
+FAQ_QUESTIONS = ["How often should I check my blood pressure?", "What is normal blood pressure?",
+                 "How can I improve my balance after a stroke?", "¿Cómo mido la presión arterial en casa?",
+                 "Как часто нужно делать упражнения?", "PHQ-9 testi nima?"]
+
+
+# Route name -> (path, request body factory, streams)
+ROUTES = {
+    "patient-chat": ("/chat/patient-chat", lambda: {
+        "messages": [{"role": "user", "content": f"What does my assessment score of {random.randint(0, 39)} mean?"}],
+        "patient_context": {"assessmentType": "movement", "assessmentResults": movement_results()},
+    }, False),
+    "patient-chat-stream": ("/chat/patient-chat/stream", lambda: {
+        "messages": [{"role": "user", "content": f"How can I improve my balance score of {random.randint(0, 12)}?"}],
+        "patient_context": {"assessmentType": "movement", "assessmentResults": movement_results()},
+    }, True),
+    # Common questions answered from the local FAQ corpus, without the model
+    "patient-chat-faq": ("/chat/patient-chat", lambda: {
+        "messages": [{"role": "user", "content": random.choice(FAQ_QUESTIONS)}],
+    }, False),
+    "rehabilitation-analysis": ("/openai/rehabilitation/analysis", lambda: {
+        "assessment_type": "movement", "assessment_data": movement_results(),
+    }, False),
+    "assessment-advice": ("/chat/assessment-advice", lambda: {
+        "assessment_type": "movement", "results": movement_results(),
+    }, False),
+}
+
+
+class ServerThread:
+    """Run an ASGI app under uvicorn on a free local port in a background thread."""
+
+    def __init__(self, app):
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+        self.loop = None
+        self.thread = threading.Thread(target=lambda: asyncio.run(self._serve()), daemon=True)
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        await self.server.serve()
+
+    def start(self) -> str:
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.01)
+        port = self.server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+class LoopLagMonitor:
+    """Samples how late a short sleep wakes up on a loop; lag means the loop was blocked."""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.samples = []
+        self._lock = threading.Lock()
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            with self._lock:
+                self.samples.append(time.perf_counter() - started - self.interval)
+
+    def take(self):
+        with self._lock:
+            samples, self.samples = self.samples, []
+        return samples
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile; None for no values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+async def send(client, path, body, streams):
+    """One request; returns (status, seconds, seconds to first byte)."""
+    started = time.perf_counter()
+    first_byte = None
+    try:
+        async with client.stream("POST", path, json=body) as response:
+            async for _ in response.aiter_bytes():
+                if first_byte is None:
+                    first_byte = time.perf_counter() - started
+                if not streams:
+                    continue
+        return response.status_code, time.perf_counter() - started, first_byte
+    except httpx.HTTPError as e:
+        return type(e).__name__, time.perf_counter() - started, first_byte
+
+
+async def drive_route(base_url, name, concurrency, requests, warmup):
+    path, make_body, streams = ROUTES[name]
+    results = []
+    remaining = [requests]
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=120,
+                                 limits=httpx.Limits(max_connections=concurrency)) as client:
+        for _ in range(warmup):
+            await send(client, path, make_body(), streams)
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                results.append(await send(client, path, make_body(), streams))
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+    return results, elapsed
+
+
+def summarize(name, results, elapsed, lag, streams):
+    latencies = [seconds for status, seconds, _ in results if status == 200]
+    statuses = {}
+    for status, _, _ in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    summary = {
+        "route": name,
+        "requests": len(results),
+        "ok": len(latencies),
+        "statuses": statuses,
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else None,
+        "latency_ms": {f"p{p}": ms(percentile(latencies, p)) for p in (50, 95, 99)},
+        "loop_lag_ms": {"p50": ms(percentile(lag, 50)), "p99": ms(percentile(lag, 99)), "max": ms(max(lag) if lag else None)},
+    }
+    if streams:
+        first_bytes = [ttfb for status, _, ttfb in results if status == 200 and ttfb is not None]
+        summary["ttfb_ms"] = {f"p{p}": ms(percentile(first_bytes, p)) for p in (50, 95, 99)}
+    return summary
+
+
+def print_report(summaries):
+    header = f"{'route':<26}{'reqs':>6}{'ok':>6}{'rps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'ttfb50':>9}{'lag99':>8}{'lagmax':>8}  statuses"
+    print(header)
+    print("-" * len(header))
+    for s in summaries:
+        lat, lag, ttfb = s["latency_ms"], s["loop_lag_ms"], s.get("ttfb_ms", {})
+        cells = [lat["p50"], lat["p95"], lat["p99"], ttfb.get("p50"), lag["p99"], lag["max"]]
+        cells = [f"{c:.0f}" if c is not None else "-" for c in cells]
+        print(f"{s['route']:<26}{s['requests']:>6}{s['ok']:>6}{s['throughput_rps'] or 0:>8.1f}"
+              f"{cells[0]:>9}{cells[1]:>9}{cells[2]:>9}{cells[3]:>9}{cells[4]:>8}{cells[5]:>8}  {s['statuses']}")
+    print("Latencies in ms; lag is the app's event-loop lag while the route was under load.")
+
+
+def configure_backend(openai_url, cache):
+    """Environment for the backend; must run before it is imported."""
+    os.environ["OPENAI_BASE_URL"] = f"{openai_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "sk-load-test"
+    # All the load comes from one address; a token quota would turn most of it into 429s
+    os.environ.setdefault("TOKEN_QUOTA_CAPACITY", "0")
+    if not cache:
+        os.environ["LLM_CACHE_PATH"] = ""
+        os.environ["LLM_CACHE_TTL"] = "0"
+
+
+def run(args):
+    from fake_openai_server import FakeOpenAIConfig, create_app as create_fake_openai
+
+    fake = None
+    openai_url = args.openai_url
+    if openai_url is None:
+        fake = ServerThread(create_fake_openai(FakeOpenAIConfig(
+            latency=args.latency, token_delay=args.token_delay, error_rate=args.error_rate,
+            rate_limit_rate=args.rate_limit_rate, seed=args.seed)))
+        openai_url = fake.start()
+    configure_backend(openai_url, args.cache)
+
+    import logging
+    from backend.main import app
+    from backend.utils.circuit_breaker import openai_breaker
+    from backend.utils.bulkhead import bulkheads
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    server = ServerThread(app)
+    base_url = server.start()
+    monitor = LoopLagMonitor()
+    asyncio.run_coroutine_threadsafe(monitor.run(), server.loop)
+
+    summaries = []
+    try:
+        for name in args.routes:
+            monitor.take()
+            results, elapsed = asyncio.run(drive_route(base_url, name, args.concurrency, args.requests, args.warmup))
+            summaries.append(summarize(name, results, elapsed, monitor.take(), ROUTES[name][2]))
+        # Upstream errors surface as 200s with fallback text, so report what the fake server did
+        upstream = httpx.get(f"{openai_url}/stats").json()
+    finally:
+        server.stop()
+        if fake is not None:
+            fake.stop()
+
+    print_report(summaries)
+    print(f"Upstream: {upstream}")
+    print(f"Circuit breaker: {openai_breaker.stats()['state']}; "
+          f"bulkhead rejections: { {name: b.stats()['rejected'] for name, b in bulkheads.items()} }")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"config": vars(args), "routes": summaries, "upstream": upstream}, f, indent=2)
+    return summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test the LLM routes against a fake OpenAI server")
+    parser.add_argument("--routes", nargs="+", default=list(ROUTES), choices=list(ROUTES))
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests per route")
+    parser.add_argument("--openai-url", default=None, help="use an already running fake server instead of starting one")
+    parser.add_argument("--latency", default="lognormal:0.5:0.4")
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--cache", action="store_true", help="keep the LLM response cache enabled")
+    parser.add_argument("--json", default=None, help="also write the results to this file")
+    parser.add_argument("--verbose", action="store_true", help="keep the backend's INFO logs")
+    return run(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
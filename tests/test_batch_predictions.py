@@ -0,0 +1,89 @@
+import joblib
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from backend.api.nihss import router as nihss_router, calculate_nihss_severity, calculate_nihss_severity_batch
+from backend.api.phq9 import router as phq9_router
+from ml_models.model_registry import registry
+from ml_models.nihss_model import predict_nihss_severity, predict_nihss_severity_batch
+
+app = FastAPI()
+app.include_router(nihss_router)
+app.include_router(phq9_router, prefix="/phq")
+
+client = TestClient(app)
+
+@pytest.fixture
+def phq_model(tmp_path):
+    X = np.random.RandomState(0).randint(0, 4, size=(300, 9))
+    model = RandomForestClassifier(n_estimators=10, random_state=42).fit(X, X.sum(axis=1))
+    joblib.dump(model, tmp_path / "phq_model.pkl")
+
+    saved_entries = dict(registry._entries)
+    registry.register("phq", str(tmp_path / "phq_model.pkl"))
+    registry.register("phq_lookup", str(tmp_path / "phq_lookup.joblib"))
+    yield model
+    registry._entries.clear()
+    registry._entries.update(saved_entries)
+
+def test_nihss_batch_matches_scalar_logic():
+    totals = np.arange(-2, 50)
+    rows = np.zeros((len(totals), 11), dtype=int)
+    rows[:, 0] = totals
+
+    batch_totals, severities = predict_nihss_severity_batch(rows)
+
+    assert batch_totals.tolist() == totals.tolist()
+    assert severities.tolist() == [predict_nihss_severity({"nihs_1": int(t)}) for t in totals]
+    assert calculate_nihss_severity_batch(totals).tolist() == [calculate_nihss_severity(int(t)) for t in totals]
+
+def test_nihss_analyze_batch():
+    payload = {f"nihs_{i}": [0, 1, 2] for i in range(1, 12)}
+    response = client.post("/nihss/analyze-batch", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 3
+    assert data["total_score"] == [0, 11, 22]
+    assert data["severity"] == ["No Stroke Symptoms", "Moderate Stroke", "Severe Stroke"]
+    assert set(data["recommendations"]) == set(data["severity"])
+
+def test_nihss_analyze_batch_rejects_ragged_columns():
+    payload = {f"nihs_{i}": [0, 1] for i in range(1, 12)}
+    payload["nihs_5"] = [0]
+    response = client.post("/nihss/analyze-batch", json=payload)
+    assert response.status_code == 422
+
+def test_nihss_analyze_batch_reports_invalid_rows():
+    payload = {f"nihs_{i}": [0, 1, 2] for i in range(1, 12)}
+    payload["nihs_3"] = [0, -1, 2]
+    response = client.post("/nihss/analyze-batch", json=payload)
+    assert response.status_code == 422
+    assert response.json()["detail"]["rows"] == [1]
+
+def test_phq9_predict_batch_matches_model(phq_model):
+    rows = np.random.RandomState(1).randint(0, 4, size=(200, 9))
+    payload = {f"phq{i + 1}": rows[:, i].tolist() for i in range(9)}
+
+    response = client.post("/phq/phq9/predict-batch", json=payload)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["count"] == 200
+    assert data["predictions"] == phq_model.predict(rows).tolist()
+
+def test_phq9_predict_batch_rejects_out_of_range_answers(phq_model):
+    payload = {f"phq{i}": [1, 2] for i in range(1, 10)}
+    payload["phq4"] = [1, 4]
+    response = client.post("/phq/phq9/predict-batch", json=payload)
+    assert response.status_code == 422
+    assert response.json()["detail"]["rows"] == [1]
+
+def test_phq9_predict_single_goes_through_batcher(phq_model):
+    payload = {f"phq{i}": 2 for i in range(1, 10)}
+    response = client.post("/phq/phq9/predict", json=payload)
+
+    assert response.status_code == 200
+    assert response.json()["prediction"] == phq_model.predict(np.full((1, 9), 2)).tolist()[0]
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import blood_pressure, openai_integration, patient_chat
+from backend.utils.bulkhead import Bulkhead, BulkheadFullError
+
+def test_calls_beyond_the_queue_are_refused():
+    bulkhead = Bulkhead("test", max_concurrent=2, max_queue=1, queue_timeout=1)
+    order = []
+
+    async def call(name, release):
+        async with bulkhead.acquire():
+            order.append(name)
+            await release.wait()
+
+    async def run():
+        release = asyncio.Event()
+        running = [asyncio.ensure_future(call(name, release)) for name in ("a", "b", "queued")]
+        await asyncio.sleep(0.01)
+        assert bulkhead.stats()["active"] == 2 and bulkhead.stats()["queued"] == 1
+        assert bulkhead.saturated()
+        with pytest.raises(BulkheadFullError):
+            await call("refused", release)
+        release.set()
+        await asyncio.gather(*running)
+
+    asyncio.run(run())
+    assert order == ["a", "b", "queued"]
+    stats = bulkhead.stats()
+    assert (stats["active"], stats["accepted"], stats["rejected"], stats["peak_active"]) == (0, 3, 1, 2)
+
+def test_waiting_calls_time_out():
+    bulkhead = Bulkhead("test", max_concurrent=1, max_queue=1, queue_timeout=0.05)
+
+    async def run():
+        async with bulkhead.acquire():
+            with pytest.raises(BulkheadFullError):
+                async with bulkhead.acquire():
+                    pass
+
+    asyncio.run(run())
+    stats = bulkhead.stats()
+    assert (stats["timed_out"], stats["queued"], stats["active"]) == (1, 0, 0)
+
+def test_cancelled_waiter_leaves_the_queue():
+    bulkhead = Bulkhead("test", max_concurrent=1, max_queue=1, queue_timeout=5)
+
+    async def wait_for_slot():
+        async with bulkhead.acquire():
+            pass
+
+    async def run():
+        async with bulkhead.acquire():
+            waiter = asyncio.ensure_future(wait_for_slot())
+            await asyncio.sleep(0.01)
+            waiter.cancel()
+            await asyncio.sleep(0.01)
+            assert bulkhead.stats()["queued"] == 0
+        async with bulkhead.acquire():
+            pass
+
+    asyncio.run(run())
+    assert bulkhead.stats()["active"] == 0
+
+def test_threads_wait_for_a_slot():
+    bulkhead = Bulkhead("test", max_concurrent=1, max_queue=4, queue_timeout=5)
+    running = []
+    peak = []
+
+    def call():
+        with bulkhead.acquire_sync():
+            running.append(True)
+            peak.append(len(running))
+            threading.Event().wait(0.02)
+            running.pop()
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 1
+    assert bulkhead.stats()["accepted"] == 4
+
+def full():
+    return Bulkhead("chat", max_concurrent=0, max_queue=0)
+
+def test_saturated_chat_is_refused_with_503(monkeypatch):
+    monkeypatch.setattr(patient_chat, "chat_bulkhead", full())
+    monkeypatch.setattr(openai_integration, "chat_bulkhead", full())
+    app = FastAPI()
+    app.include_router(patient_chat.router, prefix="/chat")
+    app.include_router(openai_integration.router, prefix="/openai")
+    client = TestClient(app)
+
+    for path in ("/chat/patient-chat", "/chat/patient-chat/stream"):
+        response = client.post(path, json={"messages": [{"role": "user", "content": "How can I sleep better?"}]})
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "5"
+    response = client.post("/openai/chat/completion", json={"messages": [{"role": "user", "content": "Hello"}]})
+    assert response.status_code == 503
+
+def test_bp_analysis_is_unaffected_by_chat_and_degrades_when_full(fake_openai, monkeypatch):
+    fake_openai.reply = "Reduce salt."
+    monkeypatch.setattr(blood_pressure, "llm_cache", None)
+    monkeypatch.setattr(patient_chat, "chat_bulkhead", full())
+    app = FastAPI()
+    app.include_router(blood_pressure.router)
+    client = TestClient(app)
+
+    response = client.post("/bp/analyze", json={"systolic": 135, "diastolic": 85})
+    assert response.status_code == 200
+    assert "Reduce salt." in response.text
+
+    monkeypatch.setattr(blood_pressure, "recommendations_bulkhead", Bulkhead("recommendations", 0, 0))
+    response = client.post("/bp/analyze", json={"systolic": 136, "diastolic": 85})
+    assert response.status_code == 200
+    assert "Unable to generate AI recommendations" in response.text
+    assert len(fake_openai.requests) == 1
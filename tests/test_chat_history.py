@@ -0,0 +1,78 @@
+from backend.api import patient_chat
+from backend.utils.chat_history import ChatHistory, compact_context, message_tokens
+
+SYSTEM = [{"role": "system", "content": "You are a helpful medical assistant."}]
+
+def conversation(turns, words=40):
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"Question {i} about my recovery. " + "detail " * words})
+        messages.append({"role": "assistant", "content": f"Answer {i} with advice. " + "advice " * words})
+    return messages
+
+def test_short_conversations_are_sent_unchanged():
+    history = conversation(2)
+    assert ChatHistory(keep_turns=6).build(SYSTEM, history) == SYSTEM + history
+
+def test_older_turns_are_folded_into_a_summary():
+    history = conversation(10)
+    messages = ChatHistory(keep_turns=4, token_budget=10000).build(SYSTEM, history)
+
+    assert messages[0] == SYSTEM[0]
+    summary = messages[1]["content"]
+    assert summary.startswith("Summary of the earlier conversation:")
+    assert "- Patient: Question 0 about my recovery." in summary
+    assert "- Assistant: Answer 7 with advice." in summary
+    assert messages[2:] == history[-4:]
+
+def test_prompt_stays_under_the_token_budget():
+    history = conversation(30)
+    chat_history = ChatHistory(keep_turns=10, token_budget=600, summary_tokens=200)
+    messages = chat_history.build(SYSTEM, history)
+
+    assert message_tokens(messages) <= 600
+    # The newest message is always kept verbatim
+    assert messages[-1] == history[-1]
+    stats = chat_history.stats()
+    assert stats["tokens_out"] < stats["tokens_in"]
+
+def test_oversized_newest_message_is_cut_to_the_budget():
+    pasted = {"role": "user", "content": "Here is my discharge letter. " + "medication dosage " * 2000}
+    messages = ChatHistory(token_budget=600).build(SYSTEM, conversation(2) + [pasted])
+
+    assert message_tokens(messages) <= 600
+    assert messages[-1]["content"].startswith("Here is my discharge letter.")
+    assert messages[-1]["content"].endswith("…")
+
+def test_running_summary_reuses_the_previous_turn():
+    history = conversation(10)
+    chat_history = ChatHistory(keep_turns=4, token_budget=10000)
+    first = chat_history.build(SYSTEM, history)
+    history += conversation(1)
+    second = chat_history.build(SYSTEM, history)
+
+    assert chat_history.stats()["summary_hits"] == 1
+    assert second[1]["content"].startswith(first[1]["content"])
+
+def test_patient_context_is_compacted():
+    context = {"age": 65, "notes": "", "assessmentResults": {"total_score": 27, "level": "Moderate"}}
+    line = compact_context(context)
+    assert line == 'Patient information: age: 65; assessmentResults: {"level":"Moderate","total_score":27}'
+    assert compact_context({"history": "x " * 5000}, max_tokens=50).endswith("…")
+    assert compact_context({}) == ""
+
+def test_patient_chat_prompt_is_compacted():
+    request = patient_chat.ChatRequest(
+        messages=[patient_chat.ChatMessage(**m) for m in conversation(20)],
+        patient_context={"age": 65},
+        language="ru",
+    )
+    messages, language_instruction = patient_chat.build_chat_messages(request)
+
+    assert language_instruction == "Please respond in Russian."
+    assert messages[0]["content"] == patient_chat.SYSTEM_MESSAGE
+    assert messages[1]["content"].startswith("Summary of the earlier conversation:")
+    # Per-request context sits right before the question, after the conversation
+    assert [m["content"] for m in messages[-3:-1]] == ["Please respond in Russian.", "Patient information: age: 65"]
+    assert messages[-1] == conversation(20)[-1]
+    assert len(messages) < 40
@@ -0,0 +1,116 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import auth, llm_api
+from backend.models.user import UserRole
+from backend.utils import openai_helper
+from backend.utils.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+MESSAGES = [{"role": "user", "content": "Blood pressure category 'Elevated'."}]
+
+def test_opens_after_consecutive_failures_and_recovers(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("backend.utils.circuit_breaker.time.monotonic", lambda: now[0])
+    breaker = CircuitBreaker("test", failure_threshold=3, latency_threshold=5, reset_timeout=10)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success(0.5)
+    assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+
+    for _ in range(3):
+        breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    now[0] += 10
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only one trial call at a time
+    assert not breaker.allow()
+    breaker.record_success(0.5)
+    assert breaker.state == CLOSED
+
+    stats = breaker.stats()
+    assert (stats["opened"], stats["rejected"], stats["failures"]) == (1, 2, 5)
+
+def test_slow_calls_count_as_failures():
+    breaker = CircuitBreaker("test", failure_threshold=2, latency_threshold=1, reset_timeout=10)
+    breaker.record_success(3)
+    breaker.record_success(3)
+    assert breaker.state == OPEN
+    assert breaker.stats()["slow_calls"] == 2
+
+def test_failed_trial_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+def test_open_breaker_answers_without_calling_upstream(fake_openai, monkeypatch):
+    fake_openai.statuses = [503]
+    monkeypatch.setattr(openai_helper, "openai_breaker", CircuitBreaker("openai", failure_threshold=2))
+
+    for i in range(5):
+        messages = [{"role": "user", "content": f"question {i}"}]
+        assert openai_helper.create_chat_completion(messages, fallback="Unavailable") == "Unavailable"
+    assert len(fake_openai.requests) == 2
+    assert openai_helper.openai_breaker.stats()["rejected"] == 3
+
+def test_invalid_requests_do_not_trip_the_breaker(fake_openai, monkeypatch):
+    fake_openai.statuses = [400]
+    monkeypatch.setattr(openai_helper, "openai_breaker", CircuitBreaker("openai", failure_threshold=1))
+
+    openai_helper.create_chat_completion(MESSAGES, fallback="Unavailable")
+    assert openai_helper.openai_breaker.state == CLOSED
+
+def test_missed_deadlines_trip_the_breaker(fake_openai, monkeypatch):
+    fake_openai.delay = 1
+    breaker = CircuitBreaker("openai", failure_threshold=2)
+    monkeypatch.setattr(openai_helper, "openai_breaker", breaker)
+
+    async def run():
+        answers = []
+        for i in range(3):
+            started = time.perf_counter()
+            answers.append(await openai_helper.acreate_chat_completion(
+                [{"role": "user", "content": f"question {i}"}], fallback="Unavailable", timeout=0.1))
+            answers.append(time.perf_counter() - started)
+        return answers
+
+    first, first_seconds, second, _, third, third_seconds = asyncio.run(run())
+    assert first == second == third == "Unavailable"
+    assert first_seconds >= 0.1
+    # Refused straight away once open
+    assert third_seconds < 0.05
+    assert breaker.state == OPEN
+
+def test_stream_falls_back_while_open(monkeypatch):
+    breaker = CircuitBreaker("openai", failure_threshold=1)
+    breaker.record_failure()
+    monkeypatch.setattr(openai_helper, "openai_breaker", breaker)
+
+    async def run():
+        return [text async for text in openai_helper.astream_chat_completion(MESSAGES, fallback="Unavailable")]
+
+    assert asyncio.run(run()) == ["Unavailable"]
+
+def test_breaker_endpoints(monkeypatch):
+    breaker = CircuitBreaker("openai", failure_threshold=1)
+    breaker.record_failure()
+    monkeypatch.setattr(llm_api, "openai_breaker", breaker)
+
+    app = FastAPI()
+    app.include_router(llm_api.router, prefix="/llm")
+    client = TestClient(app)
+
+    state = client.get("/llm/breaker").json()
+    assert state["state"] == "open" and state["retry_after"] > 0
+    # Closing the breaker sends the full load back upstream, so it is for admins only
+    assert client.post("/llm/breaker/reset").status_code == 401
+    assert breaker.stats()["state"] == "open"
+    app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(role=UserRole.ADMIN)
+    assert client.post("/llm/breaker/reset").json()["breaker"]["state"] == "closed"
@@ -0,0 +1,58 @@
+import time
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import blood_pressure, jobs_api, movement_assessment, speech_hearing_assessment
+
+app = FastAPI()
+app.include_router(blood_pressure.router)
+app.include_router(movement_assessment.router, prefix="/assessment")
+app.include_router(speech_hearing_assessment.router, prefix="/assessment")
+app.include_router(jobs_api.router, prefix="/jobs")
+
+MOVEMENT = {
+    "questions": [{"id": i, "score": 2} for i in range(1, 14)],
+    "language": "en", "patient_name": "Test", "patient_age": 65, "assessor_relationship": "self",
+}
+
+def slow_upstream(fake_openai, monkeypatch, delay=0.5):
+    fake_openai.reply = "Walk daily."
+    fake_openai.delay = delay
+    for module in (blood_pressure, movement_assessment, speech_hearing_assessment):
+        monkeypatch.setattr(module, "llm_cache", None)
+
+def test_scores_return_before_the_recommendations(fake_openai, monkeypatch):
+    slow_upstream(fake_openai, monkeypatch)
+
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        response = client.post("/assessment/movement?defer_recommendations=true", json=MOVEMENT)
+        assert time.perf_counter() - started < 0.4
+
+        body = response.json()
+        assert body["total_score"] == 26
+        assert body["recommendations"] == "AI recommendations are being generated."
+
+        job = client.get(f"/jobs/{body['recommendations_id']}?wait=5").json()
+        assert job["status"] == "succeeded"
+        assert job["result"] == "Walk daily."
+
+def test_bp_category_returns_before_the_recommendations(fake_openai, monkeypatch):
+    slow_upstream(fake_openai, monkeypatch)
+
+    with TestClient(app) as client:
+        started = time.perf_counter()
+        body = client.post("/bp/analyze?defer_recommendations=true", json={"systolic": 135, "diastolic": 85}).json()
+        assert time.perf_counter() - started < 0.4
+        assert body["category"] == "Hypertension Stage 1"
+
+        job = client.get(f"/jobs/{body['recommendations_id']}?wait=5").json()
+        assert job["result"] == "Walk daily."
+
+def test_recommendations_are_inline_by_default(fake_openai, monkeypatch):
+    slow_upstream(fake_openai, monkeypatch, delay=0)
+
+    with TestClient(app) as client:
+        body = client.post("/assessment/speech-hearing", json={
+            **MOVEMENT, "questions": [{"id": i, "score": 2} for i in range(1, 11)]}).json()
+        assert body["recommendations"] == "Walk daily."
+        assert body["recommendations_id"] is None
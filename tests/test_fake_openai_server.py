@@ -0,0 +1,88 @@
+import asyncio
+import httpx
+import pytest
+from openai import AsyncOpenAI
+from backend.utils import openai_helper
+from fake_openai_server import FakeOpenAIConfig, create_app, parse_latency
+from llm_load_test import ServerThread, percentile, summarize
+
+def use_fake_server(monkeypatch, **options):
+    """Point the async OpenAI client at an in-process fake server; returns its config."""
+    config = FakeOpenAIConfig(latency="fixed:0", token_delay=0, seed=1, **options)
+    monkeypatch.setattr(openai_helper, "_async_client", AsyncOpenAI(
+        api_key="sk-test", base_url="http://fake/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)))))
+    return config
+
+def test_parse_latency():
+    assert parse_latency("fixed:0.25")() == 0.25
+    assert all(0.1 <= parse_latency("uniform:0.1:0.2")() <= 0.2 for _ in range(20))
+    assert parse_latency("lognormal:0.5:0.3")() > 0
+    with pytest.raises(ValueError):
+        parse_latency("gamma:1")
+
+def test_completion_through_helper(monkeypatch):
+    config = use_fake_server(monkeypatch)
+    messages = [{"role": "user", "content": "fake server completion"}]
+
+    reply = asyncio.run(openai_helper.acreate_chat_completion(messages, max_tokens=20))
+
+    assert reply and len(reply.split()) <= 20
+    assert config.counts == {"requests": 1, "streams": 0, "errors": 0, "rate_limited": 0}
+
+def test_streams_tokens(monkeypatch):
+    config = use_fake_server(monkeypatch)
+    messages = [{"role": "user", "content": "fake server stream"}]
+
+    async def collect():
+        return [chunk async for chunk in openai_helper.astream_chat_completion(messages, max_tokens=20)]
+
+    chunks = asyncio.run(collect())
+
+    assert len(chunks) > 1
+    assert config.counts["streams"] == 1
+
+def test_errors_fall_back(monkeypatch):
+    config = use_fake_server(monkeypatch, error_rate=1.0)
+    messages = [{"role": "user", "content": "fake server error"}]
+
+    reply = asyncio.run(openai_helper.acreate_chat_completion(messages, fallback="Try again later."))
+
+    assert reply == "Try again later."
+    assert config.counts["errors"] == 1
+
+def test_rate_limit_sends_retry_after():
+    config = FakeOpenAIConfig(rate_limit_rate=1.0, retry_after=3)
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)), base_url="http://fake") as client:
+            return await client.post("/v1/chat/completions", json={"messages": []})
+
+    response = asyncio.run(post())
+
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "3"
+    assert config.counts["rate_limited"] == 1
+
+def test_server_thread_serves_over_http():
+    server = ServerThread(create_app(FakeOpenAIConfig(latency="fixed:0")))
+    url = server.start()
+    try:
+        response = httpx.post(f"{url}/v1/chat/completions", json={"messages": [], "max_tokens": 5})
+        assert response.status_code == 200
+        assert httpx.get(f"{url}/stats").json()["requests"] == 1
+    finally:
+        server.stop()
+
+def test_summary_percentiles():
+    assert percentile([], 50) is None
+    assert percentile(list(range(1, 101)), 95) == 95
+
+    results = [(200, 0.1, 0.01), (200, 0.3, 0.02), (503, 0.01, None)]
+    summary = summarize("patient-chat-stream", results, 1.0, [0.001, 0.004], streams=True)
+
+    assert summary["ok"] == 2
+    assert summary["statuses"] == {"200": 2, "503": 1}
+    assert summary["latency_ms"]["p50"] == 100.0
+    assert summary["ttfb_ms"]["p99"] == 20.0
+    assert summary["loop_lag_ms"]["max"] == 4.0
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import httpx
+from fastapi import FastAPI
+from backend.api import patient_chat
+from backend.utils.faq_index import FAQIndex, faq_index, features, normalize
+
+app = FastAPI()
+app.include_router(patient_chat.router, prefix="/chat")
+
+def test_normalize_strips_accents_and_unifies_apostrophes():
+    assert normalize("¿Cómo MIDO la presión?") == "¿como mido la presion?"
+    assert normalize("o‘lchash") == normalize("o'lchash")
+    assert "c:<да" in features("давление")
+
+def test_common_questions_match_in_every_language():
+    cases = [
+        ("What is normal blood pressure?", "bp-target", "en"),
+        ("Какое давление нормальное после инсульта?", "bp-target", "ru"),
+        ("qon bosimini qanday o'lchash kerak", "bp-how-to-measure", "uz"),
+        ("como mido la presion en casa", "bp-how-to-measure", "es"),
+        ("how often should i do my exercises", "exercise-how-often", "en"),
+    ]
+    for question, entry_id, language in cases:
+        match = faq_index.answer(question)
+        assert match is not None, question
+        assert (match["id"], match["language"]) == (entry_id, language)
+
+def test_unrelated_or_personal_questions_fall_through():
+    for question in ["Should I take aspirin?", "Can you explain my blood test results?",
+                     "Is it safe to fly after a stroke?", "hello"]:
+        assert faq_index.answer(question) is None, question
+
+def test_selected_language_is_used_for_the_answer():
+    match = faq_index.answer("What is normal blood pressure?", language="uz")
+    assert match["language"] == "uz"
+    assert "120/80" in match["answer"]
+
+def test_missing_corpus_answers_nothing(tmp_path):
+    index = FAQIndex(path=str(tmp_path / "missing.json"))
+    assert index.answer("What is normal blood pressure?") is None
+    assert index.stats()["entries"] == 0
+
+def post(path, payload):
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post(path, json=payload)
+
+    return asyncio.run(run())
+
+def test_patient_chat_answers_faqs_without_the_model(fake_openai):
+    request = {"messages": [{"role": "user", "content": "How often should I check my blood pressure?"}], "language": "ru"}
+
+    response = post("/chat/patient-chat", request)
+
+    assert response.status_code == 200
+    assert response.headers["x-answer-source"] == "faq"
+    assert response.json()["response"].startswith("Пока подбирается лечение")
+
+    stream = post("/chat/patient-chat/stream", request)
+    done = json.loads(stream.text.strip().split("\n\n")[-1].split("data: ", 1)[1])
+    assert done["source"] == "faq" and done["response"] == response.json()["response"]
+    assert not fake_openai.requests
+
+def test_questions_about_own_readings_skip_general_answers():
+    def ask(question):
+        return patient_chat.faq_answer(patient_chat.ChatRequest(messages=[{"role": "user", "content": question}]))
+
+    # No patient context: these still need the model, not the generic blood pressure targets
+    for question in ["What is my blood pressure?", "Is my blood pressure normal?", "Какое у меня давление?",
+                     "Mening bosimim qanday?", "¿Qué significa mi puntuación?"]:
+        assert ask(question) is None, question
+    # General questions that mention "my" are still FAQs
+    assert ask("How often should I check my blood pressure?")["id"] == "bp-how-often"
+    assert ask("What should I eat to lower my blood pressure?")["id"] == "bp-diet-salt"
+
+def test_questions_about_own_results_go_to_the_model(fake_openai):
+    fake_openai.reply = "Your score is 12."
+
+    response = post("/chat/patient-chat", {
+        "messages": [{"role": "user", "content": "What do PHQ-9 scores mean?"}],
+        "patient_context": {"assessmentType": "phq9", "assessmentResults": {"score": 12}},
+    })
+
+    assert response.status_code == 200
+    assert "x-answer-source" not in response.headers
+    assert fake_openai.requests
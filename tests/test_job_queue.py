@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import time
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.utils import job_queue
+from backend.utils.job_queue import JobQueue, JobQueueFullError
+from backend.api.jobs_api import router
+
+def make_queue(name, **kwargs):
+    kwargs.setdefault("retry_delay", 0.01)
+    return JobQueue(name, use_processes=False, **kwargs)
+
+def test_job_succeeds():
+    queue = make_queue("test-success")
+
+    async def run():
+        job_id = queue.submit(pow, 2, 10)
+        return await queue.wait(job_id, timeout=5)
+
+    job = asyncio.run(run())
+    assert job["status"] == "succeeded"
+    assert job["result"] == 1024
+    assert job["attempts"] == 1
+    queue.shutdown()
+
+def test_failed_attempt_is_retried():
+    queue = make_queue("test-retry", max_retries=2)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 2:
+            raise RuntimeError("transient")
+        return "ok"
+
+    job = asyncio.run(_submit_and_wait(queue, flaky))
+    assert job["status"] == "succeeded"
+    assert job["result"] == "ok"
+    assert job["attempts"] == 2
+    queue.shutdown()
+
+def test_job_fails_after_retries():
+    queue = make_queue("test-failure", max_retries=1)
+
+    def broken():
+        raise ValueError("bad input")
+
+    job = asyncio.run(_submit_and_wait(queue, broken))
+    assert job["status"] == "failed"
+    assert job["attempts"] == 2
+    assert job["error"] == "bad input"
+    queue.shutdown()
+
+def test_full_queue_rejects_submissions():
+    queue = make_queue("test-full", max_workers=1, max_pending=2)
+    release = threading.Event()
+
+    async def run():
+        queue.submit(release.wait)
+        queue.submit(release.wait)
+        with pytest.raises(JobQueueFullError):
+            queue.submit(release.wait)
+        assert queue.stats()["pending"] == 2
+        release.set()
+        await asyncio.gather(*queue._tasks)
+
+    asyncio.run(run())
+    assert queue.pending_count() == 0
+    queue.shutdown()
+
+def test_wait_returns_unfinished_job_after_timeout():
+    queue = make_queue("test-timeout")
+    release = threading.Event()
+
+    async def run():
+        job_id = queue.submit(release.wait)
+        job = await queue.wait(job_id, timeout=0.05)
+        release.set()
+        await queue.wait(job_id, timeout=5)
+        return job
+
+    job = asyncio.run(run())
+    assert job["status"] == "running"
+    assert job["finished_at"] is None
+    queue.shutdown()
+
+def test_jobs_endpoint_long_polls_for_result(monkeypatch):
+    queue = make_queue("test-endpoint")
+    monkeypatch.setitem(job_queue.queues, queue.name, queue)
+
+    app = FastAPI()
+    app.include_router(router, prefix="/jobs")
+
+    @app.post("/start")
+    async def start():
+        return {"job_id": queue.submit(time.sleep, 0.1)}
+
+    # The context manager keeps one event loop alive across requests, as uvicorn does
+    with TestClient(app) as client:
+        job_id = client.post("/start").json()["job_id"]
+
+        response = client.get(f"/jobs/{job_id}", params={"wait": 5})
+        assert response.status_code == 200
+        assert response.json()["status"] == "succeeded"
+
+        assert client.get("/jobs/").json()["test-endpoint"]["jobs"] == {"succeeded": 1}
+        assert client.get("/jobs/unknown").status_code == 404
+    queue.shutdown()
+
+async def _submit_and_wait(queue, fn):
+    return await queue.wait(queue.submit(fn), timeout=5)
@@ -0,0 +1,109 @@
+import os
+import cv2
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import video_routes
+from ml_models import video_exercise
+from ml_models.landmark_cache import LandmarkCache
+from ml_models.pose_pool import PosePool
+from ml_models.video_exercise import analyze_exercise_video
+
+class CountingPose:
+    frames = 0
+
+    def process(self, frame):
+        CountingPose.frames += 1
+        landmark = SimpleNamespace(x=0.25, y=0.5, z=0.0, visibility=1.0)
+        return SimpleNamespace(pose_landmarks=SimpleNamespace(landmark=[landmark] * 33))
+
+    def close(self):
+        pass
+
+@pytest.fixture(autouse=True)
+def no_exercise_model(monkeypatch):
+    monkeypatch.setattr(video_exercise.registry, "is_available", lambda name: False)
+
+def write_video(path, brightness):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for _ in range(8):
+        writer.write(np.full((48, 64, 3), brightness, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+def test_saved_landmarks_are_float16_and_memory_mapped(tmp_path):
+    video = write_video(tmp_path / "a.avi", 100)
+    cache = LandmarkCache(str(tmp_path / "cache"), version="test")
+    assert cache.load(video) is None
+
+    landmarks = np.random.default_rng(0).random((8, 33, 4)).astype(np.float32)
+    landmarks[3] = np.nan
+    path = cache.save(video, landmarks)
+
+    loaded = cache.load(video)
+    assert isinstance(loaded, np.memmap)
+    assert loaded.dtype == np.float16
+    assert loaded.shape == (8, 33, 4)
+    assert np.isnan(loaded[3]).all()
+    np.testing.assert_allclose(loaded[0], landmarks[0], atol=1e-3)
+    assert os.path.getsize(path) < 8 * 33 * 4 * 2 + 256
+    assert cache.stats()["hits"] == 1
+
+def test_key_depends_on_content_and_version(tmp_path):
+    first = write_video(tmp_path / "a.avi", 100)
+    copy = write_video(tmp_path / "copy.avi", 100)
+    other = write_video(tmp_path / "b.avi", 200)
+    cache = LandmarkCache(str(tmp_path), version="v1")
+
+    assert cache.path(first) == cache.path(copy)
+    assert cache.path(first) != cache.path(other)
+    assert cache.path(first) != LandmarkCache(str(tmp_path), version="v2").path(first)
+
+def test_reanalysis_uses_cached_landmarks(tmp_path):
+    video = write_video(tmp_path / "a.avi", 100)
+    cache = LandmarkCache(str(tmp_path / "cache"), version="test")
+    pool = PosePool(CountingPose)
+    CountingPose.frames = 0
+
+    first = analyze_exercise_video(video, pool=pool, cache=cache)
+    assert CountingPose.frames == 8
+    second = analyze_exercise_video(video, pool=pool, cache=cache)
+    assert CountingPose.frames == 8
+
+    assert (first["landmarks_cached"], second["landmarks_cached"]) == (False, True)
+    first.pop("landmarks_cached")
+    second.pop("landmarks_cached")
+    assert first == second
+
+def test_prune_keeps_cache_under_limit(tmp_path):
+    cache = LandmarkCache(str(tmp_path / "cache"), version="test", max_bytes=3000)
+    landmarks = np.zeros((10, 33, 4), dtype=np.float32)
+    for i in range(4):
+        cache.save(write_video(tmp_path / f"{i}.avi", 40 * i), landmarks)
+        os.utime(cache.path(str(tmp_path / f"{i}.avi")), (i, i))
+    cache.prune()
+    remaining = os.listdir(tmp_path / "cache")
+    assert len(remaining) == 1
+    assert cache.load(str(tmp_path / "3.avi")) is not None
+
+def test_reanalysis_rejects_invalid_min_confidence(tmp_path, monkeypatch):
+    (tmp_path / "a.avi").write_bytes(b"video")
+    submitted = []
+    monkeypatch.setattr(video_routes, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(video_routes, "ML_AVAILABLE", True)
+    monkeypatch.setattr(video_routes, "submit_analysis", lambda path, **options: submitted.append(options) or "job")
+    app = FastAPI()
+    app.include_router(video_routes.router, prefix="/video")
+    client = TestClient(app)
+
+    for value in ("high", 1.5, -0.1, True, [0.5]):
+        response = client.post("/video/analyze", json={"filename": "a.avi", "min_confidence": value})
+        assert response.status_code == 422, value
+        assert "min_confidence" in response.json()["detail"]
+    assert submitted == []
+
+    response = client.post("/video/analyze", json={"filename": "a.avi", "min_confidence": 0.5, "background": True})
+    assert response.json()["job_id"] == "job"
+    assert submitted == [{"min_confidence": 0.5}]
@@ -0,0 +1,130 @@
+import asyncio
+from types import SimpleNamespace
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import auth, llm_api
+from backend.models.user import UserRole
+from backend.utils import openai_helper
+from backend.utils.llm_cache import LLMCache, cache_key
+
+MESSAGES = [{"role": "system", "content": "You are a medical assistant."},
+            {"role": "user", "content": "Blood pressure category 'Elevated'."}]
+
+def test_key_ignores_whitespace_but_not_parameters():
+    indented = [{"role": "user", "content": "\n            Patient 65 years old\n            Score: 10/15\n"}]
+    flat = [{"role": "user", "content": "Patient 65 years old Score: 10/15"}]
+    assert cache_key(indented, "gpt-3.5-turbo", 0.7, 300) == cache_key(flat, "gpt-3.5-turbo", 0.7, 300)
+    assert cache_key(flat, "gpt-3.5-turbo", 0.7, 300) != cache_key(flat, "gpt-4o", 0.7, 300)
+    assert cache_key(flat, "gpt-3.5-turbo", 0.7, 300) != cache_key(flat, "gpt-3.5-turbo", 0.2, 300)
+    assert cache_key(flat, "gpt-3.5-turbo", 0.7, 300) != cache_key(flat, "gpt-3.5-turbo", 0.7, 400)
+
+def test_memory_tier_is_lru():
+    cache = LLMCache(max_entries=2, disk_path=None)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["misses"], stats["evictions"]) == (3, 1, 1)
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("backend.utils.llm_cache.time.time", lambda: now[0])
+    cache = LLMCache(ttl=10, disk_path=None)
+    cache.set("a", "1")
+    now[0] += 5
+    assert cache.get("a") == "1"
+    now[0] += 10
+    assert cache.get("a") is None
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(disk_path=path).set("a", "Walk 20 minutes a day.")
+
+    restarted = LLMCache(disk_path=path)
+    assert restarted.get("a") == "Walk 20 minutes a day."
+    assert restarted.get("a") == "Walk 20 minutes a day."
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["disk_entries"]) == (1, 1, 1)
+
+def test_disk_entries_expire_and_are_purged(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("backend.utils.llm_cache.time.time", lambda: now[0])
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(disk_path=path, disk_ttl=60).set("a", "1")
+    now[0] += 120
+    cache = LLMCache(disk_path=path, disk_ttl=60)
+    assert cache.get("a") is None
+    assert cache.purge_expired() == 1
+
+def test_async_disk_reads_leave_the_event_loop_free(tmp_path):
+    cache = LLMCache(disk_path=str(tmp_path / "llm_cache.db"))
+    cache.set("a", "1")
+    cache._memory.clear()
+
+    async def run():
+        # Stands in for a slow disk write from a threadpool route
+        cache._db_lock.acquire()
+        lookup = asyncio.create_task(cache.aget("a"))
+        await asyncio.sleep(0.05)
+        assert not lookup.done()
+        cache._db_lock.release()
+        return await lookup
+
+    assert asyncio.run(run()) == "1"
+    assert cache.stats()["disk_hits"] == 1
+
+def test_disk_errors_are_counted_not_raised(tmp_path):
+    cache = LLMCache(disk_path=str(tmp_path / "llm_cache.db"))
+    cache.set("a", "1")
+    cache._db.close()
+
+    cache.clear()
+    assert cache.purge_expired() == 0
+    assert asyncio.run(cache.aget("a")) is None
+    assert cache.stats()["disk_errors"] == 4
+
+def test_completion_is_served_from_cache(fake_openai):
+    fake_openai.reply = "Reduce salt intake."
+    cache = LLMCache(disk_path=None)
+
+    first = openai_helper.create_chat_completion(MESSAGES, model="gpt-3.5-turbo", cache=cache)
+    second = openai_helper.create_chat_completion(MESSAGES, model="gpt-3.5-turbo", cache=cache)
+    assert first == second == "Reduce salt intake."
+    assert len(fake_openai.requests) == 1
+
+    completion = openai_helper.acreate_chat_completion(MESSAGES, model="gpt-3.5-turbo", cache=cache)
+    assert asyncio.run(completion) == "Reduce salt intake."
+    assert len(fake_openai.requests) == 1
+
+def test_fallback_is_never_cached(fake_openai):
+    fake_openai.statuses = [500]
+    cache = LLMCache(disk_path=None)
+
+    for _ in range(2):
+        assert openai_helper.create_chat_completion(MESSAGES, cache=cache, fallback="Unavailable") == "Unavailable"
+    assert len(fake_openai.requests) == 2
+    assert cache.stats()["stores"] == 0
+
+def test_cache_endpoints(monkeypatch, tmp_path):
+    cache = LLMCache(disk_path=str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(llm_api, "llm_cache", cache)
+    cache.set("a", "1")
+    cache.get("a")
+
+    app = FastAPI()
+    app.include_router(llm_api.router, prefix="/llm")
+    client = TestClient(app)
+
+    stats = client.get("/llm/cache").json()
+    assert (stats["memory_hits"], stats["disk_entries"], stats["hit_ratio"]) == (1, 1, 1.0)
+    # Clearing throws away every paid completion, so it is for admins only
+    assert client.delete("/llm/cache").status_code == 401
+    assert client.post("/llm/cache/purge").status_code == 401
+    assert cache.get("a") == "1"
+    app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(role=UserRole.ADMIN)
+    assert client.post("/llm/cache/purge").json()["removed"] == 0
+    assert client.delete("/llm/cache").json()["cache"]["disk_entries"] == 0
+    assert cache.get("a") is None
@@ -0,0 +1,89 @@
+import asyncio
+import time
+import httpx
+import pytest
+from backend.main import app
+from backend.api import patient_chat
+from backend.utils.disconnect import cancel_on_disconnect, ClientDisconnected
+
+UPSTREAM_DELAY = 1.0
+
+async def timed(awaitable):
+    started = time.perf_counter()
+    response = await awaitable
+    return response, time.perf_counter() - started
+
+# Not one of the FAQs, so it reaches the model
+CHAT_REQUEST = {"messages": [{"role": "user", "content": "Can you write me a weekly plan for my recovery?"}], "language": "en"}
+
+def test_slow_llm_call_does_not_delay_health_check(fake_openai):
+    fake_openai.reply = "Keep practising your exercises."
+    fake_openai.delay = UPSTREAM_DELAY
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            chat = asyncio.create_task(timed(client.post("/chat/patient-chat", json=CHAT_REQUEST)))
+            await asyncio.sleep(0.1)
+            health = await timed(client.get("/health"))
+            return await chat, health
+
+    (chat_response, chat_seconds), (health_response, health_seconds) = asyncio.run(run())
+    assert chat_response.status_code == 200
+    assert chat_response.json()["response"] == "Keep practising your exercises."
+    assert chat_seconds >= UPSTREAM_DELAY
+    assert health_response.status_code == 200
+    assert health_seconds < UPSTREAM_DELAY / 2
+
+def test_llm_call_times_out_with_fallback(fake_openai, monkeypatch):
+    fake_openai.delay = 5
+    monkeypatch.setattr(patient_chat, "LLM_TIMEOUT", 0.2)
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await timed(client.post("/chat/patient-chat", json=CHAT_REQUEST))
+
+    response, seconds = asyncio.run(run())
+    assert response.status_code == 200
+    assert "technical difficulties" in response.json()["response"]
+    assert seconds < 2
+
+def test_work_is_cancelled_when_client_disconnects():
+    class DisconnectingRequest:
+        checks = 0
+
+        async def is_disconnected(self):
+            self.checks += 1
+            return self.checks >= 2
+
+    cancelled = []
+
+    async def slow_call():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        started = time.perf_counter()
+        with pytest.raises(ClientDisconnected):
+            await cancel_on_disconnect(DisconnectingRequest(), slow_call(), poll_interval=0.01)
+        await asyncio.sleep(0)
+        return time.perf_counter() - started
+
+    assert asyncio.run(run()) < 1
+    assert cancelled == [True]
+
+def test_connected_client_gets_result():
+    class ConnectedRequest:
+        async def is_disconnected(self):
+            return False
+
+    async def call():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    assert asyncio.run(cancel_on_disconnect(ConnectedRequest(), call(), poll_interval=0.01)) == "done"
+    assert asyncio.run(cancel_on_disconnect(None, call())) == "done"
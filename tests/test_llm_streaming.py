@@ -0,0 +1,89 @@
+import asyncio
+import json
+import httpx
+from fastapi import FastAPI
+from backend.api import openai_integration, patient_chat
+from backend.utils import openai_helper
+
+app = FastAPI()
+app.include_router(patient_chat.router, prefix="/chat")
+app.include_router(openai_integration.router, prefix="/openai")
+
+REPLY = ["Try these:", "\n- Walk 20 minutes", "\n- Stretch daily"]
+
+def parse_events(text):
+    events = []
+    for block in text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def post_stream(path, payload):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, json=payload)
+
+    return asyncio.run(run())
+
+def test_helper_yields_chunks_as_they_arrive(fake_openai):
+    fake_openai.chunks = REPLY
+
+    async def run():
+        return [text async for text in openai_helper.astream_chat_completion([{"role": "user", "content": "hi"}])]
+
+    assert asyncio.run(run()) == REPLY
+
+def test_helper_yields_fallback_when_upstream_fails(fake_openai):
+    fake_openai.statuses = [500]
+
+    async def run():
+        return [text async for text in openai_helper.astream_chat_completion(
+            [{"role": "user", "content": "hi"}], fallback="Unavailable")]
+
+    assert asyncio.run(run()) == ["Unavailable"]
+
+def test_helper_gives_up_on_stalled_stream(fake_openai):
+    fake_openai.chunk_delay = 1
+
+    async def run():
+        return [text async for text in openai_helper.astream_chat_completion(
+            [{"role": "user", "content": "hi"}], fallback="Unavailable", timeout=0.1)]
+
+    assert asyncio.run(run()) == ["Unavailable"]
+
+def test_closing_the_stream_closes_the_upstream_response(fake_openai):
+    fake_openai.chunks = ["a"] * 50
+    fake_openai.chunk_delay = 0.01
+
+    async def run():
+        stream = openai_helper.astream_chat_completion([{"role": "user", "content": "hi"}])
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    assert asyncio.run(run()) == "a"
+    assert fake_openai.closed == [True]
+
+def test_chat_completion_stream(fake_openai):
+    fake_openai.chunks = REPLY
+
+    response = post_stream("/openai/chat/completion/stream", {"messages": [{"role": "user", "content": "Exercises?"}]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = parse_events(response.text)
+    assert [data["text"] for name, data in events if name == "token"] == REPLY
+    assert events[-1] == ("done", {"response": "".join(REPLY),
+                                   "recommendations": ["Walk 20 minutes", "Stretch daily"]})
+
+def test_patient_chat_stream_ends_with_advice(fake_openai):
+    fake_openai.chunks = REPLY
+
+    response = post_stream("/chat/patient-chat/stream", {
+        "messages": [{"role": "user", "content": "What does my assessment score mean?"}],
+        "patient_context": {"assessmentType": "movement", "assessmentResults": {"total_score": 27}},
+    })
+    events = parse_events(response.text)
+    assert [name for name, _ in events] == ["token"] * len(REPLY) + ["done"]
+    assert events[-1][1] == {"response": "".join(REPLY), "advice": "Rest well.",
+                             "recommendations": ["Walk 20 minutes", "Stretch daily"]}
@@ -0,0 +1,131 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend.api import auth, llm_api
+from backend.models.user import UserRole
+from backend.utils import openai_helper
+from backend.utils.llm_cache import LLMCache
+from backend.utils.llm_telemetry import Histogram, LLMTelemetry, LLMRouteMiddleware, acount_attempt
+
+USAGE = {"prompt_tokens": 42, "completion_tokens": 7, "total_tokens": 49}
+
+def fake_upstream(fake_openai, monkeypatch, statuses=(200,), max_retries=0):
+    """Script the fake OpenAI to answer with the given statuses in turn; returns a fresh telemetry instance."""
+    fake_openai.statuses = list(statuses)
+    fake_openai.usage = USAGE
+    fake_openai.chunks = ["Walk ", "every ", "day."]
+    fake_openai.install(max_retries, event_hooks={"request": [acount_attempt]})
+    telemetry = LLMTelemetry(log_path=None)
+    monkeypatch.setattr(openai_helper, "llm_telemetry", telemetry)
+    return telemetry
+
+def only_route(telemetry):
+    routes = telemetry.stats()["routes"]
+    assert len(routes) == 1
+    return routes[0]
+
+def test_histogram_percentiles():
+    histogram = Histogram((10, 100, 1000))
+    for value in (5, 50, 50, 50, 5000):
+        histogram.observe(value)
+
+    summary = histogram.summary()
+
+    assert summary["count"] == 5
+    assert summary["buckets"] == {"le_10": 1, "le_100": 3, "le_1000": 0, "le_inf": 1}
+    assert summary["p50"] == 100
+    assert summary["p99"] == 5000
+    assert Histogram((10,)).percentile(50) is None
+
+def test_completion_records_usage_and_cache(fake_openai, monkeypatch):
+    telemetry = fake_upstream(fake_openai, monkeypatch)
+    cache = LLMCache(disk_path=None)
+    messages = [{"role": "user", "content": "telemetry usage"}]
+
+    for _ in range(2):
+        assert asyncio.run(openai_helper.acreate_chat_completion(messages, cache=cache)) == "Rest well."
+
+    route = only_route(telemetry)
+    assert route["route"] == "background"
+    assert route["calls"] == 2
+    assert route["cache_misses"] == 1 and route["cache_hits"] == 1
+    # The cache hit cost no tokens
+    assert route["prompt_tokens"] == 42 and route["completion_tokens"] == 7
+    assert route["retries"] == 0 and route["fallbacks"] == 0
+    assert route["latency_ms"]["count"] == 2
+
+def test_retries_and_fallbacks_are_counted(fake_openai, monkeypatch):
+    telemetry = fake_upstream(fake_openai, monkeypatch, statuses=(500, 200), max_retries=1)
+    messages = [{"role": "user", "content": "telemetry retry"}]
+    assert asyncio.run(openai_helper.acreate_chat_completion(messages)) == "Rest well."
+
+    fake_upstream(fake_openai, monkeypatch, statuses=(500,))
+    monkeypatch.setattr(openai_helper, "llm_telemetry", telemetry)
+    assert asyncio.run(openai_helper.acreate_chat_completion(messages, fallback="Later.")) == "Later."
+
+    route = only_route(telemetry)
+    assert route["retries"] == 1
+    assert route["fallbacks"] == 1
+    assert route["errors"] == {"InternalServerError": 1}
+
+def test_stream_records_time_to_first_token(fake_openai, monkeypatch):
+    telemetry = fake_upstream(fake_openai, monkeypatch)
+    messages = [{"role": "user", "content": "telemetry stream"}]
+
+    async def collect():
+        return [chunk async for chunk in openai_helper.astream_chat_completion(messages)]
+
+    assert "".join(asyncio.run(collect())) == "Walk every day."
+
+    route = only_route(telemetry)
+    assert route["streams"] == 1
+    assert route["ttft_ms"]["count"] == 1
+    assert route["completion_tokens"] > 0 and route["prompt_tokens"] > 0
+
+def test_calls_are_tagged_with_the_request_route(fake_openai, monkeypatch):
+    telemetry = fake_upstream(fake_openai, monkeypatch)
+    app = FastAPI()
+    app.add_middleware(LLMRouteMiddleware)
+
+    @app.post("/chat/advice")
+    async def advice():
+        return {"text": await openai_helper.acreate_chat_completion([{"role": "user", "content": "telemetry route"}])}
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/chat/advice")
+
+    assert asyncio.run(post()).status_code == 200
+    assert only_route(telemetry)["route"] == "/chat/advice"
+
+def test_records_are_written_to_the_log_file(tmp_path):
+    telemetry = LLMTelemetry(log_path=str(tmp_path / "llm.jsonl"), log_max_bytes=400, log_backups=1)
+
+    for _ in range(5):
+        call = telemetry.start("gpt-4o")
+        call["cache"] = "miss"
+        telemetry.finish(call)
+
+    record = json.loads((tmp_path / "llm.jsonl").read_text().splitlines()[-1])
+    assert record["model"] == "gpt-4o" and record["cache"] == "miss"
+    assert "_started" not in record
+    # Rotated once the file passed log_max_bytes
+    assert (tmp_path / "llm.jsonl.1").exists()
+    assert telemetry.stats()["routes"][0]["calls"] == 5
+
+def test_only_admins_can_reset_the_aggregates(monkeypatch):
+    telemetry = LLMTelemetry(log_path=None)
+    telemetry.finish(telemetry.start("gpt-4o"))
+    monkeypatch.setattr(llm_api, "llm_telemetry", telemetry)
+    app = FastAPI()
+    app.include_router(llm_api.router, prefix="/llm")
+    client = TestClient(app)
+
+    assert len(client.get("/llm/telemetry").json()["routes"]) == 1
+    assert client.delete("/llm/telemetry").status_code == 401
+    app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(role=UserRole.ADMIN)
+    assert client.delete("/llm/telemetry").json() == {"status": "success"}
+    assert client.get("/llm/telemetry").json()["routes"] == []
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+from backend.utils.micro_batcher import MicroBatcher
+
+def make_batcher(name, **kwargs):
+    calls = []
+    lock = threading.Lock()
+
+    def predict(rows):
+        with lock:
+            calls.append(rows.shape)
+        time.sleep(0.005)
+        return rows.sum(axis=1)
+
+    return MicroBatcher(name, predict, **kwargs), calls
+
+def test_single_request_is_not_delayed():
+    batcher, calls = make_batcher("test-single", max_wait_ms=500)
+
+    async def run():
+        started = time.perf_counter()
+        result = await batcher.predict([1, 2, 3])
+        return result, time.perf_counter() - started
+
+    result, elapsed = asyncio.run(run())
+    assert result == 6
+    assert elapsed < 0.25
+    assert calls == [(1, 3)]
+
+def test_concurrent_requests_are_batched():
+    batcher, calls = make_batcher("test-concurrent", max_batch_size=16, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(*(batcher.predict([i, i]) for i in range(40)))
+
+    results = asyncio.run(run())
+
+    assert results == [2 * i for i in range(40)]
+    assert len(calls) < 40
+    assert max(shape[0] for shape in calls) <= 16
+    metrics = batcher.metrics()
+    assert metrics["requests"] == 40
+    assert metrics["batches"] == len(calls)
+    assert metrics["queue_wait_ms"]["count"] == 40
+
+def test_errors_propagate_to_every_caller():
+    def predict(rows):
+        raise RuntimeError("model unavailable")
+
+    batcher = MicroBatcher("test-errors", predict)
+
+    async def run():
+        return await asyncio.gather(batcher.predict([1]), batcher.predict([2]), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert batcher.metrics()["errors"] >= 1
+
+def test_batcher_survives_event_loop_change():
+    batcher, _ = make_batcher("test-loops")
+    assert asyncio.run(batcher.predict([1, 1])) == 2
+    assert asyncio.run(batcher.predict([2, 2])) == 4
+
+def test_ragged_row_fails_its_batch_without_stopping_the_batcher():
+    batcher, _ = make_batcher("test-ragged", max_batch_size=16, max_wait_ms=20)
+
+    async def run():
+        return await asyncio.gather(batcher.predict([1, 2, 3]), batcher.predict([1, 2]), return_exceptions=True)
+
+    results = asyncio.run(asyncio.wait_for(run(), 5))
+    assert all(isinstance(r, ValueError) for r in results)
+    assert batcher.metrics()["errors"] == 1
+    # Later requests are still served
+    assert asyncio.run(asyncio.wait_for(batcher.predict([2, 2]), 5)) == 4
@@ -0,0 +1,97 @@
+import os
+from types import SimpleNamespace
+import joblib
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from backend.api import auth, models_api
+from backend.models.user import UserRole
+from ml_models.model_registry import ModelRegistry
+
+def train_forest(n_estimators=5):
+    X = np.random.RandomState(0).randint(0, 4, size=(200, 9))
+    y = X.sum(axis=1)
+    return RandomForestClassifier(n_estimators=n_estimators, random_state=42).fit(X, y)
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "phq_model.pkl"
+    joblib.dump(train_forest(), path)
+    return str(path)
+
+def test_get_loads_artifact_once(artifact):
+    registry = ModelRegistry(check_interval=0)
+    registry.register("phq", artifact)
+
+    first = registry.get("phq")
+    second = registry.get("phq")
+
+    assert first is second
+    status = registry.status()["models"]["phq"]
+    assert status["loaded"] is True
+    assert status["load_count"] == 1
+    assert status["load_seconds"] is not None
+
+def test_get_memory_maps_arrays(tmp_path):
+    path = tmp_path / "table.joblib"
+    joblib.dump({"table": np.arange(1000, dtype=np.int16)}, path)
+    registry = ModelRegistry(check_interval=0)
+    registry.register("table", str(path))
+
+    artifact = registry.get("table")
+
+    assert isinstance(artifact["table"], np.memmap)
+    assert artifact["table"][999] == 999
+
+def test_unknown_model_raises_key_error():
+    registry = ModelRegistry()
+    with pytest.raises(KeyError):
+        registry.get("missing")
+
+def test_missing_artifact_raises_file_not_found(tmp_path):
+    registry = ModelRegistry()
+    registry.register("phq", str(tmp_path / "absent.pkl"))
+    assert registry.is_available("phq") is False
+    with pytest.raises(FileNotFoundError):
+        registry.get("phq")
+
+def test_hot_reload_swaps_new_version(artifact):
+    registry = ModelRegistry(check_interval=0.01)
+    registry.register("phq", artifact)
+    old_model = registry.get("phq")
+
+    # Publish a new version the way a deployment would: write aside, then replace
+    new_path = artifact + ".new"
+    joblib.dump(train_forest(n_estimators=3), new_path)
+    os.replace(new_path, artifact)
+    registry._entries["phq"].last_checked = 0.0
+
+    new_model = registry.get("phq")
+
+    assert new_model is not old_model
+    assert len(new_model.estimators_) == 3
+    assert registry.status()["models"]["phq"]["load_count"] == 2
+
+def test_explicit_reload(artifact):
+    registry = ModelRegistry(check_interval=0)
+    registry.register("phq", artifact)
+    old_model = registry.get("phq")
+
+    assert registry.reload("phq") is not old_model
+    assert registry.get("phq") is not old_model
+
+def test_reload_endpoint_is_for_admins_only(artifact, monkeypatch):
+    registry = ModelRegistry(check_interval=0)
+    registry.register("phq", artifact)
+    monkeypatch.setattr(models_api, "registry", registry)
+    app = FastAPI()
+    app.include_router(models_api.router, prefix="/models")
+    client = TestClient(app)
+
+    assert client.post("/models/phq/reload").status_code == 401
+    app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(role=UserRole.PATIENT)
+    assert client.post("/models/phq/reload").status_code == 403
+    app.dependency_overrides[auth.get_current_user] = lambda: SimpleNamespace(role=UserRole.ADMIN)
+    assert client.post("/models/phq/reload").json()["model"]["load_count"] == 1
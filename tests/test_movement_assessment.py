@@ -1,9 +1,9 @@
 
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 from backend.main import app
-from backend.api.movement_assessment import analyze_movement, get_level, generate_ai_recommendations
+from backend.api.movement_assessment import get_level, generate_ai_recommendations
 
 client = TestClient(app)
 
@@ -14,12 +14,10 @@ class TestMovementAPI(unittest.TestCase):
         self.assertEqual(get_level(9, 15), "Fair")
         self.assertEqual(get_level(6, 15), "Poor")
     
-    @patch('backend.api.movement_assessment.openai.Completion.create')
+    @patch('backend.api.movement_assessment.create_chat_completion')
     def test_generate_ai_recommendations(self, mock_openai):
         # Setup mock
-        mock_response = MagicMock()
-        mock_response.choices = [MagicMock(text="Test recommendation")]
-        mock_openai.return_value = mock_response
+        mock_openai.return_value = "Test recommendation\n"
         
         # Test
         result = generate_ai_recommendations(
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from backend.utils import openai_helper
+
+@pytest.fixture
+def fresh_gateway(monkeypatch):
+    """Reset the process-wide key and clients, counting key lookups."""
+    lookups = []
+    monkeypatch.setattr(openai_helper, "_api_key", None)
+    monkeypatch.setattr(openai_helper, "_client", None)
+    monkeypatch.setattr(openai_helper, "_async_client", None)
+    monkeypatch.setattr(openai_helper, "_load_openai_key", lambda: lookups.append(1) or "sk-test")
+    return lookups
+
+def test_key_is_resolved_once(fresh_gateway):
+    assert openai_helper.get_openai_key() == "sk-test"
+    assert openai_helper.get_openai_key() == "sk-test"
+    assert len(fresh_gateway) == 1
+
+def test_clients_are_created_once_per_process(fresh_gateway):
+    assert openai_helper.get_client() is openai_helper.get_client()
+    assert openai_helper.get_async_client() is openai_helper.get_async_client()
+    assert len(fresh_gateway) == 1
+    asyncio.run(openai_helper.close_clients())
+    assert openai_helper._client is None and openai_helper._async_client is None
+
+def test_sync_and_async_completions_share_pooled_clients(fresh_gateway, fake_openai):
+    fake_openai.reply = "Stay hydrated."
+
+    async def run():
+        # Distinct prompts: identical concurrent ones would be coalesced into one request
+        return await asyncio.gather(*(
+            openai_helper.acreate_chat_completion([{"role": "user", "content": f"hi {i}"}]) for i in range(3)))
+
+    messages = [{"role": "user", "content": "hi"}]
+    assert openai_helper.create_chat_completion(messages) == "Stay hydrated."
+    assert asyncio.run(run()) == ["Stay hydrated."] * 3
+    assert len(fake_openai.requests) == 4
+    assert all(r.headers["authorization"] == "Bearer sk-test" for r in fake_openai.requests)
+
+def test_errors_return_fallback_text(fresh_gateway, fake_openai):
+    fake_openai.statuses = [401]
+
+    messages = [{"role": "user", "content": "hi"}]
+    assert "API credentials" in openai_helper.create_chat_completion(messages)
+    assert openai_helper.create_chat_completion(messages, fallback="Unavailable") == "Unavailable"
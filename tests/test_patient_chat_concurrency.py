@@ -0,0 +1,62 @@
+import asyncio
+import time
+import httpx
+from fastapi import FastAPI
+from backend.api import patient_chat
+
+app = FastAPI()
+app.include_router(patient_chat.router, prefix="/chat")
+
+RESULTS_REQUEST = {
+    "messages": [{"role": "user", "content": "What does my assessment score mean?"}],
+    "patient_context": {"assessmentType": "movement", "assessmentResults": {"total_score": 27}},
+    "language": "en",
+}
+
+def fake_upstream(fake_openai, reply_delay, advice_delay):
+    """Script the fake OpenAI: the reply call asks for 500 tokens, the advice call for 400."""
+    fake_openai.delay = lambda body: advice_delay if body["max_tokens"] == 400 else reply_delay
+    fake_openai.reply = lambda body: ("Try these exercises." if body["max_tokens"] == 400
+                                      else "Your score is in the good range.")
+
+def post_chat(payload):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.perf_counter()
+            response = await client.post("/chat/patient-chat", json=payload)
+            return response, time.perf_counter() - started
+
+    return asyncio.run(run())
+
+def server_timing(response):
+    entries = dict(entry.split(";dur=") for entry in response.headers["Server-Timing"].split(", "))
+    return {name: float(duration) for name, duration in entries.items()}
+
+def test_reply_and_advice_are_generated_concurrently(fake_openai):
+    fake_upstream(fake_openai, reply_delay=0.5, advice_delay=0.5)
+
+    response, seconds = post_chat(RESULTS_REQUEST)
+    assert response.status_code == 200
+    assert response.json() == {"response": "Your score is in the good range.", "advice": "Try these exercises."}
+    assert seconds < 0.9
+
+    timing = server_timing(response)
+    assert timing["llm-reply"] >= 500 and timing["llm-advice"] >= 500
+    assert timing["total"] < timing["llm-reply"] + timing["llm-advice"]
+
+def test_reply_is_returned_when_advice_times_out(fake_openai, monkeypatch):
+    fake_upstream(fake_openai, reply_delay=0.05, advice_delay=5)
+    monkeypatch.setattr(patient_chat, "LLM_TIMEOUT", 0.3)
+
+    response, seconds = post_chat(RESULTS_REQUEST)
+    assert response.status_code == 200
+    assert response.json() == {"response": "Your score is in the good range.", "advice": None}
+    assert seconds < 1
+
+def test_question_without_results_makes_one_call(fake_openai):
+    fake_upstream(fake_openai, reply_delay=0.05, advice_delay=0.05)
+
+    response, _ = post_chat({"messages": [{"role": "user", "content": "How can I sleep better?"}]})
+    assert response.json()["advice"] is None
+    assert set(server_timing(response)) == {"llm-reply", "total"}
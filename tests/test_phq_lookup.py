@@ -0,0 +1,88 @@
+import joblib
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from ml_models import phq_lookup
+from ml_models.model_registry import registry
+
+@pytest.fixture
+def phq_artifacts(tmp_path):
+    X = np.random.RandomState(0).randint(0, 4, size=(300, 9))
+    model = RandomForestClassifier(n_estimators=10, random_state=42).fit(X, X.sum(axis=1))
+    model_path = str(tmp_path / "phq_model.pkl")
+    table_path = str(tmp_path / "phq_lookup.joblib")
+    joblib.dump(model, model_path)
+
+    saved_entries = dict(registry._entries)
+    registry.register("phq", model_path)
+    registry.register("phq_lookup", table_path)
+    phq_lookup._table_check.update(key=None, valid=False)
+    yield model, model_path, table_path
+    registry._entries.clear()
+    registry._entries.update(saved_entries)
+
+def test_encode_matches_enumeration():
+    rows = phq_lookup.enumerate_inputs()
+    assert rows.shape == (4 ** 9, 9)
+    assert np.array_equal(phq_lookup.encode_inputs(rows), np.arange(4 ** 9))
+
+def test_compiled_table_matches_forest(phq_artifacts):
+    model, _, _ = phq_artifacts
+    lookup = phq_lookup.compile_table(model)
+
+    assert lookup["table"].dtype == np.uint8
+    assert lookup["table"].nbytes == 4 ** 9
+    assert phq_lookup.verify_table(model, lookup)["mismatches"] == 0
+
+def test_verify_detects_corrupted_table(phq_artifacts):
+    model, _, _ = phq_artifacts
+    lookup = phq_lookup.compile_table(model)
+    lookup["table"][123] = (lookup["table"][123] + 1) % len(lookup["classes"])
+
+    result = phq_lookup.verify_table(model, lookup)
+
+    assert result["mismatches"] == 1
+    assert result["first_mismatch"]["input"] == phq_lookup.enumerate_inputs(123, 124)[0].tolist()
+
+def test_predict_phq_uses_table(phq_artifacts):
+    model, model_path, table_path = phq_artifacts
+    assert phq_lookup.main(["compile", "--model", model_path, "--output", table_path]) == 0
+
+    rows = np.random.RandomState(1).randint(0, 4, size=(50, 9))
+    assert phq_lookup.get_lookup_table() is not None
+    assert np.array_equal(phq_lookup.predict_phq(rows), model.predict(rows))
+
+def test_predict_phq_falls_back_for_out_of_range_answers(phq_artifacts):
+    model, model_path, table_path = phq_artifacts
+    phq_lookup.main(["compile", "--model", model_path, "--output", table_path])
+
+    rows = np.array([[0, 1, 2, 3, 0, 1, 2, 3, 0], [5, 5, 5, 5, 5, 5, 5, 5, 5]])
+    assert np.array_equal(phq_lookup.predict_phq(rows), model.predict(rows))
+
+def test_stale_table_is_ignored(phq_artifacts):
+    model, model_path, table_path = phq_artifacts
+    lookup = phq_lookup.compile_table(model)
+    phq_lookup.save_table(lookup, "not-the-current-model", table_path)
+
+    assert phq_lookup.get_lookup_table() is None
+    row = [1, 1, 1, 1, 1, 1, 1, 1, 1]
+    assert phq_lookup.predict_phq(row).tolist() == model.predict(np.array([row])).tolist()
+
+def test_model_is_hashed_only_when_its_version_changes(phq_artifacts, monkeypatch):
+    model, model_path, table_path = phq_artifacts
+    phq_lookup.main(["compile", "--model", model_path, "--output", table_path])
+    hashed = []
+    file_sha256 = phq_lookup.file_sha256
+    monkeypatch.setattr(phq_lookup, "file_sha256", lambda path: hashed.append(path) or file_sha256(path))
+
+    for _ in range(3):
+        assert phq_lookup.get_lookup_table() is not None
+    assert len(hashed) == 1
+
+    # Publishing another model changes its version, so the file is hashed once more
+    X = np.random.RandomState(2).randint(0, 4, size=(300, 9))
+    joblib.dump(RandomForestClassifier(n_estimators=3, random_state=0).fit(X, X.sum(axis=1)), model_path)
+    registry.reload("phq")
+    for _ in range(3):
+        assert phq_lookup.get_lookup_table() is None
+    assert len(hashed) == 2
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+from sklearn.ensemble import RandomForestClassifier
+from ml_models.pose_features import (
+    LANDMARK_INDEX, DEFAULT_ANGLE_FEATURES, landmarks_to_array, parse_angle_feature,
+    angle_features, classify_frames
+)
+from ml_models.video_exercise import score_landmarks, exercise_name
+
+def make_landmarks(frames, **positions):
+    """(frames, 33, 4) array with every joint at the origin unless placed by name."""
+    landmarks = np.zeros((frames, 33, 4), dtype=np.float32)
+    landmarks[..., 3] = 1.0
+    for joint, xyz in positions.items():
+        landmarks[:, LANDMARK_INDEX[joint], :3] = xyz
+    return landmarks
+
+class CountingModel:
+    """Wraps a classifier and counts predict_proba calls."""
+
+    def __init__(self, model):
+        self.model = model
+        self.classes_ = model.classes_
+        self.feature_names_in_ = model.feature_names_in_
+        self.calls = 0
+
+    def predict_proba(self, X):
+        self.calls += 1
+        return self.model.predict_proba(X)
+
+@pytest.fixture(scope="module")
+def model():
+    # Squat frames have bent knees, jumping jack frames straight knees
+    rng = np.random.default_rng(0)
+    rows, labels = [], []
+    for label, knee in (("squats_down", 90), ("jumping_jacks_up", 175)):
+        for _ in range(50):
+            row = rng.uniform(20, 170, len(DEFAULT_ANGLE_FEATURES))
+            row[3:5] = knee + rng.normal(0, 3, 2)
+            rows.append(row)
+            labels.append(label)
+    clf = RandomForestClassifier(n_estimators=20, random_state=0)
+    clf.fit(pd.DataFrame(rows, columns=DEFAULT_ANGLE_FEATURES), labels)
+    return clf
+
+def legs(knee_angle):
+    """Right leg landmarks with the given knee angle in degrees."""
+    theta = np.radians(knee_angle)
+    return {
+        "right_hip": (0.0, 1.0, 0.0),
+        "right_knee": (0.0, 0.0, 0.0),
+        "right_ankle": (np.sin(theta), np.cos(theta), 0.0),
+        "left_hip": (1.0, 1.0, 0.0),
+        "left_knee": (1.0, 0.0, 0.0),
+        "left_ankle": (1.0 + np.sin(theta), np.cos(theta), 0.0),
+    }
+
+def test_parse_angle_feature():
+    assert parse_angle_feature("right_elbow_right_shoulder_right_hip") == ("right_elbow", "right_shoulder", "right_hip")
+    assert parse_angle_feature("right_knee_mid_hip_left_knee") == ("right_knee", "mid_hip", "left_knee")
+    with pytest.raises(ValueError):
+        parse_angle_feature("right_elbow_right_shoulder")
+    with pytest.raises(ValueError):
+        parse_angle_feature("right_tail_right_shoulder_right_hip")
+
+def test_angles_are_computed_for_all_frames():
+    landmarks = make_landmarks(4, right_elbow=(1.0, 0.0, 0.0), right_shoulder=(0.0, 0.0, 0.0),
+                               right_hip=(0.0, 1.0, 0.0))
+    angles = angle_features(landmarks, ["right_elbow_right_shoulder_right_hip"])
+    assert angles.shape == (4, 1)
+    assert angles == pytest.approx(90.0)
+
+    landmarks = make_landmarks(1, **legs(120))
+    angles = angle_features(landmarks, ["right_hip_right_knee_right_ankle", "left_hip_left_knee_left_ankle"])
+    assert angles[0] == pytest.approx([120.0, 120.0], abs=1e-3)
+
+def test_frames_without_pose_are_nan():
+    landmarks = make_landmarks(2, **legs(90))
+    landmarks_to_array(None, out=landmarks[1])
+    angles = angle_features(landmarks)
+    assert not np.isnan(angles[0]).any()
+    assert np.isnan(angles[1]).all()
+
+def test_landmarks_to_array():
+    pose_landmarks = SimpleNamespace(landmark=[SimpleNamespace(x=i, y=2 * i, z=0.0, visibility=1.0) for i in range(33)])
+    array = landmarks_to_array(pose_landmarks)
+    assert array.shape == (33, 4)
+    assert array[5].tolist() == [5, 10, 0, 1]
+
+def test_all_frames_are_classified_in_one_call(model):
+    counting = CountingModel(model)
+    landmarks = np.concatenate([make_landmarks(6, **legs(90)), make_landmarks(4, **legs(175))])
+    landmarks_to_array(None, out=landmarks[0])
+
+    labels, confidences, detected = classify_frames(counting, landmarks)
+    assert counting.calls == 1
+    assert detected.sum() == 9
+    assert list(labels) == ["squats_down"] * 5 + ["jumping_jacks_up"] * 4
+    assert ((confidences > 0) & (confidences <= 1)).all()
+
+def test_score_counts_frames_of_dominant_exercise(model):
+    landmarks = np.concatenate([make_landmarks(7, **legs(90)), make_landmarks(3, **legs(175))])
+    result = score_landmarks(landmarks, model=model)
+    assert result["exercise"] == "squats"
+    assert result["frames_with_pose"] == 10
+    assert result["correct_frames"] == 7
+
+def test_exercise_name():
+    assert exercise_name("squats_down") == "squats"
+    assert exercise_name("jumping_jacks_up") == "jumping_jacks"
+    assert exercise_name("situp") == "situp"
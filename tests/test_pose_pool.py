@@ -0,0 +1,93 @@
+import cv2
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from ml_models import video_exercise
+from ml_models.pose_pool import PosePool
+from ml_models.video_exercise import analyze_exercise_video
+from ml_models.bench_video_exercise import benchmark
+
+LANDMARKS = SimpleNamespace(landmark=[SimpleNamespace(x=0.5, y=0.5, z=0.0, visibility=1.0)] * 33)
+
+class FakePose:
+    def __init__(self, detect_every=1):
+        self.detect_every = detect_every
+        self.frames = 0
+        self.resets = 0
+        self.closed = False
+
+    def process(self, frame):
+        self.frames += 1
+        landmarks = LANDMARKS if self.frames % self.detect_every == 0 else None
+        return SimpleNamespace(pose_landmarks=landmarks)
+
+    def reset(self):
+        self.resets += 1
+        self.frames = 0
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture(autouse=True)
+def no_exercise_model(monkeypatch):
+    # Score on pose detection alone, whether or not a trained model is on disk
+    monkeypatch.setattr(video_exercise.registry, "is_available", lambda name: False)
+
+@pytest.fixture
+def video_path(tmp_path):
+    path = str(tmp_path / "exercise.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 10, (64, 48))
+    for i in range(10):
+        writer.write(np.full((48, 64, 3), i * 20, dtype=np.uint8))
+    writer.release()
+    return path
+
+def test_estimator_is_reused_and_reset_between_videos(video_path):
+    estimators = []
+    pool = PosePool(lambda: estimators.append(FakePose()) or estimators[-1])
+
+    first = analyze_exercise_video(video_path, pool=pool)
+    second = analyze_exercise_video(video_path, pool=pool)
+
+    assert first == second
+    assert (first["status"], first["score"], first["frames_with_pose"]) == ("Pass", 10.0, 10)
+    assert len(estimators) == 1
+    assert estimators[0].resets == 2
+    assert pool.stats() == {"created": 1, "reused": 1, "idle": 1}
+
+def test_concurrent_borrowers_get_separate_estimators():
+    pool = PosePool(FakePose)
+    with pool.acquire() as first, pool.acquire() as second:
+        assert first is not second
+    assert pool.stats()["idle"] == 2
+
+def test_failed_estimator_is_closed_not_reused():
+    pool = PosePool(FakePose)
+    with pytest.raises(RuntimeError):
+        with pool.acquire() as pose:
+            raise RuntimeError("graph error")
+    assert pose.closed
+    assert pool.stats()["idle"] == 0
+
+def test_close_releases_idle_estimators():
+    pool = PosePool(FakePose)
+    with pool.acquire() as pose:
+        pass
+    pool.close()
+    assert pose.closed
+    assert pool.stats()["idle"] == 0
+
+def test_score_counts_frames_with_landmarks(video_path):
+    pool = PosePool(lambda: FakePose(detect_every=2))
+    result = analyze_exercise_video(video_path, pool=pool)
+    assert (result["status"], result["score"], result["frames_with_pose"]) == ("Fail", 5.0, 5)
+
+def test_benchmark_reports_every_strategy(video_path):
+    results = benchmark([video_path], repeat=2, factory=FakePose)
+    assert results["per_video"]["estimators_created"] == 2
+    assert results["pooled"]["estimators_created"] == 1
+    assert results["sampled"]["estimators_created"] == 1
+    for stats in results.values():
+        assert stats["videos"] == 2
+        assert stats["frames"] == 20
+        assert stats["videos_per_sec"] > 0
@@ -0,0 +1,101 @@
+import logging
+from backend.api import openai_integration, patient_chat
+from backend.utils.chat_history import ChatHistory
+from backend.utils.prompt_builder import PromptBuilder, assemble, cacheable_tokens, message, prefix_digests
+
+STATIC = [message("system", "Static instructions. " * 300)]
+
+def chat_request(turns, language="en", context=None):
+    messages = []
+    for i in range(turns):
+        messages.append(patient_chat.ChatMessage(role="user", content=f"Question {i} about my recovery."))
+        messages.append(patient_chat.ChatMessage(role="assistant", content=f"Answer {i} with advice."))
+    messages.append(patient_chat.ChatMessage(role="user", content=f"Question {turns} about my recovery."))
+    return patient_chat.ChatRequest(messages=messages, language=language, patient_context=context)
+
+def test_assemble_orders_static_history_context_question():
+    history = [message("user", "q1"), message("assistant", "a1"), message("user", "q2")]
+    context = [message("system", "Please respond in Russian.")]
+
+    assert [m["content"] for m in assemble(STATIC, context, history)] == [
+        STATIC[0]["content"], "q1", "a1", "Please respond in Russian.", "q2"]
+    assert assemble(STATIC, context) == STATIC + context
+
+def test_cacheable_tokens_follow_provider_steps():
+    assert cacheable_tokens(1000) == 0
+    assert cacheable_tokens(1024) == 1024
+    assert cacheable_tokens(1300) == 1280
+
+def test_chat_prefix_is_identical_across_patients_and_languages():
+    first, _ = patient_chat.build_chat_messages(chat_request(2, "ru", {"age": 65}))
+    second, _ = patient_chat.build_chat_messages(chat_request(2, "es", {"age": 71}))
+
+    # Everything but the per-request tail is byte-identical
+    assert prefix_digests(first)[:5] == prefix_digests(second)[:5]
+    assert prefix_digests(first)[5] != prefix_digests(second)[5]
+
+def test_next_turn_extends_the_previous_prompt():
+    # A detected language switch and new results must not invalidate the earlier turns
+    turn, _ = patient_chat.build_chat_messages(chat_request(1, "es", {"score": 20}))
+    next_turn, _ = patient_chat.build_chat_messages(chat_request(2, "ru", {"score": 24}))
+
+    shared = len(turn) - 3
+    assert prefix_digests(next_turn)[:shared] == prefix_digests(turn)[:shared]
+    assert [m["content"] for m in next_turn[-3:-1]] == ["Please respond in Russian.", "Patient information: score: 24"]
+
+def test_expected_hit_ratio():
+    builder = PromptBuilder("test")
+    for i in range(4):
+        builder.build(STATIC, history=[message("user", f"question {i}")])
+
+    stats = builder.stats()
+    assert stats["requests"] == 4
+    # Every prompt after the first reuses the ~1500-token static prefix
+    assert stats["expected_hit_ratio"] == 0.75
+    assert 0.5 < stats["expected_cached_token_ratio"] < stats["shared_prefix_ratio"] < 1
+    assert stats["static_variants"] == 1
+
+def test_short_prefixes_are_not_cached():
+    builder = PromptBuilder("test")
+    for i in range(3):
+        builder.build([message("system", "Short.")], history=[message("user", f"question {i}")])
+
+    stats = builder.stats()
+    assert stats["expected_hit_ratio"] == 0
+    assert stats["shared_prefix_ratio"] > 0
+
+def test_dynamic_static_prefix_is_reported(caplog):
+    builder = PromptBuilder("test", max_static_variants=2)
+    with caplog.at_level(logging.WARNING):
+        for i in range(4):
+            builder.build([message("system", f"Instructions for patient {i}.")], history=[message("user", "question")])
+
+    assert builder.stats()["static_variants"] == 4
+    assert "more than 2 static prefixes" in caplog.text
+
+def test_chat_completion_context_goes_before_the_last_message():
+    request = openai_integration.ChatCompletionRequest(
+        messages=[{"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"}, {"role": "user", "content": "q2"}],
+        language="uz",
+        context={"b": 1, "a": 2},
+    )
+
+    messages = openai_integration.get_chat_messages(request)
+
+    assert messages[0]["role"] == "system"
+    assert [m["content"] for m in messages[1:]] == ["q1", "a1", 'Context information: {"a": 2, "b": 1}', "q2"]
+    # The request itself is left as it came in
+    assert len(request.messages) == 3
+
+def test_long_chats_keep_their_prefix_between_folds():
+    history = ChatHistory(keep_turns=4, fold_step=4, token_budget=10000)
+    static = patient_chat.CHAT_STATIC_MESSAGES
+    conversation = [message("user" if i % 2 == 0 else "assistant", f"Message {i}.") for i in range(13)]
+
+    turns = [history.build(static, conversation[:n]) for n in (9, 11, 13)]
+
+    # 9 and 11 messages fold the same 4, so the summary and all earlier messages are reused
+    assert turns[0][1]["content"].startswith("Summary of the earlier conversation:")
+    assert prefix_digests(turns[1])[:len(turns[0]) - 1] == prefix_digests(turns[0])[:-1]
+    # 13 messages fold 8; the prefix then changes once
+    assert turns[2][1] != turns[1][1]
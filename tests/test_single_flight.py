@@ -0,0 +1,106 @@
+import asyncio
+import threading
+import time
+from backend.utils import openai_helper
+from backend.utils.single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    started = []
+
+    async def call():
+        started.append(True)
+        await asyncio.sleep(0.05)
+        return "advice"
+
+    async def run():
+        return await asyncio.gather(*[flights.run("key", call) for _ in range(5)],
+                                    flights.run("other", call))
+
+    assert asyncio.run(run()) == ["advice"] * 6
+    assert len(started) == 2
+    stats = flights.stats()
+    assert (stats["calls"], stats["coalesced"], stats["in_flight"]) == (2, 4, 0)
+
+def test_errors_reach_every_caller_and_are_not_remembered():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream error")
+
+    async def ok():
+        return "ok"
+
+    async def run():
+        results = await asyncio.gather(flights.run("key", fail), flights.run("key", fail), return_exceptions=True)
+        return results, await flights.run("key", ok)
+
+    results, retry = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retry == "ok"
+
+def test_cancelled_caller_does_not_cancel_the_others():
+    flights = SingleFlight()
+    cancelled = []
+
+    async def call():
+        try:
+            await asyncio.sleep(0.1)
+            return "done"
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def run():
+        first = asyncio.ensure_future(flights.run("key", call))
+        second = asyncio.ensure_future(flights.run("key", call))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+
+        # Once every caller has left, the shared call is cancelled
+        third = asyncio.ensure_future(flights.run("key", call))
+        await asyncio.sleep(0.01)
+        third.cancel()
+        await asyncio.sleep(0.01)
+        return result
+
+    assert asyncio.run(run()) == "done"
+    assert cancelled == [True]
+    assert flights.stats()["in_flight"] == 0
+
+def test_threads_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    def call():
+        calls.append(True)
+        time.sleep(0.1)
+        return "advice"
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flights.run_sync("key", call))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["advice"] * 4
+    assert len(calls) == 1
+    assert flights.stats()["coalesced"] == 3
+
+def test_identical_completions_make_one_upstream_request(fake_openai, monkeypatch):
+    fake_openai.reply = "Walk daily."
+    fake_openai.delay = 0.1
+    monkeypatch.setattr(openai_helper, "llm_flights", SingleFlight())
+    same = [{"role": "user", "content": "Movement score 27/39, level Moderate."}]
+    other = [{"role": "user", "content": "Movement score 12/39, level Severe."}]
+
+    async def run():
+        return await asyncio.gather(*[openai_helper.acreate_chat_completion(same) for _ in range(5)],
+                                    openai_helper.acreate_chat_completion(other))
+
+    assert asyncio.run(run()) == ["Walk daily."] * 6
+    assert len(fake_openai.requests) == 2
+    assert openai_helper.llm_flights.stats()["coalesced"] == 4
@@ -0,0 +1,119 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from backend.api import patient_chat
+from backend.core.auth import create_access_token
+from backend.utils import openai_helper, token_quota as quota_module
+from backend.utils.llm_cache import LLMCache
+from backend.utils.token_quota import (QuotaExceededError, TokenQuota, TokenQuotaMiddleware, client_id,
+                                       current_client, token_quota)
+
+USAGE = {"prompt_tokens": 300, "completion_tokens": 200, "total_tokens": 500}
+
+app = FastAPI()
+app.add_middleware(TokenQuotaMiddleware)
+app.include_router(patient_chat.router, prefix="/chat")
+
+def as_client(client, coroutine):
+    async def run():
+        current_client.set(client)
+        return await coroutine
+
+    return asyncio.run(run())
+
+def test_bucket_refills_at_its_rate(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(quota_module.time, "monotonic", lambda: now[0])
+    quota = TokenQuota(capacity=1000, refill_per_minute=600)
+
+    quota.check("a", 800)
+    quota.charge("a", 900)
+    with pytest.raises(QuotaExceededError) as refused:
+        quota.check("a", 300)
+    # 200 tokens short at 10 tokens a second
+    assert refused.value.retry_after == 20
+    assert quota.headers("a") == {"X-Token-Quota-Limit": "1000", "X-Token-Quota-Remaining": "100",
+                                  "X-Token-Quota-Reset": "90"}
+
+    now[0] = 20
+    quota.check("a", 300)
+    # Other clients have their own bucket
+    quota.check("b", 1000)
+    stats = quota.stats()
+    assert (stats["checks"], stats["refused"], stats["charged_tokens"], stats["clients"]) == (4, 1, 900, 2)
+
+def test_estimates_above_the_capacity_need_a_full_bucket():
+    quota = TokenQuota(capacity=1000, refill_per_minute=600)
+    quota.check("a", 50000)
+    quota.charge("a", 1)
+    with pytest.raises(QuotaExceededError):
+        quota.check("a", 50000)
+
+def test_least_recently_seen_clients_are_evicted():
+    quota = TokenQuota(capacity=1000, refill_per_minute=60, max_clients=2)
+    quota.charge("a", 1000)
+    quota.charge("b", 10)
+    quota.charge("c", 10)
+
+    assert quota.stats()["evictions"] == 1
+    # Forgotten clients come back with a full bucket
+    quota.check("a", 1000)
+
+def test_clients_are_identified_by_token_or_address():
+    scope = {"client": ("10.0.0.7", 5000), "headers": []}
+    assert client_id(scope) == "ip:10.0.0.7"
+
+    token = create_access_token(42)
+    assert client_id({**scope, "headers": [(b"authorization", f"Bearer {token}".encode())]}) == "user:42"
+    assert client_id({**scope, "headers": [(b"authorization", b"Bearer forged")]}) == "ip:10.0.0.7"
+
+def test_completions_are_charged_their_usage(fake_openai, monkeypatch):
+    fake_openai.usage = USAGE
+    monkeypatch.setattr(token_quota, "capacity", 2000)
+    messages = [{"role": "user", "content": "quota usage"}]
+
+    assert as_client("ip:a", openai_helper.acreate_chat_completion(messages, max_tokens=100)) == "Rest well."
+    assert token_quota.headers("ip:a")["X-Token-Quota-Remaining"] == "1500"
+    # Calls outside a request belong to no client and are never refused
+    assert asyncio.run(openai_helper.acreate_chat_completion(messages, max_tokens=100)) == "Rest well."
+    assert token_quota.stats()["charged_tokens"] == 500
+
+def test_spent_quota_still_serves_cached_answers(fake_openai, monkeypatch):
+    fake_openai.usage = USAGE
+    monkeypatch.setattr(token_quota, "capacity", 1000)
+    cache = LLMCache(disk_path=None)
+    cached = [{"role": "user", "content": "quota cached"}]
+    fresh = [{"role": "user", "content": "quota fresh"}]
+
+    as_client("ip:a", openai_helper.acreate_chat_completion(cached, max_tokens=100, cache=cache))
+    token_quota.charge("ip:a", 1000)
+
+    assert as_client("ip:a", openai_helper.acreate_chat_completion(cached, max_tokens=100, cache=cache)) == "Rest well."
+    # An explicit fallback is the degraded answer; without one the call is refused
+    assert as_client("ip:a", openai_helper.acreate_chat_completion(fresh, max_tokens=100, fallback="")) == ""
+    with pytest.raises(QuotaExceededError):
+        as_client("ip:a", openai_helper.acreate_chat_completion(fresh, max_tokens=100))
+    assert len(fake_openai.requests) == 1
+
+def test_chat_degrades_to_faq_answers_once_the_quota_is_spent(fake_openai):
+    fake_openai.usage = USAGE
+
+    async def post(question):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.post("/chat/patient-chat", json={"messages": [{"role": "user", "content": question}]})
+
+    response = asyncio.run(post("Can you write me a weekly plan for my recovery?"))
+    assert response.status_code == 200
+    assert response.headers["X-Token-Quota-Remaining"] == str(token_quota.capacity - 500)
+
+    token_quota.charge("ip:127.0.0.1", token_quota.capacity)
+    response = asyncio.run(post("Can you write me a weekly plan for my recovery?"))
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert response.headers["X-Token-Quota-Remaining"] == "0"
+
+    response = asyncio.run(post("What is normal blood pressure?"))
+    assert response.status_code == 200
+    assert response.headers["X-Answer-Source"] == "faq"
+    assert len(fake_openai.requests) == 1
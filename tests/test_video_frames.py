@@ -0,0 +1,88 @@
+import cv2
+import numpy as np
+import pytest
+from types import SimpleNamespace
+from ml_models.video_frames import iter_frames, frame_step, downscale, RunningStats
+from ml_models.exercise_analysis import extract_features_from_video
+from ml_models import video_exercise
+from ml_models.pose_pool import PosePool
+from ml_models.video_exercise import analyze_exercise_video
+
+FRAMES = 90
+
+@pytest.fixture(scope="module")
+def video_path(tmp_path_factory):
+    # 3 seconds of 30 fps 1280x720 video whose brightness drifts and flickers
+    path = str(tmp_path_factory.mktemp("video") / "clip.avi")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (1280, 720))
+    gradient = np.tile(np.linspace(0, 80, 1280, dtype=np.float32), (720, 1))
+    for i in range(FRAMES):
+        level = 60 + i + 15 * np.sin(i / 4)
+        frame = np.clip(gradient + level, 0, 255).astype(np.uint8)
+        writer.write(cv2.merge([frame, frame, frame]))
+    writer.release()
+    return path
+
+def full_frame_means(video_path):
+    return np.array([frame.mean() for frame in iter_frames(video_path, target_fps=None, max_side=None,
+                                                         color=cv2.COLOR_BGR2GRAY)])
+
+def test_frames_are_sampled_to_target_fps(video_path):
+    frames = list(iter_frames(video_path, target_fps=10))
+    assert len(frames) == FRAMES // 3
+    assert len(list(iter_frames(video_path, target_fps=None))) == FRAMES
+
+def test_frames_are_downscaled(video_path):
+    frame = next(iter_frames(video_path, max_side=320, color=cv2.COLOR_BGR2RGB))
+    assert frame.shape == (180, 320, 3)
+
+def test_frame_step():
+    assert frame_step(30, 10) == 3
+    assert frame_step(25, 10) == 2
+    assert frame_step(5, 10) == 1
+    assert frame_step(0, 10) == 1
+    assert frame_step(30, None) == 1
+
+def test_small_frames_are_not_resized():
+    frame = np.zeros((48, 64, 3), dtype=np.uint8)
+    assert downscale(frame, 640) is frame
+
+def test_unreadable_video_raises(tmp_path):
+    path = tmp_path / "not_a_video.txt"
+    path.write_text("not a video")
+    with pytest.raises(ValueError):
+        list(iter_frames(str(path)))
+
+def test_running_stats_match_numpy():
+    values = np.random.default_rng(0).normal(100, 20, 1000)
+    stats = RunningStats()
+    for value in values:
+        stats.push(value)
+    assert stats.count == 1000
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.std == pytest.approx(values.std())
+    assert np.isnan(RunningStats().mean)
+
+def test_sampled_features_within_tolerance_of_full_frames(video_path):
+    means = full_frame_means(video_path)
+    mean, std = extract_features_from_video(video_path)
+    assert abs(mean - means.mean()) < 1.0
+    assert abs(std - means.std()) < 1.0
+
+def test_sampled_score_within_tolerance_of_full_frames(video_path, monkeypatch):
+    monkeypatch.setattr(video_exercise.registry, "is_available", lambda name: False)
+    landmarks = SimpleNamespace(landmark=[SimpleNamespace(x=0.5, y=0.5, z=0.0, visibility=1.0)] * 33)
+
+    class BrightnessPose:
+        # "Detects" a pose on bright enough frames so the score depends on which frames are seen
+        def process(self, frame):
+            return SimpleNamespace(pose_landmarks=landmarks if frame.mean() > 110 else None)
+
+        def close(self):
+            pass
+
+    means = full_frame_means(video_path)
+    full_score = (means > 110).mean() * 10
+
+    result = analyze_exercise_video(video_path, pool=PosePool(BrightnessPose))
+    assert abs(result["score"] - full_score) <= 0.5
@@ -0,0 +1,64 @@
+import pytest
+from ml_models.whisper_service import WhisperService
+from ml_models.audio_cognition import analyze_transcript
+
+class FakeWhisperModel:
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, file_path, word_timestamps=False):
+        self.calls += 1
+        return {
+            "text": "hello hello world",
+            "language": "en",
+            "segments": [{
+                "start": 0.0, "end": 3.0, "text": "hello hello world",
+                "words": [
+                    {"word": "hello", "start": 0.0, "end": 0.5},
+                    {"word": "hello", "start": 0.6, "end": 1.0},
+                    {"word": "world", "start": 2.5, "end": 3.0},
+                ],
+            }],
+        }
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / "sample.wav"
+    path.write_bytes(b"RIFF fake audio")
+    return str(path)
+
+def test_model_loaded_once_and_file_transcribed_once(audio_file):
+    model = FakeWhisperModel()
+    loads = []
+    service = WhisperService(model_loader=lambda name: loads.append(name) or model)
+
+    first = service.transcribe(audio_file)
+    second = service.transcribe(audio_file)
+
+    assert first is second
+    assert loads == ["base"]
+    assert model.calls == 1
+
+def test_changed_file_is_transcribed_again(audio_file):
+    model = FakeWhisperModel()
+    service = WhisperService(model_loader=lambda name: model)
+
+    service.transcribe(audio_file)
+    with open(audio_file, "ab") as f:
+        f.write(b" more audio")
+    service.transcribe(audio_file)
+
+    assert model.calls == 2
+
+def test_analyze_transcript_uses_word_timings():
+    result = analyze_transcript(FakeWhisperModel().transcribe("unused"))
+
+    assert result["transcription"] == "hello hello world"
+    assert result["repetition_score"] == 1
+    assert result["words_per_minute"] == 60.0
+    assert result["long_pauses"] == 1
+
+def test_analyze_transcript_without_word_timings():
+    result = analyze_transcript({"text": "one two three"})
+    assert result["cognitive_risk"] == "Low"
+    assert "words_per_minute" not in result